@@ -1,4 +1,5 @@
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
 
 logger = setup_logging('liquidity_analyzer')
 
@@ -9,8 +10,8 @@ class LiquidityAnalyzer:
     def analyze(self, symbol, klines):
         """Analyze liquidity based on volume in klines."""
         try:
-            volumes = [kline[5] for kline in klines]  # Volume is the 6th element in klines
-            avg_volume = sum(volumes) / len(volumes) if volumes else 0
+            volumes = KlineFrame.ensure(klines).volume
+            avg_volume = float(volumes.mean()) if len(volumes) else 0
             logger.info(f"Average volume for {symbol}: {avg_volume}")
             return avg_volume >= self.min_liquidity
         except Exception as e:
@@ -1,4 +1,5 @@
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
 
 logger = setup_logging('market_analyzer')
 
@@ -9,8 +10,8 @@ class MarketAnalyzer:
     def analyze(self, klines):
         """Analyze market conditions based on klines."""
         try:
-            closes = [kline[4] for kline in klines]  # Close price is the 5th element
-            avg_price = sum(closes) / len(closes) if closes else 0
+            closes = KlineFrame.ensure(klines).close
+            avg_price = float(closes.mean()) if len(closes) else 0
             logger.info(f"Average closing price: {avg_price}")
             return avg_price
         except Exception as e:
@@ -1,4 +1,5 @@
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
 
 logger = setup_logging('price_analyzer')
 
@@ -9,10 +10,10 @@ class PriceAnalyzer:
     def analyze(self, klines):
         """Analyze price trends based on klines."""
         try:
-            closes = [kline[4] for kline in klines]  # Close price is the 5th element
+            closes = KlineFrame.ensure(klines).close
             if len(closes) < 2:
                 return 0
-            trend = (closes[-1] - closes[-2]) / closes[-2] if closes[-2] != 0 else 0
+            trend = float((closes[-1] - closes[-2]) / closes[-2]) if closes[-2] != 0 else 0
             logger.info(f"Price trend: {trend}")
             return trend
         except Exception as e:
@@ -1,4 +1,5 @@
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
 
 logger = setup_logging('trend_analyzer')
 
@@ -9,11 +10,11 @@ class TrendAnalyzer:
     def analyze(self, klines):
         """Analyze trend direction based on klines."""
         try:
-            closes = [kline[4] for kline in klines]  # Close price is the 5th element
+            closes = KlineFrame.ensure(klines).close
             if len(closes) < 5:
                 return "neutral"
-            avg_short = sum(closes[-5:]) / 5
-            avg_long = sum(closes[-20:]) / 20 if len(closes) >= 20 else avg_short
+            avg_short = closes[-5:].mean()
+            avg_long = closes[-20:].mean() if len(closes) >= 20 else avg_short
             trend = "bullish" if avg_short > avg_long else "bearish" if avg_short < avg_long else "neutral"
             logger.info(f"Trend: {trend}")
             return trend
@@ -3,7 +3,9 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import asyncio
+import numpy as np
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
 
 logger = setup_logging('volatility_analyzer')
 
@@ -20,9 +22,13 @@ class VolatilityAnalyzer:
                 logger.warning(f"No data for {symbol} on {exchange_name}")
                 return 0.0
 
-            closes = [kline['close'] for kline in klines]
-            returns = [(closes[i] - closes[i-1]) / closes[i-1] for i in range(1, len(closes))]
-            volatility = (sum((r - sum(returns) / len(returns)) ** 2 for r in returns) / len(returns)) ** 0.5
+            closes = KlineFrame.ensure(klines).close
+            if len(closes) < 2:
+                # Из одной свечи доходность не посчитать, std пустого массива дал бы NaN
+                logger.warning(f"Not enough candles for {symbol} on {exchange_name}, returning default volatility")
+                return self.volatility
+            returns = np.diff(closes) / closes[:-1]
+            volatility = float(returns.std())
             logger.info(f"Volatility for {symbol} on {exchange_name}: {volatility}")
             return volatility
         except Exception as e:
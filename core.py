@@ -4,18 +4,22 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import time
 import asyncio
+from dotenv import load_dotenv
 from utils.logging_setup import setup_logging
 from utils.telegram_notifier import TelegramNotifier
 from symbol_filter import SymbolFilter
 from volatility_analyzer import VolatilityAnalyzer
 from learning.online_learning import OnlineLearning
 from strategies import StrategyManager
+from strategies.ensemble import SignalEnsemble
 from data_sources.mexc_api import MEXCAPI
 from data_sources.market_data import AsyncMarketData
+from data_sources.ohlcv_store import OHLCVStore
+from data_sources.websocket_manager import WebSocketManager
+from data_sources.order_book import OrderBookManager
 from risk_management import RiskManager, PositionManager
 from trading import OrderManager, RiskCalculator, TradeExecutor
 from news_analyzer import NewsAnalyzer
-from rl_decision_maker import RLDecisionMaker
 
 logger = setup_logging('core')
 
@@ -26,14 +30,26 @@ class TradingBotCore:
         self.timeframe = "1h"
         self.limit = 200
         self.iteration_interval = 60
+        load_dotenv()
+        # Локальные стаканы только для части символов: каждый стоит REST-снимка при старте и после каждого разрыва
+        self.depth_symbols = [symbol.strip() for symbol in os.getenv('DEPTH_SYMBOLS', '').split(',') if symbol.strip()]
+        self.depth_symbol_limit = int(os.getenv('DEPTH_SYMBOL_LIMIT', 50))
+        # Старшие таймфреймы из 1m свечей: один поток (или один опрос) на символ вместо запросов по каждому таймфрейму
+        self.resample_from_base = os.getenv('RESAMPLE_FROM_1M', '').lower() in ('1', 'true', 'yes')
         logger.info("Basic attributes initialized")
 
         self.mexc_api = MEXCAPI()
         logger.info("MEXCAPI initialized")
 
         self.market_data = AsyncMarketData()
+        self.market_data.history_store = OHLCVStore()
         logger.info("AsyncMarketData initialized")
 
+        # Общий синглтон стаканов: создаётся здесь первым, с AsyncMarketData для REST-снимков
+        self.order_books = OrderBookManager(self.market_data)
+        self.websocket_manager = WebSocketManager(self.market_data, order_books=self.order_books)
+        logger.info("WebSocketManager initialized")
+
         self.news_analyzer = NewsAnalyzer()
         logger.info("NewsAnalyzer initialized")
 
@@ -56,10 +72,12 @@ class TradingBotCore:
         logger.info("OnlineLearning initialized")
 
         self.strategy_manager = StrategyManager(self.market_state, self.market_data, self.volatility_analyzer, self.online_learning)
-        logger.info("StrategyManager initialized")
+        # История свечей на символ: наибольший lookback включённых стратегий, но не меньше нужного моделям
+        self.limit = max(self.strategy_manager.lookback(self.timeframe), self.online_learning.min_history)
+        logger.info(f"StrategyManager initialized, fetching {self.limit} candles per symbol")
 
-        self.rl_decision_maker = RLDecisionMaker([], self.strategy_manager.strategies)
-        logger.info("RLDecisionMaker initialized")
+        self.ensemble = SignalEnsemble([strategy.name for strategy in self.strategy_manager.strategies])
+        logger.info("SignalEnsemble initialized")
 
         self.risk_manager = RiskManager(self.volatility_analyzer)
         logger.info("RiskManager initialized")
@@ -70,7 +88,7 @@ class TradingBotCore:
         self.order_manager = OrderManager()
         logger.info("OrderManager initialized")
 
-        self.risk_calculator = RiskCalculator(self.volatility_analyzer)
+        self.risk_calculator = RiskCalculator(self.volatility_analyzer, order_books=self.order_books)
         logger.info("RiskCalculator initialized")
 
         self.trade_executors = {}
@@ -79,16 +97,65 @@ class TradingBotCore:
             logger.info(f"TradeExecutor for {exchange} initialized")
         logger.info("Finished initialization of TradingBotCore")
 
-    def get_symbols(self, exchange_name):
-        return self.mexc_api.fetch_symbols() if exchange_name == "mexc" else self.market_data.exchanges[exchange_name].load_markets()
+    async def get_symbols(self, exchange_name):
+        return await self.market_data.get_symbols(exchange_name)
 
     def batch_symbols(self, symbols, batch_size=50):
         for i in range(0, len(symbols), batch_size):
             yield symbols[i:i + batch_size]
 
+    async def depth_universe(self, exchange_name, symbols):
+        """Symbols that get a local order book: DEPTH_SYMBOLS if set, else the DEPTH_SYMBOL_LIMIT most traded by 24h quote volume."""
+        if self.depth_symbols:
+            listed = set(symbols)
+            return [symbol for symbol in self.depth_symbols if symbol in listed]
+        tickers = await self.market_data.get_tickers(exchange_name) or {}
+        ranked = sorted(symbols, key=lambda symbol: (tickers.get(symbol) or {}).get('quoteVolume') or 0, reverse=True)
+        return ranked[:self.depth_symbol_limit]
+
+    def resampled_timeframes(self):
+        """The bot's timeframe and those of the enabled strategies, when they can be built from base candles."""
+        timeframes = {self.timeframe} | {spec.timeframe for spec in self.strategy_manager.specs if spec.timeframe}
+        timeframes.discard(self.market_data.resample_base)
+        return tuple(sorted(timeframes))
+
+    async def start_resampling(self):
+        """Seed local higher-timeframe buffers of every traded symbol once; afterwards they follow the 1m series."""
+        targets = self.resampled_timeframes()
+        for exchange_name in self.exchanges:
+            try:
+                symbols = await self.get_symbols(exchange_name)
+                for symbol_batch in self.batch_symbols(symbols):
+                    await asyncio.gather(*[self.market_data.enable_resampling(symbol, exchange_name, targets, self.limit) for symbol in symbol_batch])
+                logger.info(f"Resampling {', '.join(targets)} from {self.market_data.resample_base} for {len(symbols)} symbols on {exchange_name}")
+            except Exception as e:
+                logger.error(f"Failed to start resampling on {exchange_name}: {str(e)}")
+
+    async def start_streams(self):
+        """Stream candles and best quotes of every traded symbol, and depth of the depth universe, where a stream protocol exists."""
+        for exchange_name in self.exchanges:
+            if exchange_name not in self.websocket_manager.protocols:
+                continue
+            try:
+                symbols = await self.get_symbols(exchange_name)
+                # При пересчёте из 1m потоком нужна только базовая серия, старшие свечи строятся из неё
+                kline_timeframe = self.market_data.resample_base if self.resample_from_base else self.timeframe
+                await self.websocket_manager.subscribe_klines(exchange_name, symbols, kline_timeframe)
+                await self.websocket_manager.subscribe_quotes(exchange_name, symbols)
+                depth_symbols = await self.depth_universe(exchange_name, symbols)
+                await self.websocket_manager.subscribe_depth(exchange_name, depth_symbols)
+                logger.info(f"Streaming {len(symbols)} symbols on {exchange_name}, order books for {len(depth_symbols)}")
+            except Exception as e:
+                logger.error(f"Failed to start streams on {exchange_name}: {str(e)}")
+
     async def start_trading(self, fetch_klines, train_model):
         """Start the trading process."""
+        if self.resample_from_base:
+            await self.start_resampling()
+        await self.start_streams()
+        self.strategy_manager.attach_streams(self.websocket_manager, self.order_books)
         while True:
+            iteration_started = time.time()
             try:
                 for exchange_name in self.exchanges:
                     articles = self.news_analyzer.fetch_news()
@@ -101,7 +168,7 @@ class TradingBotCore:
                         continue
 
                     logger.info(f"Starting trading iteration on {exchange_name}")
-                    symbols = self.get_symbols(exchange_name)
+                    symbols = await self.get_symbols(exchange_name)
                     logger.info(f"Fetched {len(symbols)} symbols from {exchange_name}")
 
                     for symbol_batch in self.batch_symbols(symbols):
@@ -109,7 +176,11 @@ class TradingBotCore:
                         for symbol in symbol_batch:
                             tasks.append(self.market_data.fetch_klines_with_semaphore(symbol, self.timeframe, self.limit, exchange_name))
                         klines_results = await asyncio.gather(*tasks)
+                        # Обновляем веса ансамбля по движению цены после прошлого голосования
+                        self.ensemble.learn(symbol_batch, [float(klines.close[-1]) if klines else None for klines in klines_results], exchange_name)
 
+                        voted_symbols = []
+                        voted_signals = []
                         for symbol, klines in zip(symbol_batch, klines_results):
                             if not klines:
                                 logger.warning(f"No klines for {symbol} on {exchange_name}, skipping")
@@ -120,22 +191,24 @@ class TradingBotCore:
                                 logger.warning(f"Failed to retrain model for {symbol} on {exchange_name}, skipping")
                                 continue
 
-                            self.rl_decision_maker.env.klines = klines
-                            self.rl_decision_maker.train(total_timesteps=1000)
-
                             prediction = await self.online_learning.predict(symbol, self.timeframe, self.limit, exchange_name)
                             if prediction is not None:
-                                signals = await self.strategy_manager.generate_signals(symbol, klines, prediction)
+                                signals = await self.strategy_manager.generate_signals(symbol, klines, prediction, self.timeframe, self.limit, exchange_name)
                                 if signals:
-                                    best_strategy = self.rl_decision_maker.select_strategy()
-                                    signal = await best_strategy.generate_signal(symbol, klines, "1m", 200, exchange_name)
-                                    if signal:
-                                        signal['exchange_name'] = exchange_name
-                                        await self.execute_trade(signal)
+                                    voted_symbols.append(symbol)
+                                    voted_signals.append(signals)
                             else:
                                 logger.warning(f"No prediction for {symbol} on {exchange_name}, skipping trade execution")
 
+                        # Сигналы всех стратегий по всем символам пачки сводятся одной матричной операцией
+                        for signal in self.ensemble.decisions(voted_symbols, voted_signals, self.timeframe, self.limit, exchange_name):
+                            await self.execute_trade(signal)
+
                     logger.info(f"Trading iteration completed for {exchange_name}")
+                    logger.info(f"Kline cache stats: {self.market_data.get_cache_stats()}")
+                    logger.info(f"Feature cache stats: {self.strategy_manager.get_cache_stats()}")
+                # Состояние, не тронутое за две полные итерации (и не меньше часа), больше не нужно
+                self.strategy_manager.prune(max(3600, 2 * (time.time() - iteration_started)))
             except Exception as e:
                 logger.error(f"Error in trading iteration: {str(e)}")
                 message = f"Error in trading iteration: {str(e)}"
@@ -147,6 +220,12 @@ class TradingBotCore:
     async def execute_trade(self, signal):
         """Execute a trade asynchronously."""
         exchange_name = signal['exchange_name']
+        if not self.risk_calculator.check_liquidity(signal):
+            logger.warning(f"Trade for {signal['symbol']} on {exchange_name} rejected: order book too thin for {signal['trade_size']}")
+            return
+        if not self.risk_calculator.check_price(signal):
+            logger.warning(f"Trade for {signal['symbol']} on {exchange_name} rejected: entry price is stale")
+            return
         risk = self.risk_calculator.calculate_risk(signal)
         if self.risk_manager.validate_risk(risk):
             position = await self.trade_executors[exchange_name].execute(signal)
@@ -162,6 +241,7 @@ class TradingBotCore:
     async def close(self):
         """Close all resources asynchronously."""
         try:
+            await self.websocket_manager.close()
             await self.market_data.close()
             for exchange_name, executor in self.trade_executors.items():
                 await executor.close()
@@ -0,0 +1,206 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import time
+import numpy as np
+import ccxt.async_support as ccxt
+from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
+from data_sources.market_data import AsyncMarketData
+from data_sources.ohlcv_store import OHLCVStore
+
+logger = setup_logging('bulk_loader')
+
+# Максимум свечей, который биржа отдаёт за один запрос fetch_ohlcv
+MAX_CANDLES_PER_REQUEST = {
+    'binance': 1000,
+    'mexc': 1000,
+    'bybit': 1000,
+    'kucoin': 1500,
+    'okx': 300,
+    'kraken': 720,
+    'default': 500,
+}
+
+class BulkHistoryLoader:
+    """Backfill candle history into OHLCVStore with bounded parallelism per exchange.
+
+    Every series is cut into ``since`` windows of one request each. Windows of
+    all symbols go through one queue per exchange drained by ``concurrency``
+    workers, and all requests pass the shared ExchangeRateLimiter. Windows are
+    written to the store in time order per series, so new history is appended
+    in place and history older than the stored one costs a single merge.
+    """
+
+    def __init__(self, market_data=None, store=None, concurrency=8, max_retries=3, progress_interval=10):
+        self.market_data = market_data or AsyncMarketData()
+        self.store = store or OHLCVStore()
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.progress_interval = progress_interval
+        self.stats = {}
+        self.holes = []  # (exchange, symbol, timeframe, since, until) окон, не загруженных после всех повторов
+
+    def windows(self, exchange_name, symbol, timeframe, start_ms, end_ms):
+        """Split [start_ms, end_ms) into request-sized windows, skipping what the store already has.
+
+        Returns (windows, prefix): the first ``prefix`` windows lie before the
+        stored history and are merged into the file in one go.
+        """
+        timeframe_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        step = MAX_CANDLES_PER_REQUEST.get(exchange_name, MAX_CANDLES_PER_REQUEST['default']) * timeframe_ms
+        start_ms -= start_ms % timeframe_ms
+        info = self.store.info(exchange_name, symbol, timeframe)
+        if info is None:
+            ranges = [(start_ms, end_ms)]
+        else:
+            # Последняя сохранённая свеча могла быть открытой, поэтому загружаем её снова
+            ranges = [(start_ms, min(info['first_ts'], end_ms)), (max(start_ms, info['last_ts']), end_ms)]
+        windows = [[(since, min(since + step, until)) for since in range(lo, until, step)] for lo, until in ranges]
+        prefix = len(windows[0]) if len(windows) > 1 else 0
+        return [window for part in windows for window in part], prefix
+
+    async def fetch_window(self, exchange, symbol, timeframe, since, until):
+        """Fetch one window, retrying transient errors, and clip it to [since, until)."""
+        limit = MAX_CANDLES_PER_REQUEST.get(exchange.id, MAX_CANDLES_PER_REQUEST['default'])
+        for attempt in range(self.max_retries + 1):
+            try:
+                ohlcv = await self.market_data.rate_limiter.call(exchange.id, 'fetch_ohlcv', exchange.fetch_ohlcv, symbol, timeframe, since=since, limit=limit)
+                break
+            except (ccxt.BadSymbol, ccxt.BadRequest):
+                raise
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"Retrying {exchange.id} {symbol} {timeframe} since {since}: {str(e)}")
+                await asyncio.sleep(2 ** attempt)
+        klines = KlineFrame.ensure(ohlcv)
+        # Биржи отдают свечи после листинга даже при since раньше него, поэтому обрезаем окно
+        mask = (klines.ts >= since) & (klines.ts < until)
+        return KlineFrame(klines.ts[mask], klines.values[:, mask])
+
+    async def load_exchange(self, exchange_name, symbols, timeframe, start_ms, end_ms):
+        """Backfill all symbols of one exchange through a bounded worker pool."""
+        stats = self.stats.setdefault(exchange_name, {'series': 0, 'windows': 0, 'done': 0, 'failed': 0, 'candles': 0, 'holes': 0})
+        if not await self.market_data.initialize_exchange(exchange_name):
+            logger.error(f"Failed to initialize {exchange_name}, skipping {len(symbols)} symbols")
+            return
+        exchange = self.market_data.exchanges[exchange_name]
+
+        queue = asyncio.Queue()
+        series = {}  # symbol -> {'windows': [(since, until)], 'pending': {index: KlineFrame}, 'next': int, 'prefix': int, 'older': [KlineFrame], 'stopped': bool}
+        for symbol in symbols:
+            windows, prefix = self.windows(exchange_name, symbol, timeframe, start_ms, end_ms)
+            if not windows:
+                continue
+            series[symbol] = {'windows': windows, 'pending': {}, 'next': 0, 'prefix': prefix, 'older': [], 'stopped': False}
+            for index, (since, until) in enumerate(windows):
+                queue.put_nowait((symbol, index, since, until))
+        stats['series'] += len(series)
+        stats['windows'] += queue.qsize()
+        logger.info(f"{exchange_name}: {queue.qsize()} requests for {len(series)} {timeframe} series")
+
+        def report_hole(symbol, index):
+            since, until = series[symbol]['windows'][index]
+            stats['holes'] += 1
+            self.holes.append((exchange_name, symbol, timeframe, since, until))
+            logger.warning(f"Hole in {exchange_name} {symbol} {timeframe} at [{since}, {until}): history on its far side is not written, rerun the backfill to fill it")
+
+        def commit(symbol, index, klines):
+            """Write finished windows to the store in time order, never past a window that failed.
+
+            windows() only plans ranges outside the stored history, so a hole
+            inside it would never be refetched. History after the stored one
+            stops at the first failed window; older history keeps only the
+            windows between the last failure and the stored history.
+            """
+            state = series[symbol]
+            if state['stopped']:
+                return
+            state['pending'][index] = klines
+            while state['next'] in state['pending']:
+                index = state['next']
+                chunk = state['pending'].pop(index)
+                state['next'] += 1
+                if chunk is None:
+                    report_hole(symbol, index)
+                    if index < state['prefix']:
+                        state['older'] = []  # Всё до дыры отбрасываем: иначе она окажется внутри файла
+                    else:
+                        state['stopped'] = True
+                        state['pending'].clear()
+                        return
+                elif len(chunk):
+                    if state['next'] <= state['prefix']:
+                        state['older'].append(chunk)  # История раньше сохранённой: одно слияние вместо многих
+                    else:
+                        stats['candles'] += self.store.append(exchange_name, symbol, timeframe, chunk)
+                if state['next'] == state['prefix'] and state['older']:
+                    older, state['older'] = state['older'], []
+                    merged = KlineFrame(np.concatenate([c.ts for c in older]), np.hstack([c.values for c in older]))
+                    stats['candles'] += self.store.append(exchange_name, symbol, timeframe, merged)
+
+        async def worker():
+            while True:
+                try:
+                    symbol, index, since, until = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    klines = await self.fetch_window(exchange, symbol, timeframe, since, until)
+                    stats['done'] += 1
+                except Exception as e:
+                    klines = None
+                    stats['failed'] += 1
+                    logger.error(f"Failed to load {exchange_name} {symbol} {timeframe} since {since}: {str(e)}")
+                commit(symbol, index, klines)
+
+        await asyncio.gather(*[worker() for _ in range(self.concurrency)])
+
+    async def report_progress(self, started):
+        """Log progress and throughput until cancelled."""
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            self.log_progress(started)
+
+    def log_progress(self, started):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        for exchange_name, stats in self.stats.items():
+            finished = stats['done'] + stats['failed']
+            rate = finished / elapsed
+            eta = (stats['windows'] - finished) / rate if rate else float('inf')
+            logger.info(
+                f"{exchange_name}: {finished}/{stats['windows']} requests, {stats['candles']} candles, "
+                f"{stats['candles'] / elapsed:.0f} candles/s, {rate:.1f} req/s, ETA {eta:.0f}s"
+            )
+
+    async def backfill(self, universe, timeframe, start_ms, end_ms=None):
+        """Backfill {exchange_name: [symbols]} for one timeframe over [start_ms, end_ms); returns stats."""
+        end_ms = end_ms or int(time.time() * 1000)
+        started = time.monotonic()
+        reporter = asyncio.create_task(self.report_progress(started))
+        try:
+            await asyncio.gather(*[
+                self.load_exchange(exchange_name, symbols, timeframe, start_ms, end_ms)
+                for exchange_name, symbols in universe.items()
+            ])
+        finally:
+            reporter.cancel()
+            self.store.flush_index()
+        self.log_progress(started)
+        logger.info(f"Backfill of {timeframe} finished in {time.monotonic() - started:.1f}s")
+        return self.stats
+
+if __name__ == "__main__":
+    # Test run
+    async def main():
+        loader = BulkHistoryLoader()
+        start_ms = int(time.time() * 1000) - 7 * 24 * 60 * 60 * 1000
+        stats = await loader.backfill({'mexc': ['BTC/USDT', 'ETH/USDT']}, '1m', start_ms)
+        print(f"Stats: {stats}")
+        print(loader.store.read('mexc', 'BTC/USDT', '1m', limit=5))
+        await loader.market_data.close()
+
+    asyncio.run(main())
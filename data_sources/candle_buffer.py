@@ -0,0 +1,91 @@
+import numpy as np
+from data_sources.kline_frame import KlineFrame
+
+class CandleRingBuffer:
+    """Fixed-capacity buffer of the most recent candles for one (exchange, symbol, timeframe).
+
+    Storage has some slack past the capacity so the live window is always one
+    contiguous slice: when the write position reaches the end, the live rows
+    are moved back to the front. Appends are amortized O(1) and reads are a
+    single slice copy.
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        storage = capacity + max(capacity // 4, 16)
+        self.ts = np.zeros(storage, dtype=np.int64)
+        self.values = np.zeros((5, storage), dtype=np.float64)
+        self.end = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def last_timestamp(self):
+        return int(self.ts[self.end - 1]) if self.size else None
+
+    @property
+    def first_timestamp(self):
+        return int(self.ts[self.end - self.size]) if self.size else None
+
+    def clear(self):
+        self.end = 0
+        self.size = 0
+
+    def _reserve(self, count):
+        """Make room for ``count`` more rows after ``end``."""
+        if self.end + count <= len(self.ts):
+            return
+        keep = min(self.size, self.capacity - min(count, self.capacity))
+        start = self.end - keep
+        self.ts[:keep] = self.ts[start:self.end]
+        self.values[:, :keep] = self.values[:, start:self.end]
+        self.end = keep
+        self.size = keep
+
+    def _append(self, ts, values):
+        count = len(ts)
+        if count > self.capacity:
+            ts = ts[-self.capacity:]
+            values = values[:, -self.capacity:]
+            count = self.capacity
+        self._reserve(count)
+        self.ts[self.end:self.end + count] = ts
+        self.values[:, self.end:self.end + count] = values
+        self.end += count
+        self.size = min(self.size + count, self.capacity)
+
+    def load(self, klines):
+        """Replace the buffer contents with ``klines``."""
+        self.clear()
+        self.merge(klines)
+
+    def merge(self, klines):
+        """Merge candles sorted by time: overwrite the still-open last candle and append newer ones.
+
+        Returns the number of candles appended.
+        """
+        klines = KlineFrame.ensure(klines)
+        if not klines:
+            return 0
+        ts, values = klines.ts, klines.values
+        last = self.last_timestamp
+        if last is not None:
+            if ts[-1] < last:
+                return 0
+            first_new = int(np.searchsorted(ts, last, side='left'))
+            if first_new < len(ts) and ts[first_new] == last:
+                self.values[:, self.end - 1] = values[:, first_new]
+                first_new += 1
+            ts = ts[first_new:]
+            values = values[:, first_new:]
+        if len(ts):
+            self._append(ts, values)
+        return len(ts)
+
+    def frame(self, limit=None):
+        """Return a copy of the last ``limit`` candles as a KlineFrame."""
+        count = self.size if limit is None else min(limit, self.size)
+        start = self.end - count
+        return KlineFrame(self.ts[start:self.end].copy(), self.values[:, start:self.end].copy())
@@ -1,57 +1,240 @@
+import asyncio
+import struct
+from concurrent.futures import ThreadPoolExecutor
 import ccxt
+import numpy as np
 import pandas as pd
 import redis
-from logging_setup import setup_logging
+import redis.asyncio as aioredis
+from utils.logging_setup import setup_logging
+from utils.api_rate_limiter import ExchangeRateLimiter
+from data_sources.kline_frame import KlineFrame
+from data_sources.ohlcv_store import OHLCVStore
 
 logger = setup_logging('data_utils')
 
-# Redis client for caching
+# Redis clients for caching
 redis_client = redis.Redis(host='localhost', port=6379, db=0)
+async_redis_client = aioredis.Redis(host='localhost', port=6379, db=0)
+rate_limiter = ExchangeRateLimiter()
+history_store = OHLCVStore()
+
+# Binary cache format: header + raw little-endian column buffers
+OHLCV_MAGIC = b'OHLC'
+BOOK_MAGIC = b'BOOK'
+CACHE_VERSION = 1
+OHLCV_HEADER = struct.Struct('<4sHI')  # magic, version, rows
+BOOK_HEADER = struct.Struct('<4sHIIq')  # magic, version, bid rows, ask rows, timestamp
+OHLCV_TTL = 300
+ORDER_BOOK_TTL = 60
+FETCH_WORKERS = 8  # Параллельные REST-запросы синхронного пути; темп всё равно задаёт rate_limiter
+
+def encode_klines(klines) -> bytes:
+    """Serialize candles as a header, an int64 timestamp column and a 5 x n float64 block."""
+    klines = KlineFrame.ensure(klines)
+    return b''.join([
+        OHLCV_HEADER.pack(OHLCV_MAGIC, CACHE_VERSION, len(klines)),
+        klines.ts.astype('<i8', copy=False).tobytes(),
+        klines.values.astype('<f8', copy=False).tobytes(),
+    ])
+
+def decode_klines(payload: bytes) -> KlineFrame:
+    """Deserialize candles with zero-copy np.frombuffer views over the payload."""
+    magic, version, rows = OHLCV_HEADER.unpack_from(payload)
+    if magic != OHLCV_MAGIC or version != CACHE_VERSION:
+        raise ValueError(f"Unsupported OHLCV cache payload: {magic!r} v{version}")
+    offset = OHLCV_HEADER.size
+    ts = np.frombuffer(payload, dtype='<i8', count=rows, offset=offset)
+    values = np.frombuffer(payload, dtype='<f8', count=5 * rows, offset=offset + 8 * rows).reshape(5, rows)
+    return KlineFrame(ts, values)
+
+def encode_order_book(order_book: dict) -> bytes:
+    """Serialize an order book as a header and two n x 2 float64 (price, amount) blocks."""
+    bids = np.asarray([level[:2] for level in order_book['bids']], dtype='<f8').reshape(-1, 2)
+    asks = np.asarray([level[:2] for level in order_book['asks']], dtype='<f8').reshape(-1, 2)
+    timestamp = order_book.get('timestamp') or 0
+    return BOOK_HEADER.pack(BOOK_MAGIC, CACHE_VERSION, len(bids), len(asks), timestamp) + bids.tobytes() + asks.tobytes()
+
+def decode_order_book(payload: bytes, symbol: str = None) -> dict:
+    """Deserialize an order book into the ccxt shape: bids and asks as lists of [price, amount]."""
+    magic, version, bid_rows, ask_rows, timestamp = BOOK_HEADER.unpack_from(payload)
+    if magic != BOOK_MAGIC or version != CACHE_VERSION:
+        raise ValueError(f"Unsupported order book cache payload: {magic!r} v{version}")
+    offset = BOOK_HEADER.size
+    bids = np.frombuffer(payload, dtype='<f8', count=2 * bid_rows, offset=offset).reshape(bid_rows, 2)
+    asks = np.frombuffer(payload, dtype='<f8', count=2 * ask_rows, offset=offset + 16 * bid_rows).reshape(ask_rows, 2)
+    return {'symbol': symbol, 'bids': bids.tolist(), 'asks': asks.tolist(), 'timestamp': timestamp or None}
+
+def klines_to_dataframe(klines: KlineFrame) -> pd.DataFrame:
+    """Build the DataFrame layout used by the analysis code from a KlineFrame."""
+    data = pd.DataFrame({
+        'timestamp': pd.to_datetime(klines.ts, unit='ms'),
+        'open': klines.open,
+        'high': klines.high,
+        'low': klines.low,
+        'close': klines.close,
+        'volume': klines.volume,
+    })
+    data['price'] = data['close']  # Use closing price as the main price
+    return data
+
+def dynamic_limit(market_state: dict, limit: int = None) -> int:
+    """Determine dynamic limit based on market state: higher volatility -> more data."""
+    if limit is None:
+        volatility = market_state['volatility']
+        limit = int(500 * (1 + volatility))
+    return limit
+
+def ohlcv_cache_key(exchange_id: str, symbol: str, timeframe: str, limit: int) -> str:
+    return f"ohlcv:v{CACHE_VERSION}:{exchange_id}:{symbol}:{timeframe}:{limit}"
+
+def history_is_fresh(klines: KlineFrame, limit: int, timeframe_ms: int, now_ms: int) -> bool:
+    return len(klines) >= limit and klines.last_timestamp + 2 * timeframe_ms >= now_ms
+
+def load_klines_batch(exchange: ccxt.Exchange, symbols: list, timeframe: str, limit: int) -> dict:
+    """Read candles of many symbols from the history store and fetch only the missing or stale ones.
+
+    Exchange requests run concurrently in a small thread pool; the history
+    store is read and written from the calling thread only. A symbol whose
+    fetch fails is left out of the result.
+    """
+    timeframe_ms = exchange.parse_timeframe(timeframe) * 1000
+    now_ms = exchange.milliseconds()
+    result = {}
+    stale = []
+    for symbol in symbols:
+        klines = history_store.read(exchange.id, symbol, timeframe, limit=limit)
+        if history_is_fresh(klines, limit, timeframe_ms, now_ms):
+            result[symbol] = klines
+        else:
+            stale.append(symbol)
+
+    def fetch(symbol):
+        return rate_limiter.call_blocking(exchange.id, 'fetch_ohlcv', exchange.fetch_ohlcv, symbol, timeframe, limit=limit)
+
+    with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(stale) or 1)) as executor:
+        futures = [(symbol, executor.submit(fetch, symbol)) for symbol in stale]
+        for symbol, future in futures:
+            try:
+                ohlcv = future.result()
+            except Exception as e:
+                logger.warning(f"Failed to load {symbol} from {exchange.id}: {str(e)}")
+                continue
+            history_store.append(exchange.id, symbol, timeframe, ohlcv)
+            result[symbol] = history_store.read(exchange.id, symbol, timeframe, limit=limit)
+    logger.info(f"Loaded candles for {len(result)} of {len(symbols)} symbols ({len(symbols) - len(stale)} from history store)")
+    return result
+
+def load_klines(exchange: ccxt.Exchange, symbol: str, timeframe: str, limit: int) -> KlineFrame:
+    """Read candles from the local history store, going to the exchange only if they are missing or stale."""
+    klines = history_store.read(exchange.id, symbol, timeframe, limit=limit)
+    timeframe_ms = exchange.parse_timeframe(timeframe) * 1000
+    if history_is_fresh(klines, limit, timeframe_ms, exchange.milliseconds()):
+        logger.info(f"Loaded {len(klines)} candles for {symbol} from history store")
+        return klines
+    ohlcv = rate_limiter.call_blocking(exchange.id, 'fetch_ohlcv', exchange.fetch_ohlcv, symbol, timeframe, limit=limit)
+    logger.info(f"Loaded {len(ohlcv)} candles for {symbol} from {exchange.id}")
+    history_store.append(exchange.id, symbol, timeframe, ohlcv)
+    return history_store.read(exchange.id, symbol, timeframe, limit=limit)
 
 def load_historical_data(exchange: ccxt.Exchange, symbol: str, timeframe: str, market_state: dict, limit: int = None) -> pd.DataFrame:
     """Load historical data for a symbol from an exchange with dynamic limit and caching."""
     try:
-        # Determine dynamic limit based on market state
-        if limit is None:
-            volatility = market_state['volatility']
-            limit = int(500 * (1 + volatility))  # Higher volatility -> more data
+        limit = dynamic_limit(market_state, limit)
 
         # Check cache
-        cache_key = f"ohlcv:{symbol}:{timeframe}:{limit}"
+        cache_key = ohlcv_cache_key(exchange.id, symbol, timeframe, limit)
         cached_data = redis_client.get(cache_key)
         if cached_data:
             logger.info(f"Loaded {symbol} OHLCV data from cache")
-            return pd.read_pickle(cached_data)
+            return klines_to_dataframe(decode_klines(cached_data))
 
-        # Fetch data
-        ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
-        logger.info(f"Loaded {len(ohlcv)} candles for {symbol} from {exchange.id}")
-
-        # Convert to DataFrame
-        data = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        data['timestamp'] = pd.to_datetime(data['timestamp'], unit='ms')
-        data['price'] = data['close']  # Use closing price as the main price
+        klines = load_klines(exchange, symbol, timeframe, limit)
 
         # Cache the data for 5 minutes
-        redis_client.setex(cache_key, 300, data.to_pickle())
-        return data
+        redis_client.setex(cache_key, OHLCV_TTL, encode_klines(klines))
+        return klines_to_dataframe(klines)
     except Exception as e:
         logger.error(f"Failed to load data for {symbol} from {exchange.id}: {str(e)}")
         raise
 
 def load_multiple_symbols(exchange: ccxt.Exchange, symbols: list, timeframe: str, market_state: dict, limit: int = None) -> dict:
-    """Load historical data for multiple symbols."""
+    """Load historical data for multiple symbols with one MGET, one batch of fetches and one pipelined SETEX."""
     try:
+        limit = dynamic_limit(market_state, limit)
+        keys = [ohlcv_cache_key(exchange.id, symbol, timeframe, limit) for symbol in symbols]
+        payloads = redis_client.mget(keys)
+
         data_dict = {}
-        for symbol in symbols:
-            data = load_historical_data(exchange, symbol, timeframe, market_state, limit)
-            data_dict[symbol] = data
-        logger.info(f"Loaded data for {len(symbols)} symbols")
+        misses = []
+        for symbol, payload in zip(symbols, payloads):
+            if payload:
+                data_dict[symbol] = klines_to_dataframe(decode_klines(payload))
+            else:
+                misses.append(symbol)
+
+        loaded = load_klines_batch(exchange, misses, timeframe, limit) if misses else {}
+        pipe = redis_client.pipeline(transaction=False)
+        for symbol, klines in loaded.items():
+            pipe.setex(ohlcv_cache_key(exchange.id, symbol, timeframe, limit), OHLCV_TTL, encode_klines(klines))
+            data_dict[symbol] = klines_to_dataframe(klines)
+        pipe.execute()
+        logger.info(f"Loaded data for {len(data_dict)} symbols ({len(symbols) - len(misses)} from cache)")
         return data_dict
     except Exception as e:
         logger.error(f"Failed to load data for multiple symbols: {str(e)}")
         raise
 
+async def load_multiple_symbols_async(exchange, symbols: list, timeframe: str, market_state: dict, limit: int = None) -> dict:
+    """Load KlineFrames for many symbols without blocking the event loop.
+
+    ``exchange`` is a ccxt.async_support client. Cached symbols come from one
+    MGET, misses are fetched concurrently through the rate limiter and written
+    back with one pipelined SETEX.
+    """
+    try:
+        limit = dynamic_limit(market_state, limit)
+        keys = [ohlcv_cache_key(exchange.id, symbol, timeframe, limit) for symbol in symbols]
+        payloads = await async_redis_client.mget(keys)
+
+        result = {}
+        misses = []
+        for symbol, payload in zip(symbols, payloads):
+            if payload:
+                result[symbol] = decode_klines(payload)
+            else:
+                misses.append(symbol)
+
+        timeframe_ms = exchange.parse_timeframe(timeframe) * 1000
+
+        async def fetch(symbol):
+            klines = history_store.read(exchange.id, symbol, timeframe, limit=limit)
+            if history_is_fresh(klines, limit, timeframe_ms, exchange.milliseconds()):
+                return klines
+            ohlcv = await rate_limiter.call(exchange.id, 'fetch_ohlcv', exchange.fetch_ohlcv, symbol, timeframe, limit=limit)
+            history_store.append(exchange.id, symbol, timeframe, ohlcv)
+            return KlineFrame.from_ohlcv(ohlcv)
+
+        fetched = await asyncio.gather(*[fetch(symbol) for symbol in misses], return_exceptions=True)
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            for symbol, klines in zip(misses, fetched):
+                if isinstance(klines, Exception):
+                    logger.warning(f"Failed to load {symbol} from {exchange.id}: {str(klines)}")
+                    continue
+                result[symbol] = klines
+                pipe.setex(ohlcv_cache_key(exchange.id, symbol, timeframe, limit), OHLCV_TTL, encode_klines(klines))
+            await pipe.execute()
+        logger.info(f"Loaded data for {len(result)} symbols ({len(symbols) - len(misses)} from cache)")
+        return result
+    except Exception as e:
+        logger.error(f"Failed to load data for multiple symbols: {str(e)}")
+        raise
+
+async def load_historical_data_async(exchange, symbol: str, timeframe: str, market_state: dict, limit: int = None) -> KlineFrame:
+    """Async single-symbol variant of load_historical_data returning a KlineFrame."""
+    result = await load_multiple_symbols_async(exchange, [symbol], timeframe, market_state, limit)
+    return result.get(symbol)
+
 def load_order_book(exchange: ccxt.Exchange, symbol: str, market_state: dict, limit: int = None) -> dict:
     """Load order book data for a symbol with dynamic limit and caching."""
     try:
@@ -61,18 +244,18 @@ def load_order_book(exchange: ccxt.Exchange, symbol: str, market_state: dict, li
             limit = int(10 * (1 + volatility))  # Higher volatility -> more depth
 
         # Check cache
-        cache_key = f"order_book:{symbol}:{limit}"
+        cache_key = f"order_book:v{CACHE_VERSION}:{exchange.id}:{symbol}:{limit}"
         cached_data = redis_client.get(cache_key)
         if cached_data:
             logger.info(f"Loaded {symbol} order book from cache")
-            return pd.read_pickle(cached_data)
+            return decode_order_book(cached_data, symbol)
 
         # Fetch data
-        order_book = exchange.fetch_order_book(symbol, limit=limit)
+        order_book = rate_limiter.call_blocking(exchange.id, 'fetch_order_book', exchange.fetch_order_book, symbol, limit=limit)
         logger.info(f"Loaded order book for {symbol} from {exchange.id}")
 
         # Cache the data for 1 minute
-        redis_client.setex(cache_key, 60, pd.to_pickle(order_book))
+        redis_client.setex(cache_key, ORDER_BOOK_TTL, encode_order_book(order_book))
         return order_book
     except Exception as e:
         logger.error(f"Failed to load order book for {symbol} from {exchange.id}: {str(e)}")
@@ -1,48 +1,172 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
 import ccxt.async_support as ccxt
 import logging
+from utils.api_rate_limiter import ExchangeRateLimiter
 
 logger = logging.getLogger(__name__)
 
+# Форматы ключей бирж: (биржа, регулярка ключа, регулярка секрета)
+KEY_FORMATS = [
+    ('mexc', r'mx0[A-Za-z0-9]{15}', r'[0-9a-f]{32}'),
+    ('bitget', r'bg_[0-9a-f]{32}', r'[0-9a-f]{64}'),
+    ('coinbase', r'organizations/.+/apiKeys/.+', None),
+    ('binance', r'[A-Za-z0-9]{64}', r'[A-Za-z0-9]{64}'),
+    ('bybit', r'[A-Za-z0-9]{18}', r'[A-Za-z0-9]{36}'),
+    ('kucoin', r'[0-9a-f]{24}', r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'),
+    ('okx', r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', r'[0-9A-F]{32}'),
+    ('htx', r'[0-9a-z]{8}-[0-9a-z]{8}-[0-9a-z]{8}-[0-9a-z]{5}', r'[0-9a-z]{8}-[0-9a-z]{8}-[0-9a-z]{8}-[0-9a-z]{5}'),
+    ('gate', r'[0-9a-f]{32}', r'[0-9a-f]{64}'),
+    ('kraken', r'[A-Za-z0-9+/=]{56}', r'[A-Za-z0-9+/=]{88}'),
+]
+
+# Порядок проверки бирж с одинаково подходящим форматом ключа
+PREFERRED_EXCHANGES = ['binance', 'mexc', 'bybit', 'okx', 'kucoin', 'gate', 'bitget', 'htx', 'kraken', 'coinbase', 'bitstamp', 'huobi']
+
 class ExchangeDetector:
-    def __init__(self):
+    def __init__(self, cache_path='cache/exchange_detector.json', concurrency=10, timeout=10, allowed_exchanges=None):
         self.exchanges = {}
+        # Биржи, которым можно отправлять ключ даже без совпадения формата
+        self.allowed_exchanges = list(allowed_exchanges or [])
+        self.rate_limiter = ExchangeRateLimiter()
+        self.cache_path = cache_path
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.cache = self.load_cache()
 
-    async def detect_exchange(self, api_key, api_secret):
-        logger.info("Detecting exchange for API key")
-        for exchange_id in ccxt.exchanges:
-            exchange = None
-            try:
-                exchange_class = getattr(ccxt, exchange_id)
-                exchange = exchange_class({
-                    'apiKey': api_key,
-                    'secret': api_secret,
-                    'enableRateLimit': True,
-                })
-                # Проверяем, поддерживает ли биржа асинхронные методы
-                if not hasattr(exchange, 'fetch_tickers'):
-                    logger.debug(f"Exchange {exchange_id} does not support fetch_tickers")
+    def load_cache(self):
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Failed to read exchange detection cache: {str(e)}")
+            return {}
+
+    def save_cache(self):
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.cache, f)
+        os.replace(tmp_path, self.cache_path)
+
+    @staticmethod
+    def key_hash(api_key):
+        """Cache key for an API key; the key itself is never written to disk."""
+        return hashlib.sha256(api_key.encode()).hexdigest()
+
+    def probe_order(self, api_key, api_secret):
+        """Exchange ids the key may be sent to: format matches first, then the explicit allowlist.
+
+        The key is never sent to an exchange whose key format does not match
+        unless that exchange is allowlisted, so an unknown format probes nothing.
+        """
+        def rank(exchange_id):
+            for format_id, key_pattern, secret_pattern in KEY_FORMATS:
+                if format_id != exchange_id or not re.fullmatch(key_pattern, api_key or ''):
                     continue
-                
-                # Пробуем получить тикеры для проверки валидности API-ключей
-                tickers = await exchange.fetch_tickers()
-                if tickers:
-                    self.exchanges[exchange_id] = exchange
-                    logger.info(f"Detected exchange: {exchange_id}")
-                    return exchange
-                else:
-                    logger.debug(f"Exchange {exchange_id} returned empty tickers")
+                if secret_pattern is None or re.fullmatch(secret_pattern, api_secret or ''):
+                    return 0
+                return 1
+            return 2
+
+        formats = [format_id for format_id, _, _ in KEY_FORMATS]
+        candidates = [e for e in PREFERRED_EXCHANGES if e in formats] + [e for e in formats if e not in PREFERRED_EXCHANGES]
+        matched = [e for e in candidates if rank(e) < 2 and e in ccxt.exchanges]
+        matched.sort(key=rank)  # sort() устойчив, порядок популярности внутри ранга сохраняется
+        return matched + [e for e in self.allowed_exchanges if e not in matched and e in ccxt.exchanges]
+
+    async def probe(self, exchange_id, api_key, api_secret, passphrase=None):
+        """Return an authenticated client if the key works on this exchange, otherwise None.
+
+        Public endpoints such as fetch_tickers succeed with any key, so the
+        probe calls the private fetch_balance endpoint. OKX, KuCoin and Bitget
+        keys also need the ``passphrase`` chosen when the key was created.
+        """
+        exchange = None
+        matched = False
+        try:
+            exchange_class = getattr(ccxt, exchange_id)
+            config = {
+                'apiKey': api_key,
+                'secret': api_secret,
+                'enableRateLimit': False,
+            }
+            if passphrase:
+                config['password'] = passphrase
+            exchange = exchange_class(config)
+            if not exchange.has.get('fetchBalance'):
+                logger.debug(f"Exchange {exchange_id} does not support fetch_balance")
+                return None
+            await asyncio.wait_for(self.rate_limiter.call(exchange_id, 'fetch_balance', exchange.fetch_balance), self.timeout)
+            matched = True
+            return exchange
+        except asyncio.TimeoutError:
+            logger.debug(f"Exchange {exchange_id} timed out after {self.timeout}s")
+            return None
+        except Exception as e:
+            logger.debug(f"Exchange {exchange_id} not matched: {str(e)}")
+            return None
+        finally:
+            if exchange is not None and not matched:
+                try:
                     await exchange.close()
-            except Exception as e:
-                logger.debug(f"Exchange {exchange_id} not matched: {str(e)}")
-                if exchange:
-                    try:
-                        await exchange.close()
-                        logger.debug(f"Closed connection for {exchange_id} after failure")
-                    except Exception as close_err:
-                        logger.error(f"Failed to close connection for {exchange_id}: {str(close_err)}")
-                continue
-        logger.error("No exchange detected for the provided API key")
-        return None
+                except Exception as close_err:
+                    logger.error(f"Failed to close connection for {exchange_id}: {str(close_err)}")
+
+    async def detect_exchange(self, api_key, api_secret, passphrase=None):
+        logger.info("Detecting exchange for API key")
+        key_hash = self.key_hash(api_key)
+        cached_id = self.cache.get(key_hash)
+        if cached_id:
+            exchange = await self.probe(cached_id, api_key, api_secret, passphrase)
+            if exchange is not None:
+                self.exchanges[cached_id] = exchange
+                logger.info(f"Detected exchange from cache: {cached_id}")
+                return exchange
+            logger.info(f"Cached exchange {cached_id} no longer accepts the key, probing again")
+            del self.cache[key_hash]
+
+        exchange_ids = self.probe_order(api_key, api_secret)
+        if not exchange_ids:
+            logger.error("API key matches no known key format and no exchange is allowlisted, not probing")
+            return None
+        exchange_id, exchange = await self.probe_all(exchange_ids, api_key, api_secret, passphrase)
+        if exchange is None:
+            logger.error(f"No exchange detected for the provided API key among {', '.join(exchange_ids)}")
+            self.save_cache()
+            return None
+        self.exchanges[exchange_id] = exchange
+        self.cache[key_hash] = exchange_id
+        self.save_cache()
+        logger.info(f"Detected exchange: {exchange_id}")
+        return exchange
+
+    async def probe_all(self, exchange_ids, api_key, api_secret, passphrase=None):
+        """Probe exchanges with at most ``concurrency`` in flight and cancel the rest on the first match."""
+        pending = {}
+        queue = list(exchange_ids)
+        try:
+            while queue or pending:
+                while queue and len(pending) < self.concurrency:
+                    exchange_id = queue.pop(0)
+                    pending[asyncio.create_task(self.probe(exchange_id, api_key, api_secret, passphrase))] = exchange_id
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                matches = [(pending.pop(task), task.result()) for task in done]
+                matches = [(exchange_id, exchange) for exchange_id, exchange in matches if exchange is not None]
+                for _, extra in matches[1:]:
+                    await extra.close()
+                if matches:
+                    return matches[0]
+            return None, None
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
 
     async def close(self):
         """
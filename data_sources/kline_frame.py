@@ -0,0 +1,152 @@
+import numpy as np
+
+OHLCV_COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+def stack_frames(frames, length):
+    """Align the last ``length`` candles of many frames into a (5, frames, length) matrix.
+
+    Shorter histories are left-padded with NaN, so column -1 is every
+    symbol's latest candle.
+    """
+    matrix = np.full((5, len(frames), length), np.nan)
+    for i, frame in enumerate(frames):
+        frame = KlineFrame.ensure(frame).tail(length)
+        if len(frame):
+            matrix[:, i, length - len(frame):] = frame.values
+    return matrix
+
+class KlineFrame:
+    """Columnar OHLCV candles backed by contiguous NumPy arrays.
+
+    Timestamps are kept as int64 milliseconds, prices and volume as rows of one
+    float64 block so every column is a contiguous, zero-copy view. Indexing a
+    single row still returns a ccxt-style ``[ts, o, h, l, c, v]`` list, so code
+    written against the raw ``fetch_ohlcv`` output keeps working.
+    """
+
+    __slots__ = ('ts', 'values')
+
+    def __init__(self, ts, values):
+        self.ts = ts
+        self.values = values
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, dtype=np.int64), np.empty((5, 0), dtype=np.float64))
+
+    @classmethod
+    def from_ohlcv(cls, rows):
+        """Build a frame from ccxt ``fetch_ohlcv`` output (list of lists)."""
+        if rows is None or len(rows) == 0:
+            return cls.empty()
+        data = np.asarray(rows, dtype=np.float64)
+        ts = data[:, 0].astype(np.int64)
+        values = np.ascontiguousarray(data[:, 1:6].T)
+        return cls(ts, values)
+
+    @classmethod
+    def from_records(cls, records):
+        """Build a frame from a list of dicts with OHLCV keys."""
+        if not records:
+            return cls.empty()
+        ts = np.fromiter((r['timestamp'] for r in records), dtype=np.int64, count=len(records))
+        values = np.empty((5, len(records)), dtype=np.float64)
+        for i, column in enumerate(PRICE_COLUMNS):
+            values[i] = np.fromiter((r[column] for r in records), dtype=np.float64, count=len(records))
+        return cls(ts, values)
+
+    @classmethod
+    def from_columns(cls, ts, open, high, low, close, volume):
+        """Build a frame from separate column arrays."""
+        ts = np.ascontiguousarray(ts, dtype=np.int64)
+        values = np.vstack([
+            np.asarray(open, dtype=np.float64),
+            np.asarray(high, dtype=np.float64),
+            np.asarray(low, dtype=np.float64),
+            np.asarray(close, dtype=np.float64),
+            np.asarray(volume, dtype=np.float64),
+        ])
+        return cls(ts, values)
+
+    @classmethod
+    def ensure(cls, klines):
+        """Return ``klines`` as a KlineFrame, converting list-of-lists or list-of-dicts."""
+        if isinstance(klines, cls):
+            return klines
+        if klines is None or len(klines) == 0:
+            return cls.empty()
+        if isinstance(klines[0], dict):
+            return cls.from_records(klines)
+        return cls.from_ohlcv(klines)
+
+    @property
+    def timestamp(self):
+        return self.ts
+
+    @property
+    def open(self):
+        return self.values[0]
+
+    @property
+    def high(self):
+        return self.values[1]
+
+    @property
+    def low(self):
+        return self.values[2]
+
+    @property
+    def close(self):
+        return self.values[3]
+
+    @property
+    def volume(self):
+        return self.values[4]
+
+    @property
+    def last_timestamp(self):
+        return int(self.ts[-1]) if len(self.ts) else None
+
+    def tail(self, n):
+        """Return a view on the last ``n`` candles."""
+        if n <= 0:
+            return KlineFrame.empty()  # ts[-0:] был бы весь массив
+        if n >= len(self.ts):
+            return self
+        return KlineFrame(self.ts[-n:], self.values[:, -n:])
+
+    def column(self, name):
+        if name == 'timestamp':
+            return self.ts
+        return self.values[PRICE_COLUMNS.index(name)]
+
+    def row(self, i):
+        return [int(self.ts[i])] + self.values[:, i].tolist()
+
+    def to_ohlcv(self):
+        """Convert back to ccxt list-of-lists."""
+        return [[int(t), o, h, l, c, v] for t, (o, h, l, c, v) in zip(self.ts.tolist(), self.values.T.tolist())]
+
+    def to_records(self):
+        """Convert to a list of dicts with OHLCV keys."""
+        return [dict(zip(OHLCV_COLUMNS, row)) for row in self.to_ohlcv()]
+
+    def __len__(self):
+        return len(self.ts)
+
+    def __bool__(self):
+        return len(self.ts) > 0
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.column(key)
+        if isinstance(key, slice):
+            return KlineFrame(self.ts[key], self.values[:, key])
+        return self.row(key)
+
+    def __iter__(self):
+        return iter(self.to_ohlcv())
+
+    def __repr__(self):
+        return f"KlineFrame(len={len(self)}, last_timestamp={self.last_timestamp})"
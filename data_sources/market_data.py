@@ -1,8 +1,14 @@
 import asyncio
+import time
 import ccxt.async_support as ccxt
 from utils.logging_setup import setup_logging
-import os
-from asyncio import Semaphore
+from data_sources.kline_frame import KlineFrame
+from data_sources.candle_buffer import CandleRingBuffer
+from data_sources.candle_resampler import CandleResampler
+from data_sources.price_board import PriceBoard
+from data_sources.market_metadata import MarketMetadataService
+from exchange_pool import ExchangePool
+from utils.api_rate_limiter import ExchangeRateLimiter
 
 class AsyncMarketData:
     _instance = None
@@ -13,36 +19,40 @@ class AsyncMarketData:
             cls._instance.exchanges = {}
             cls._instance.symbol_cache = {}
             cls._instance.logger = setup_logging('market_data')
-            cls._instance.semaphore = Semaphore(10)  # Лимит на 10 одновременных запросов
+            cls._instance.rate_limiter = ExchangeRateLimiter()  # Корзины токенов по биржам и эндпоинтам
+            cls._instance.cache_ttl = 30  # Секунды, в течение которых свечи считаются свежими
+            cls._instance.kline_cache = {}  # (exchange, symbol, timeframe) -> (KlineFrame, expires_at)
+            cls._instance.inflight = {}  # (exchange, symbol, timeframe) -> (future, limit)
+            cls._instance.cache_stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'resampled': 0}
+            cls._instance.buffers = {}  # (exchange, symbol, timeframe) -> CandleRingBuffer
+            cls._instance.buffer_capacity = 256
+            cls._instance.max_sync_candles = 500  # Больший разрыв загружается заново целиком
+            cls._instance.streamed = set()  # Ключи буферов, которые обновляет WebSocketManager
+            cls._instance.ticker_cache = {}  # exchange -> (tickers, expires_at)
+            cls._instance.price_board = PriceBoard()  # Последние цены для проверок без сетевых запросов
+            cls._instance.history_store = None  # OHLCVStore для тёплого старта и сохранения свечей
+            cls._instance.index_flush_interval = 60  # Секунды между записями индекса history_store на диск
+            cls._instance.index_flushed_at = time.time()
+            cls._instance.metadata = MarketMetadataService()  # Рынки и таймфреймы с диска, обновляются в фоне
+            cls._instance.exchange_pool = ExchangePool()  # Клиенты бирж, общие с исполнением ордеров
+            cls._instance.resamplers = {}  # (exchange, symbol) -> CandleResampler от базовых 1m свечей
+            cls._instance.derived = {}  # (exchange, symbol, timeframe) -> базовый ключ буфера
+            cls._instance.resample_base = '1m'
+            cls._instance.resample_targets = ('3m', '5m', '15m', '30m', '1h', '4h')
         return cls._instance
 
     async def initialize_exchange(self, exchange_name):
         """Initialize an exchange asynchronously."""
         try:
             if exchange_name not in self.exchanges:
-                exchange_class = getattr(ccxt, exchange_name, None)
-                if exchange_class is None:
+                if getattr(ccxt, exchange_name, None) is None:
                     self.logger.warning(f"Exchange {exchange_name} is not supported by ccxt.async_support, skipping")
                     return False
 
-                # Проверяем наличие API-ключей для биржи
-                api_key = os.getenv(f"{exchange_name.upper()}_API_KEY")
-                api_secret = os.getenv(f"{exchange_name.upper()}_API_SECRET")
-                if api_key and api_secret:
-                    self.exchanges[exchange_name] = exchange_class({
-                        'enableRateLimit': True,
-                        'apiKey': api_key,
-                        'secret': api_secret,
-                    })
-                    self.logger.info(f"Initialized {exchange_name} with API keys")
-                else:
-                    self.exchanges[exchange_name] = exchange_class({
-                        'enableRateLimit': True,
-                    })
-                    self.logger.info(f"Initialized {exchange_name} without API keys (public access only)")
-
+                # Общий клиент из пула: те же соединения и рынки, что и у TradeExecutor
                 try:
-                    markets = await self.exchanges[exchange_name].load_markets()
+                    self.exchanges[exchange_name] = await self.exchange_pool.get_exchange(exchange_name)
+                    markets = self.metadata.markets[exchange_name]
                     self.symbol_cache[exchange_name] = set(markets.keys())
                     self.logger.info(f"Successfully initialized {exchange_name} (async) with {len(markets)} markets")
                     return True
@@ -56,12 +66,102 @@ class AsyncMarketData:
             return False
 
     async def fetch_klines_with_semaphore(self, symbol, timeframe, limit, exchange_name):
-        """Fetch klines with semaphore to limit concurrent requests."""
-        async with self.semaphore:
-            return await self.get_klines(symbol, timeframe, limit, exchange_name)
+        """Fetch klines; network requests are throttled by the per-exchange rate limiter inside the fetch path."""
+        return await self.get_klines(symbol, timeframe, limit, exchange_name)
+
+    def cache_expiry(self, klines, timeframe):
+        """Return when cached klines go stale: after the TTL or when the open candle closes."""
+        expires_at = time.time() + self.cache_ttl
+        if klines:
+            candle_close = (klines.last_timestamp + ccxt.Exchange.parse_timeframe(timeframe) * 1000) / 1000
+            expires_at = min(expires_at, candle_close)
+        return expires_at
+
+    def get_cache_stats(self):
+        """Return hit/miss/coalesce counters of the kline cache."""
+        stats = dict(self.cache_stats)
+        total = stats['hits'] + stats['misses'] + stats['coalesced']
+        stats['requests_saved'] = stats['hits'] + stats['coalesced']
+        stats['hit_rate'] = stats['requests_saved'] / total if total else 0.0
+        return stats
 
     async def get_klines(self, symbol, timeframe, limit, exchange_name):
-        """Fetch klines asynchronously."""
+        """Return klines as a KlineFrame, served from cache or a shared in-flight request when possible."""
+        symbol = symbol.split(':')[0]
+        key = (exchange_name, symbol, timeframe)
+
+        buffer = self.buffers.get(key)
+        if key in self.streamed and buffer is not None and len(buffer) >= limit:
+            self.cache_stats['hits'] += 1
+            return buffer.frame(limit)
+
+        base_key = self.derived.get(key)
+        if base_key is not None and buffer is not None and len(buffer) >= limit:
+            # Старший таймфрейм считается локально: достаточно обновить базовые свечи
+            self.cache_stats['resampled'] += 1
+            if base_key not in self.streamed:
+                await self.get_klines(symbol, self.resample_base, 2, exchange_name)
+            return buffer.frame(limit)
+
+        cached = self.kline_cache.get(key)
+        if cached is not None:
+            klines, cached_limit, expires_at = cached
+            # Короткая история (новый листинг) меньше limit, поэтому сравниваем с запрошенным limit, а не с длиной
+            if time.time() < expires_at and limit <= cached_limit:
+                self.cache_stats['hits'] += 1
+                return klines.tail(limit)
+            if time.time() >= expires_at:
+                self.kline_cache.pop(key, None)
+
+        pending = self.inflight.get(key)
+        if pending is not None and pending[1] >= limit:
+            self.cache_stats['coalesced'] += 1
+            klines = await asyncio.shield(pending[0])
+            return klines.tail(limit) if klines is not None else None
+
+        self.cache_stats['misses'] += 1
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = (future, limit)
+        klines = None
+        try:
+            klines = await self.fetch_klines(symbol, timeframe, limit, exchange_name)
+            if klines:
+                self.kline_cache[key] = (klines, limit, self.cache_expiry(klines, timeframe))
+            return klines
+        finally:
+            if not future.done():
+                future.set_result(klines)
+            pending = self.inflight.get(key)
+            if pending is not None and pending[0] is future:
+                del self.inflight[key]
+
+    def set_streamed(self, exchange_name, symbol, timeframe, live):
+        """Mark a candle buffer as kept current by a live stream (or not any more)."""
+        key = (exchange_name, symbol.split(':')[0], timeframe)
+        keys = [key] + [derived for derived, base_key in self.derived.items() if base_key == key]
+        for key in keys:
+            if live:
+                self.streamed.add(key)
+            else:
+                self.streamed.discard(key)
+
+    def apply_stream_kline(self, exchange_name, symbol, timeframe, row):
+        """Merge one streamed candle ``[ts, o, h, l, c, v]`` into its ring buffer."""
+        key = (exchange_name, symbol.split(':')[0], timeframe)
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            buffer = CandleRingBuffer(self.buffer_capacity)
+            self.buffers[key] = buffer
+        buffer.merge([row])
+        self.kline_cache.pop(key, None)
+        self.update_resampler(key, [row])
+
+    async def fetch_klines(self, symbol, timeframe, limit, exchange_name):
+        """Fetch klines from the exchange and return them as a KlineFrame.
+
+        After the first load only candles newer than the last buffered one are
+        requested; the still-open candle is overwritten in the ring buffer.
+        """
         try:
             if exchange_name not in self.exchanges:
                 success = await self.initialize_exchange(exchange_name)
@@ -69,29 +169,197 @@ class AsyncMarketData:
                     self.logger.warning(f"Skipping {exchange_name} as it could not be initialized")
                     return None
 
-            symbol = symbol.split(':')[0]
-
             if symbol not in self.symbol_cache.get(exchange_name, set()):
                 self.logger.warning(f"Symbol {symbol} not found on {exchange_name}, skipping")
                 return None
 
-            self.logger.info(f"Calling fetch_ohlcv for {symbol} on {exchange_name}, exchange type: {type(self.exchanges[exchange_name])}")
-            klines = await self.exchanges[exchange_name].fetch_ohlcv(symbol, timeframe, limit=limit)
-            self.logger.info(f"fetch_ohlcv result for {symbol} on {exchange_name}: {type(klines)}")
+            key = (exchange_name, symbol, timeframe)
+            exchange = self.exchanges[exchange_name]
+            buffer = self.buffers.get(key)
+            if buffer is None and self.history_store is not None:
+                buffer = self.warm_start(key, limit)
+            if buffer is not None and len(buffer) >= limit:
+                if await self.sync_buffer(key, buffer) is not None:
+                    return buffer.frame(limit)
+
+            self.logger.info(f"Calling fetch_ohlcv for {symbol} on {exchange_name}, exchange type: {type(exchange)}")
+            ohlcv = await self.rate_limiter.call(exchange_name, 'fetch_ohlcv', exchange.fetch_ohlcv, symbol, timeframe, limit=limit)
+            klines = KlineFrame.from_ohlcv(ohlcv)
+            self.logger.info(f"fetch_ohlcv result for {symbol} on {exchange_name}: {len(klines)} candles")
+
+            if buffer is None or buffer.capacity < limit:
+                buffer = CandleRingBuffer(max(self.buffer_capacity, limit))
+                self.buffers[key] = buffer
+                resampler = self.resamplers.get((exchange_name, symbol))
+                if resampler is not None and timeframe in resampler.buffers:
+                    resampler.buffers[timeframe] = buffer
+            buffer.load(klines)
+            self.persist(key, klines)
+            self.update_resampler(key, klines)
             return klines
         except Exception as e:
+            if self.exchange_pool.report_failure(self.exchanges.get(exchange_name), e):
+                self.exchanges.pop(exchange_name, None)  # Следующий запрос получит пересозданный клиент из пула
             self.logger.error(f"Failed to fetch klines for {symbol} on {exchange_name}: {str(e)}")
             return None
 
+    async def sync_buffer(self, key, buffer):
+        """Fetch candles since the last buffered one and merge them; None when the gap is too large to sync."""
+        exchange_name, symbol, timeframe = key
+        timeframe_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        missing = (int(time.time() * 1000) - buffer.last_timestamp) // timeframe_ms + 1
+        if missing > self.max_sync_candles:
+            return None
+        ohlcv = await self.rate_limiter.call(exchange_name, 'fetch_ohlcv', self.exchanges[exchange_name].fetch_ohlcv,
+                                             symbol, timeframe, since=buffer.last_timestamp, limit=missing + 1)
+        received = KlineFrame.from_ohlcv(ohlcv)
+        appended = buffer.merge(received)
+        self.persist(key, received)
+        self.update_resampler(key, received)
+        self.kline_cache.pop(key, None)
+        self.logger.info(f"Synced {symbol} on {exchange_name}: {len(ohlcv)} candles received, {appended} new")
+        return appended
+
+    async def resync(self, exchange_name, symbol, timeframe):
+        """Backfill a candle buffer from its last candle over REST, e.g. before a reconnected stream takes over again.
+
+        The ring buffer only appends candles newer than its last one, so
+        candles missed during an outage must be fetched before the stream
+        delivers newer ones, or they stay holes.
+        """
+        key = (exchange_name, symbol.split(':')[0], timeframe)
+        buffer = self.buffers.get(key)
+        if buffer is None or buffer.last_timestamp is None:
+            return
+        try:
+            if exchange_name not in self.exchanges and not await self.initialize_exchange(exchange_name):
+                return
+            if await self.sync_buffer(key, buffer) is None:
+                await self.fetch_klines(key[1], timeframe, len(buffer), exchange_name)  # Разрыв слишком большой — загружаем заново
+        except Exception as e:
+            self.logger.error(f"Failed to resync {symbol} {timeframe} on {exchange_name}: {str(e)}")
+
+    async def enable_resampling(self, symbol, exchange_name, targets=None, limit=None):
+        """Derive higher timeframes of a symbol locally from its base 1m candles.
+
+        Each target buffer is seeded once with at least ``limit`` candles
+        (history store or one REST request); after that it follows the base
+        series, streamed or polled, without requests of its own.
+        """
+        symbol = symbol.split(':')[0]
+        targets = tuple(targets or self.resample_targets)
+        buffers = {}
+        for target in targets:
+            key = (exchange_name, symbol, target)
+            if self.buffers.get(key) is None or len(self.buffers[key]) < (limit or 0):
+                await self.get_klines(symbol, target, max(self.buffer_capacity, limit or 0), exchange_name)
+            buffers[target] = self.buffers.get(key) or CandleRingBuffer(self.buffer_capacity)
+            self.buffers[key] = buffers[target]
+        resampler = CandleResampler(self.resample_base, targets, self.buffer_capacity, buffers)
+        base_klines = await self.get_klines(symbol, self.resample_base, resampler.base.capacity, exchange_name)
+        if base_klines:
+            resampler.base.load(base_klines)
+            resampler.update(base_klines.tail(1))
+        self.resamplers[(exchange_name, symbol)] = resampler
+        base_key = (exchange_name, symbol, self.resample_base)
+        for target in targets:
+            self.derived[(exchange_name, symbol, target)] = base_key
+            if base_key in self.streamed:
+                self.streamed.add((exchange_name, symbol, target))
+        self.logger.info(f"Resampling {', '.join(targets)} for {symbol} on {exchange_name} from {self.resample_base}")
+        return resampler
+
+    def update_resampler(self, key, klines):
+        """Feed new base candles into the symbol's resampler, if there is one."""
+        exchange_name, symbol, timeframe = key
+        resampler = self.resamplers.get((exchange_name, symbol))
+        if resampler is None or timeframe != resampler.base_timeframe:
+            return
+        for target in resampler.update(klines):
+            self.kline_cache.pop((exchange_name, symbol, target), None)
+
+    def warm_start(self, key, limit):
+        """Seed a candle buffer from the on-disk history store so only the gap is fetched."""
+        exchange_name, symbol, timeframe = key
+        capacity = max(self.buffer_capacity, limit)
+        history = self.history_store.read(exchange_name, symbol, timeframe, limit=capacity)
+        if len(history) < limit:
+            return None
+        buffer = CandleRingBuffer(capacity)
+        buffer.load(history)
+        self.buffers[key] = buffer
+        self.logger.info(f"Warm-started {symbol} on {exchange_name} from history store with {len(history)} candles")
+        return buffer
+
+    def persist(self, key, klines):
+        """Append fetched candles to the history store, if one is attached."""
+        if self.history_store is None or not klines:
+            return
+        try:
+            self.history_store.append(*key, klines)
+        except Exception as e:
+            self.logger.warning(f"Failed to persist candles for {key}: {str(e)}")
+        if time.time() - self.index_flushed_at >= self.index_flush_interval:
+            self.flush_history()
+
+    def flush_history(self):
+        """Write the history store index to disk, so a restart does not reopen every series to rebuild it."""
+        if self.history_store is None:
+            return
+        self.index_flushed_at = time.time()
+        try:
+            self.history_store.flush_index()
+        except Exception as e:
+            self.logger.warning(f"Failed to flush history store index: {str(e)}")
+
+    async def get_tickers(self, exchange_name):
+        """Fetch one fetch_tickers() snapshot for all symbols of an exchange (cached for cache_ttl)."""
+        try:
+            cached = self.ticker_cache.get(exchange_name)
+            if cached is not None and time.time() < cached[1]:
+                return cached[0]
+
+            if exchange_name not in self.exchanges:
+                success = await self.initialize_exchange(exchange_name)
+                if not success:
+                    self.logger.warning(f"Skipping {exchange_name} as it could not be initialized")
+                    return {}
+
+            tickers = await self.rate_limiter.call(exchange_name, 'fetch_tickers', self.exchanges[exchange_name].fetch_tickers)
+            self.ticker_cache[exchange_name] = (tickers, time.time() + self.cache_ttl)
+            self.price_board.update_tickers(exchange_name, tickers)
+            self.logger.info(f"Fetched {len(tickers)} tickers from {exchange_name}")
+            return tickers
+        except Exception as e:
+            self.logger.error(f"Failed to fetch tickers on {exchange_name}: {str(e)}")
+            return {}
+
+    async def get_symbols(self, exchange_name):
+        """Return active symbols of an exchange from the market metadata cache."""
+        if exchange_name not in self.exchanges and not await self.initialize_exchange(exchange_name):
+            return []
+        return self.metadata.get_symbols(exchange_name)
+
+    async def get_supported_timeframes(self, exchange_name, symbol=None):
+        """Return timeframes supported by an exchange from the market metadata cache."""
+        if exchange_name not in self.exchanges and not await self.initialize_exchange(exchange_name):
+            return []
+        return self.metadata.get_timeframes(exchange_name)
+
     async def close(self):
         """Close all exchange connections asynchronously."""
         try:
-            for exchange_name, exchange in self.exchanges.items():
-                self.logger.info(f"Closing connection for {exchange_name} (async)")
-                await exchange.close()
-                self.logger.info(f"Closed connection for {exchange_name} (async)")
+            self.flush_history()
+            await self.metadata.close()
+            await self.exchange_pool.close()  # Клиенты принадлежат пулу, закрываем их там
             self.exchanges.clear()
             self.symbol_cache.clear()
+            self.kline_cache.clear()
+            self.buffers.clear()
+            self.streamed.clear()
+            self.resamplers.clear()
+            self.derived.clear()
+            self.ticker_cache.clear()
             self.logger.info("All exchanges cleared")
         except Exception as e:
             self.logger.error(f"Failed to close exchanges: {str(e)}")
@@ -0,0 +1,166 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import json
+import time
+from utils.logging_setup import setup_logging
+from utils.api_rate_limiter import ExchangeRateLimiter
+
+logger = setup_logging('market_metadata')
+
+class MarketMetadataService:
+    """Markets, precision/limits and timeframes per exchange, persisted to disk and refreshed in the background.
+
+    At startup the last snapshot is read from ``root/<exchange>.json`` and
+    installed into the ccxt client with set_markets(), so no load_markets()
+    round trip is needed. Snapshots older than ``ttl`` seconds are refreshed by
+    a background task; lookups only ever touch in-memory dicts.
+    """
+
+    _instance = None
+
+    def __new__(cls, root='cache/market_metadata', ttl=6 * 60 * 60):
+        if cls._instance is None:
+            cls._instance = super(MarketMetadataService, cls).__new__(cls)
+            cls._instance.root = root
+            cls._instance.ttl = ttl
+            cls._instance.retry_delay = 60
+            cls._instance.markets = {}  # exchange -> {symbol: market}
+            cls._instance.timeframes = {}  # exchange -> [timeframe]
+            cls._instance.symbols = {}  # exchange -> sorted active symbols
+            cls._instance.fetched_at = {}  # exchange -> unix time of the snapshot
+            cls._instance.refresh_tasks = {}  # exchange -> asyncio.Task
+            cls._instance.rate_limiter = ExchangeRateLimiter()
+            os.makedirs(root, exist_ok=True)
+        return cls._instance
+
+    def path(self, exchange_name):
+        return os.path.join(self.root, f"{exchange_name}.json")
+
+    def load(self, exchange_name):
+        """Load the persisted snapshot of an exchange into memory; returns False if there is none."""
+        path = self.path(exchange_name)
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+            # ccxt читает market['info'] при выставлении ордеров, снимок без него в клиент ставить нельзя
+            if any('info' not in market for market in snapshot['markets'].values()):
+                logger.info(f"Market metadata snapshot for {exchange_name} has no raw market info, reloading it")
+                return False
+            self.install(exchange_name, snapshot['markets'], snapshot['timeframes'], snapshot['fetched_at'])
+            logger.info(f"Loaded {len(self.markets[exchange_name])} {exchange_name} markets from {path}")
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to read market metadata for {exchange_name}: {str(e)}")
+            return False
+
+    def save(self, exchange_name):
+        """Persist the in-memory snapshot of an exchange."""
+        snapshot = {
+            'fetched_at': self.fetched_at[exchange_name],
+            'timeframes': self.timeframes[exchange_name],
+            'markets': self.markets[exchange_name],
+        }
+        tmp_path = self.path(exchange_name) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f, default=str)
+        os.replace(tmp_path, self.path(exchange_name))
+
+    def install(self, exchange_name, markets, timeframes, fetched_at):
+        self.markets[exchange_name] = markets
+        self.timeframes[exchange_name] = list(timeframes)
+        self.symbols[exchange_name] = sorted(symbol for symbol, market in markets.items() if market.get('active') is not False)
+        self.fetched_at[exchange_name] = fetched_at
+
+    def is_stale(self, exchange_name):
+        return time.time() - self.fetched_at.get(exchange_name, 0) > self.ttl
+
+    async def refresh(self, exchange_name, exchange):
+        """Reload markets from the exchange, update memory and disk."""
+        markets = await self.rate_limiter.call(exchange_name, 'load_markets', exchange.load_markets, True)
+        # Рынки хранятся целиком, вместе с 'info': снимок потом ставится в клиент через set_markets
+        self.install(exchange_name, dict(markets), (exchange.timeframes or {}).keys(), time.time())
+        self.save(exchange_name)
+        logger.info(f"Refreshed {len(markets)} {exchange_name} markets")
+        return self.markets[exchange_name]
+
+    async def ensure(self, exchange_name, exchange):
+        """Make markets available for an exchange client, from memory or disk if possible.
+
+        Only a cold start without any snapshot waits for the exchange; a stale
+        snapshot is served immediately and refreshed in the background.
+        """
+        if exchange_name not in self.markets and not self.load(exchange_name):
+            await self.refresh(exchange_name, exchange)
+        else:
+            exchange.set_markets(self.markets[exchange_name])
+        self.start_background_refresh(exchange_name)
+        return self.markets[exchange_name]
+
+    def start_background_refresh(self, exchange_name):
+        task = self.refresh_tasks.get(exchange_name)
+        if task is None or task.done():
+            self.refresh_tasks[exchange_name] = asyncio.create_task(self.refresh_loop(exchange_name))
+
+    async def client(self, exchange_name):
+        """Current shared client of an exchange; the pool recreates unhealthy clients, so none is kept between refreshes."""
+        from exchange_pool import ExchangePool  # exchange_pool сам импортирует этот модуль
+        return await ExchangePool().get_exchange(exchange_name)
+
+    async def refresh_loop(self, exchange_name):
+        """Refresh an exchange snapshot every ttl seconds."""
+        while True:
+            delay = max(0, self.fetched_at.get(exchange_name, 0) + self.ttl - time.time())
+            await asyncio.sleep(delay)
+            try:
+                await self.refresh(exchange_name, await self.client(exchange_name))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to refresh market metadata for {exchange_name}: {str(e)}")
+                await asyncio.sleep(self.retry_delay)
+
+    def get_symbols(self, exchange_name):
+        """Active symbols of an exchange."""
+        return self.symbols.get(exchange_name, [])
+
+    def get_market(self, exchange_name, symbol):
+        return self.markets.get(exchange_name, {}).get(symbol)
+
+    def get_timeframes(self, exchange_name):
+        return self.timeframes.get(exchange_name, [])
+
+    def get_precision(self, exchange_name, symbol):
+        market = self.get_market(exchange_name, symbol)
+        return market.get('precision', {}) if market else {}
+
+    def get_limits(self, exchange_name, symbol):
+        market = self.get_market(exchange_name, symbol)
+        return market.get('limits', {}) if market else {}
+
+    async def close(self):
+        """Stop background refresh tasks."""
+        for task in self.refresh_tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.refresh_tasks.values(), return_exceptions=True)
+        self.refresh_tasks.clear()
+
+if __name__ == "__main__":
+    # Test run
+    from data_sources.market_data import AsyncMarketData
+
+    async def main():
+        market_data = AsyncMarketData()
+        start = time.monotonic()
+        await market_data.initialize_exchange('mexc')
+        symbols = await market_data.get_symbols('mexc')
+        timeframes = await market_data.get_supported_timeframes('mexc')
+        print(f"{len(symbols)} symbols, timeframes {timeframes} in {time.monotonic() - start:.2f}s")
+        print(f"BTC/USDT limits: {market_data.metadata.get_limits('mexc', 'BTC/USDT')}")
+        await market_data.close()
+
+    asyncio.run(main())
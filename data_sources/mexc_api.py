@@ -1,20 +1,22 @@
 import ccxt
 from utils.logging_setup import setup_logging
+from utils.api_rate_limiter import ExchangeRateLimiter
 
 logger = setup_logging('mexc_api')
 
 class MEXCAPI:
     def __init__(self):
         self.exchange = ccxt.mexc({
-            'enableRateLimit': True,
+            'enableRateLimit': False,
         })
         logger.info("MEXCAPI initialized")
         self.symbols = None
+        self.rate_limiter = ExchangeRateLimiter()
 
     def fetch_symbols(self):
         """Fetch tradable symbols from MEXC."""
         try:
-            markets = self.exchange.load_markets()
+            markets = self.rate_limiter.call_blocking('mexc', 'load_markets', self.exchange.load_markets)
             symbols = [market['symbol'] for market in markets.values() if market['active']]
             # Удаляем дубликаты и сортируем
             symbols = sorted(list(set(symbols)))
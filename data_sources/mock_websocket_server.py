@@ -0,0 +1,119 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import json
+import random
+import time
+import websockets
+from utils.logging_setup import setup_logging
+
+logger = setup_logging('mock_websocket_server')
+
+class MockExchangeServer:
+    """Local websocket server speaking the Binance stream protocol, for offline testing."""
+
+    def __init__(self, host='localhost', port=8765, interval=0.1, timeframe_ms=60000):
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.timeframe_ms = timeframe_ms
+        self.server = None
+        self.clients = set()
+        self.prices = {}
+        self.candles = {}  # market_id -> [ts, o, h, l, c, v]
+        self.subscriptions_received = 0
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self):
+        self.server = await websockets.serve(self.handle_client, self.host, self.port)
+        logger.info(f"Mock exchange server listening on {self.url}")
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            logger.info("Mock exchange server stopped")
+
+    async def drop_connections(self):
+        """Close every client connection to exercise reconnect logic."""
+        for websocket in list(self.clients):
+            await websocket.close()
+
+    async def handle_client(self, websocket, *args):
+        channels = set()
+        self.clients.add(websocket)
+        publisher = asyncio.create_task(self.publish(websocket, channels))
+        try:
+            async for raw in websocket:
+                request = json.loads(raw)
+                if request.get('method') == 'SUBSCRIBE':
+                    channels.update(request['params'])
+                    self.subscriptions_received += len(request['params'])
+                elif request.get('method') == 'UNSUBSCRIBE':
+                    channels.difference_update(request['params'])
+                await websocket.send(json.dumps({"result": None, "id": request.get('id')}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            publisher.cancel()
+            self.clients.discard(websocket)
+
+    def next_trade(self, market_id):
+        price = self.prices.get(market_id, 100.0) * (1 + random.gauss(0, 0.001))
+        self.prices[market_id] = price
+        amount = round(random.uniform(0.01, 2.0), 4)
+        now = int(time.time() * 1000)
+        start = now - now % self.timeframe_ms
+        candle = self.candles.get(market_id)
+        if candle is None or candle[0] != start:
+            candle = [start, price, price, price, price, 0.0]
+            self.candles[market_id] = candle
+        candle[2] = max(candle[2], price)
+        candle[3] = min(candle[3], price)
+        candle[4] = price
+        candle[5] += amount
+        return price, amount, now
+
+    async def publish(self, websocket, channels):
+        """Emit a trade and a kline update for every subscribed symbol each interval."""
+        while True:
+            await asyncio.sleep(self.interval)
+            market_ids = {channel.split('@')[0].upper() for channel in channels}
+            for market_id in market_ids:
+                price, amount, now = self.next_trade(market_id)
+                if f"{market_id.lower()}@trade" in channels:
+                    await websocket.send(json.dumps({"e": "trade", "E": now, "s": market_id, "p": str(price), "q": str(amount), "T": now}))
+                for channel in channels:
+                    if channel.startswith(f"{market_id.lower()}@kline_"):
+                        ts, o, h, l, c, v = self.candles[market_id]
+                        k = {"t": ts, "T": ts + self.timeframe_ms - 1, "s": market_id, "i": channel.split('_', 1)[1],
+                             "o": str(o), "h": str(h), "l": str(l), "c": str(c), "v": str(v), "x": False}
+                        await websocket.send(json.dumps({"e": "kline", "E": now, "s": market_id, "k": k}))
+
+if __name__ == "__main__":
+    # Test run
+    from data_sources.market_data import AsyncMarketData
+    from data_sources.websocket_manager import WebSocketManager, BinanceStreamProtocol
+
+    async def main():
+        server = MockExchangeServer()
+        await server.start()
+        market_data = AsyncMarketData()
+        manager = WebSocketManager(market_data, protocols={'binance': BinanceStreamProtocol(url=server.url)})
+        symbols = [f"SYM{i}/USDT" for i in range(300)]
+        await manager.subscribe_klines('binance', symbols, '1m')
+        await manager.subscribe_trades('binance', symbols)
+        await asyncio.sleep(1)
+        await server.drop_connections()
+        await asyncio.sleep(2)
+        print(f"Stats: {manager.stats}")
+        print(f"Buffer for {symbols[0]}: {market_data.buffers[('binance', symbols[0], '1m')].frame()}")
+        await manager.close()
+        await server.stop()
+
+    asyncio.run(main())
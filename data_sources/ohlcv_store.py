@@ -0,0 +1,187 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import pickle
+import re
+import numpy as np
+from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame, PRICE_COLUMNS
+
+logger = setup_logging('ohlcv_store')
+
+# Одна запись на свечу, little-endian, чтобы файлы читались на любой машине
+RECORD_DTYPE = np.dtype([('ts', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'), ('volume', '<f8')])
+QUOTE_CURRENCIES = ('USDT', 'USDC', 'USD1', 'USDE', 'FDUSD', 'TUSD', 'BUSD', 'DAI', 'EUR', 'BRL', 'TRY', 'BTC', 'ETH', 'BNB', 'MX')
+
+class OHLCVStore:
+    """Append-only candle history with one file per (exchange, symbol, timeframe), read through numpy.memmap.
+
+    Records are sorted by timestamp, so range reads are two binary searches on
+    the memory-mapped timestamp column followed by one slice copy. A small JSON
+    index keeps first/last timestamp and candle count per series.
+    """
+
+    def __init__(self, root='cache/ohlcv'):
+        self.root = root
+        self.index_path = os.path.join(root, 'index.json')
+        self.index = {}
+        os.makedirs(root, exist_ok=True)
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path) as f:
+                    self.index = json.load(f)
+            except Exception as e:
+                logger.warning(f"Failed to read OHLCV index, it will be rebuilt: {str(e)}")
+
+    def series_key(self, exchange_name, symbol, timeframe):
+        return f"{exchange_name}/{timeframe}/{symbol.split(':')[0].replace('/', '_')}"
+
+    def path(self, exchange_name, symbol, timeframe):
+        return os.path.join(self.root, self.series_key(exchange_name, symbol, timeframe) + '.ohlcv')
+
+    def open_series(self, exchange_name, symbol, timeframe):
+        """Memory-map a series read-only; returns None when it does not exist."""
+        path = self.path(exchange_name, symbol, timeframe)
+        if not os.path.exists(path) or os.path.getsize(path) < RECORD_DTYPE.itemsize:
+            return None
+        return np.memmap(path, dtype=RECORD_DTYPE, mode='r')
+
+    def info(self, exchange_name, symbol, timeframe):
+        """Return {'first_ts', 'last_ts', 'count'} for a series, or None."""
+        key = self.series_key(exchange_name, symbol, timeframe)
+        if key not in self.index:
+            records = self.open_series(exchange_name, symbol, timeframe)
+            if records is None:
+                return None
+            self.update_index(key, records)
+        return self.index[key]
+
+    def update_index(self, key, records):
+        self.index[key] = {'first_ts': int(records['ts'][0]), 'last_ts': int(records['ts'][-1]), 'count': len(records)}
+
+    def flush_index(self):
+        """Persist the series index."""
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def read(self, exchange_name, symbol, timeframe, start=None, end=None, limit=None):
+        """Read candles with start <= ts <= end (both optional), keeping at most the last ``limit``."""
+        records = self.open_series(exchange_name, symbol, timeframe)
+        if records is None:
+            return KlineFrame.empty()
+        ts = records['ts']
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side='left'))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, end, side='right'))
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        chunk = records[lo:hi]
+        return KlineFrame(np.array(chunk['ts']), np.vstack([chunk[column] for column in PRICE_COLUMNS]))
+
+    def to_records(self, klines):
+        klines = KlineFrame.ensure(klines)
+        records = np.empty(len(klines), dtype=RECORD_DTYPE)
+        records['ts'] = klines.ts
+        for i, column in enumerate(PRICE_COLUMNS):
+            records[column] = klines.values[i]
+        return records
+
+    def append(self, exchange_name, symbol, timeframe, klines):
+        """Add candles to a series without duplicates; returns the number of new candles.
+
+        Candles newer than the stored ones are appended in place and a candle
+        with the last stored timestamp overwrites it (the still-open candle).
+        Older or interleaved candles trigger a merge that rewrites the file.
+        """
+        incoming = self.to_records(klines)
+        if not len(incoming):
+            return 0
+        if np.any(np.diff(incoming['ts']) <= 0):
+            _, unique = np.unique(incoming['ts'][::-1], return_index=True)
+            incoming = incoming[::-1][unique]  # Сортировка с приоритетом последних значений
+
+        key = self.series_key(exchange_name, symbol, timeframe)
+        path = self.path(exchange_name, symbol, timeframe)
+        existing = self.open_series(exchange_name, symbol, timeframe)
+        if existing is None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            incoming.tofile(path)
+            self.update_index(key, incoming)
+            return len(incoming)
+
+        last_ts = int(existing['ts'][-1])
+        first_new = int(np.searchsorted(incoming['ts'], last_ts, side='left'))
+        if first_new > 0:
+            # Уже сохранённые закрытые свечи пропускаем, новые старые свечи требуют слияния
+            older = incoming['ts'][:first_new]
+            start = int(np.searchsorted(existing['ts'], older[0], side='left'))
+            if not np.isin(older, existing['ts'][start:]).all():
+                return self.merge(exchange_name, symbol, timeframe, existing, incoming)
+            incoming = incoming[first_new:]
+            if not len(incoming):
+                return 0
+
+        added = incoming
+        if incoming['ts'][0] == last_ts:
+            tail = np.memmap(path, dtype=RECORD_DTYPE, mode='r+', offset=(len(existing) - 1) * RECORD_DTYPE.itemsize, shape=(1,))
+            tail[0] = incoming[0]
+            tail.flush()
+            del tail
+            added = incoming[1:]
+        if len(added):
+            with open(path, 'ab') as f:
+                added.tofile(f)
+        self.index[key] = {'first_ts': int(existing['ts'][0]), 'last_ts': int(incoming['ts'][-1]), 'count': len(existing) + len(added)}
+        return len(added)
+
+    def merge(self, exchange_name, symbol, timeframe, existing, incoming):
+        """Rewrite a series as the sorted union of stored and incoming candles (incoming wins)."""
+        key = self.series_key(exchange_name, symbol, timeframe)
+        path = self.path(exchange_name, symbol, timeframe)
+        combined = np.concatenate([incoming, np.array(existing)])
+        _, unique = np.unique(combined['ts'], return_index=True)
+        merged = combined[unique]
+        added = len(merged) - len(existing)
+        tmp_path = path + '.tmp'
+        merged.tofile(tmp_path)
+        del existing
+        os.replace(tmp_path, path)
+        self.update_index(key, merged)
+        return added
+
+    def import_pickle_cache(self, directory='cache/mexc_klines', exchange_name='mexc'):
+        """Fold legacy SYMBOL_TF_LIMIT.pkl files into the store, one series per symbol and timeframe."""
+        pattern = re.compile(r'^(?P<market_id>.+)_(?P<timeframe>\d+[smhdwM])_(?P<limit>\d+)\.pkl$')
+        imported = 0
+        for name in sorted(os.listdir(directory)):
+            match = pattern.match(name)
+            if not match:
+                continue
+            try:
+                with open(os.path.join(directory, name), 'rb') as f:
+                    klines = pickle.load(f)
+                symbol = self.unified_symbol(match.group('market_id'))
+                imported += self.append(exchange_name, symbol, match.group('timeframe'), KlineFrame.ensure(klines))
+            except Exception as e:
+                logger.warning(f"Failed to import {name}: {str(e)}")
+        self.flush_index()
+        logger.info(f"Imported {imported} unique candles from {directory}")
+        return imported
+
+    @staticmethod
+    def unified_symbol(market_id):
+        """Turn an exchange id like BTCUSDT into BTC/USDT when the quote currency is recognised."""
+        for quote in QUOTE_CURRENCIES:
+            if market_id.endswith(quote) and len(market_id) > len(quote):
+                return f"{market_id[:-len(quote)]}/{quote}"
+        return market_id
+
+if __name__ == "__main__":
+    # Test run
+    store = OHLCVStore()
+    store.import_pickle_cache()
+    frame = store.read('mexc', 'BTC/USDT', '1m', limit=10)
+    print(f"BTC/USDT 1m from store: {frame}, index entries: {len(store.index)}")
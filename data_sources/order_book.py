@@ -0,0 +1,290 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import time
+import numpy as np
+from utils.logging_setup import setup_logging
+from utils.api_rate_limiter import ExchangeRateLimiter
+from data_sources.price_board import PriceBoard
+
+logger = setup_logging('order_book')
+
+class BookSide:
+    """Price levels of one side in a sorted array, best level first.
+
+    Bids are keyed by negative price so both sides sort ascending from the
+    best price. Cumulative size and notional are computed lazily once per
+    change and shared by all depth and VWAP queries.
+    """
+
+    def __init__(self, is_bid):
+        self.sign = -1.0 if is_bid else 1.0
+        self.keys = np.empty(0, dtype=np.float64)
+        self.sizes = np.empty(0, dtype=np.float64)
+        self._cumulative = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def prices(self):
+        return self.keys * self.sign
+
+    def load(self, levels):
+        levels = np.asarray(levels, dtype=np.float64).reshape(-1, 2) if len(levels) else np.empty((0, 2))
+        levels = levels[levels[:, 1] > 0]
+        order = np.argsort(levels[:, 0] * self.sign, kind='stable')
+        self.keys = levels[order, 0] * self.sign
+        self.sizes = levels[order, 1]
+        self._cumulative = None
+
+    def update(self, levels):
+        """Apply (price, size) updates; size 0 removes a level. Later updates of the same price win."""
+        if not len(levels):
+            return
+        levels = np.asarray(levels, dtype=np.float64).reshape(-1, 2)
+        keys = levels[::-1, 0] * self.sign
+        keys, first = np.unique(keys, return_index=True)
+        sizes = levels[::-1, 1][first]
+
+        positions = np.searchsorted(self.keys, keys)
+        exists = positions < len(self.keys)
+        exists[exists] = self.keys[positions[exists]] == keys[exists]
+        self.sizes[positions[exists]] = sizes[exists]
+
+        insert = ~exists & (sizes > 0)
+        if insert.any():
+            self.keys = np.insert(self.keys, positions[insert], keys[insert])
+            self.sizes = np.insert(self.sizes, positions[insert], sizes[insert])
+        if (sizes[exists] == 0).any():
+            keep = self.sizes > 0
+            self.keys = self.keys[keep]
+            self.sizes = self.sizes[keep]
+        self._cumulative = None
+
+    def cumulative(self):
+        if self._cumulative is None:
+            prices = self.prices
+            self._cumulative = (np.cumsum(self.sizes), np.cumsum(self.sizes * prices))
+        return self._cumulative
+
+    def best(self):
+        return (float(self.keys[0] * self.sign), float(self.sizes[0])) if len(self.keys) else None
+
+    def depth_to(self, price_limit):
+        """Size and notional of all levels at prices no worse than ``price_limit``."""
+        count = int(np.searchsorted(self.keys, price_limit * self.sign, side='right'))
+        if count == 0:
+            return 0.0, 0.0
+        cum_size, cum_notional = self.cumulative()
+        return float(cum_size[count - 1]), float(cum_notional[count - 1])
+
+    def cost_to_fill(self, amount):
+        """Notional paid or received for ``amount`` walking the book, or None if the book is too thin."""
+        cum_size, cum_notional = self.cumulative()
+        if not len(cum_size) or cum_size[-1] < amount:
+            return None
+        i = int(np.searchsorted(cum_size, amount, side='left'))
+        before_size = cum_size[i - 1] if i else 0.0
+        before_notional = cum_notional[i - 1] if i else 0.0
+        return float(before_notional + (amount - before_size) * self.keys[i] * self.sign)
+
+class LocalOrderBook:
+    """L2 order book for one symbol kept current from a snapshot plus sequenced deltas."""
+
+    def __init__(self, exchange_name, symbol):
+        self.exchange_name = exchange_name
+        self.symbol = symbol
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.sequence = None
+        self.timestamp = None
+        self.synced = False
+        self.updates = 0
+
+    def apply_snapshot(self, bids, asks, sequence=None, timestamp=None):
+        self.bids.load(bids)
+        self.asks.load(asks)
+        self.sequence = sequence
+        self.timestamp = timestamp or int(time.time() * 1000)
+        self.synced = True
+
+    def apply_delta(self, bids, asks, first_sequence=None, last_sequence=None, timestamp=None):
+        """Apply a depth update; returns False and marks the book unsynced on a sequence gap.
+
+        Updates fully covered by the current sequence are ignored, which lets
+        deltas buffered during a snapshot request be replayed blindly.
+        """
+        if not self.synced:
+            return False
+        if self.sequence is not None and last_sequence is not None:
+            if last_sequence <= self.sequence:
+                return True
+            first = last_sequence if first_sequence is None else first_sequence
+            if first > self.sequence + 1:
+                logger.warning(f"Sequence gap on {self.exchange_name} {self.symbol}: expected {self.sequence + 1}, got {first}")
+                self.synced = False
+                return False
+        self.bids.update(bids)
+        self.asks.update(asks)
+        if last_sequence is not None:
+            self.sequence = last_sequence
+        self.timestamp = timestamp or int(time.time() * 1000)
+        self.updates += 1
+        return True
+
+    def best_bid(self):
+        return self.bids.best()
+
+    def best_ask(self):
+        return self.asks.best()
+
+    def mid_price(self):
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return (bid[0] + ask[0]) / 2
+
+    def spread_bps(self):
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return (ask[0] - bid[0]) / ((ask[0] + bid[0]) / 2) * 1e4
+
+    def depth_within(self, bps):
+        """Quote notional on each side within ``bps`` of the mid price: {'bids': ..., 'asks': ...}."""
+        mid = self.mid_price()
+        if mid is None:
+            return {'bids': 0.0, 'asks': 0.0}
+        return {
+            'bids': self.bids.depth_to(mid * (1 - bps / 1e4))[1],
+            'asks': self.asks.depth_to(mid * (1 + bps / 1e4))[1],
+        }
+
+    def vwap(self, side, amount):
+        """Average fill price of a market order of ``amount`` base units ('buy' walks the asks)."""
+        book_side = self.asks if side == 'buy' else self.bids
+        cost = book_side.cost_to_fill(amount)
+        return cost / amount if cost is not None and amount > 0 else None
+
+    def slippage_bps(self, side, amount):
+        """Cost of walking the book versus the best price, in basis points (positive is worse)."""
+        book_side = self.asks if side == 'buy' else self.bids
+        best, average = book_side.best(), self.vwap(side, amount)
+        if best is None or average is None:
+            return None
+        return (average - best[0]) / best[0] * 1e4 * (1 if side == 'buy' else -1)
+
+    def age(self):
+        return time.time() - self.timestamp / 1000 if self.timestamp else None
+
+class OrderBookManager:
+    """Local order books for all streamed symbols with snapshot resync on sequence gaps."""
+
+    _instance = None
+
+    def __new__(cls, market_data=None, snapshot_depth=100):
+        if cls._instance is None:
+            cls._instance = super(OrderBookManager, cls).__new__(cls)
+            cls._instance.market_data = market_data
+            cls._instance.snapshot_depth = snapshot_depth
+            cls._instance.books = {}  # (exchange, symbol) -> LocalOrderBook
+            cls._instance.pending = {}  # (exchange, symbol) -> дельты, пришедшие до снимка
+            cls._instance.resyncs = {}  # (exchange, symbol) -> asyncio.Task
+            cls._instance.rate_limiter = ExchangeRateLimiter()
+            cls._instance.price_board = PriceBoard()  # Лучшие цены из стаканов для быстрых проверок
+            cls._instance.max_pending = 1000
+            cls._instance.quote_handlers = []  # callback(exchange, symbol, bid, ask, timestamp) при смене лучших цен
+            cls._instance.stats = {'deltas': 0, 'gaps': 0, 'snapshots': 0}
+        elif market_data is not None:
+            cls._instance.market_data = market_data
+        return cls._instance
+
+    def get(self, exchange_name, symbol):
+        """Return the book if it is in sync, otherwise None."""
+        book = self.books.get((exchange_name, symbol))
+        return book if book is not None and book.synced else None
+
+    async def ensure(self, exchange_name, symbol):
+        """Return an in-sync book, taking a REST snapshot first if needed."""
+        book = self.get(exchange_name, symbol)
+        if book is None:
+            await self.resync(exchange_name, symbol)
+            book = self.get(exchange_name, symbol)
+        return book
+
+    async def resync(self, exchange_name, symbol):
+        """Load a REST snapshot and replay deltas buffered while it was in flight."""
+        key = (exchange_name, symbol)
+        task = self.resyncs.get(key)
+        if task is None or task.done():
+            task = asyncio.create_task(self.load_snapshot(exchange_name, symbol))
+            self.resyncs[key] = task
+        await asyncio.shield(task)
+
+    async def load_snapshot(self, exchange_name, symbol):
+        key = (exchange_name, symbol)
+        try:
+            if exchange_name not in self.market_data.exchanges and not await self.market_data.initialize_exchange(exchange_name):
+                return
+            exchange = self.market_data.exchanges[exchange_name]
+            snapshot = await self.rate_limiter.call(exchange_name, 'fetch_order_book', exchange.fetch_order_book, symbol, limit=self.snapshot_depth)
+            book = self.books.setdefault(key, LocalOrderBook(exchange_name, symbol))
+            book.apply_snapshot([level[:2] for level in snapshot['bids']], [level[:2] for level in snapshot['asks']],
+                                snapshot.get('nonce'), snapshot.get('timestamp'))
+            self.stats['snapshots'] += 1
+            for delta in self.pending.pop(key, []):
+                if not book.apply_delta(*delta):
+                    self.pending[key] = []
+                    break
+            self.publish_quote(book)
+            logger.info(f"Synced order book for {symbol} on {exchange_name}: {len(book.bids)} bids, {len(book.asks)} asks, sequence {book.sequence}")
+        except Exception as e:
+            logger.error(f"Failed to load order book snapshot for {symbol} on {exchange_name}: {str(e)}")
+
+    def publish_quote(self, book):
+        bid, ask = book.best_bid(), book.best_ask()
+        if book.synced and bid is not None and ask is not None:
+            self.price_board.update_quote(book.exchange_name, book.symbol, bid[0], ask[0], book.timestamp)
+            for handler in self.quote_handlers:
+                handler(book.exchange_name, book.symbol, bid[0], ask[0], book.timestamp)
+
+    def on_depth(self, exchange, symbol, bids, asks, first_sequence, last_sequence, timestamp):
+        """WebSocketManager depth handler: apply a delta, or buffer it and resync on a gap."""
+        key = (exchange, symbol)
+        self.stats['deltas'] += 1
+        book = self.books.get(key)
+        delta = (bids, asks, first_sequence, last_sequence, timestamp)
+        if book is not None and book.apply_delta(*delta):
+            self.publish_quote(book)
+            return
+        if book is not None and not book.synced and key not in self.pending:
+            self.stats['gaps'] += 1
+        pending = self.pending.setdefault(key, [])
+        if len(pending) < self.max_pending:
+            pending.append(delta)
+        task = self.resyncs.get(key)
+        if self.market_data is not None and (task is None or task.done()):
+            self.resyncs[key] = asyncio.create_task(self.load_snapshot(exchange, symbol))
+
+if __name__ == "__main__":
+    # Test run
+    rng = np.random.default_rng(0)
+    book = LocalOrderBook('binance', 'BTC/USDT')
+    mid = 60000.0
+    book.apply_snapshot(np.c_[mid - np.arange(1, 1001) * 0.5, rng.uniform(0.01, 2, 1000)],
+                        np.c_[mid + np.arange(1, 1001) * 0.5, rng.uniform(0.01, 2, 1000)], sequence=100)
+    start = time.perf_counter()
+    for i in range(10000):
+        levels = np.c_[mid - rng.integers(1, 1200, 10) * 0.5, rng.choice([0.0, 0.5, 1.0], 10)]
+        book.apply_delta(levels, [], 101 + i, 101 + i)
+    print(f"Delta apply: {(time.perf_counter() - start) / 10000 * 1e6:.1f} us")
+    start = time.perf_counter()
+    for _ in range(10000):
+        book.vwap('buy', 5.0)
+        book.depth_within(10)
+    print(f"VWAP + depth query: {(time.perf_counter() - start) / 10000 * 1e6:.1f} us")
+    print(f"Best bid {book.best_bid()}, best ask {book.best_ask()}, slippage for 5 BTC: {book.slippage_bps('buy', 5.0):.2f} bps")
+    print(f"Gap detected: {not book.apply_delta([[mid - 1, 1]], [], 20000, 20000)}")
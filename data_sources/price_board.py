@@ -0,0 +1,147 @@
+import math
+import time
+import numpy as np
+from utils.logging_setup import setup_logging
+
+logger = setup_logging('price_board')
+
+class SymbolRegistry:
+    """Intern (exchange, symbol) pairs into dense integer ids."""
+
+    def __init__(self):
+        self.ids = {}
+        self.keys = []
+
+    def intern(self, exchange_name, symbol):
+        key = (exchange_name, symbol.split(':')[0])
+        symbol_id = self.ids.get(key)
+        if symbol_id is None:
+            symbol_id = len(self.keys)
+            self.ids[key] = symbol_id
+            self.keys.append(key)
+        return symbol_id
+
+    def get(self, exchange_name, symbol):
+        return self.ids.get((exchange_name, symbol.split(':')[0]))
+
+    def __len__(self):
+        return len(self.keys)
+
+class PriceBoard:
+    """Last trade and best bid/ask per symbol in flat numpy arrays indexed by interned id.
+
+    Writers are stream handlers on the event loop; readers do one dict lookup
+    for the id and one array read, without locks or network calls. Arrays
+    grow by doubling and are swapped in whole, so a reader never sees a
+    half-resized board.
+    """
+
+    _instance = None
+
+    def __new__(cls, capacity=1024):
+        if cls._instance is None:
+            cls._instance = super(PriceBoard, cls).__new__(cls)
+            cls._instance.registry = SymbolRegistry()
+            cls._instance.allocate(capacity)
+            cls._instance.max_age = 30  # Секунды, после которых цена считается устаревшей
+            cls._instance.updates = 0
+        return cls._instance
+
+    def allocate(self, capacity):
+        self.last = np.full(capacity, np.nan)
+        self.bid = np.full(capacity, np.nan)
+        self.ask = np.full(capacity, np.nan)
+        # мс времени биржи: сделки и котировки устаревают независимо друг от друга
+        self.trade_at = np.zeros(capacity, dtype=np.int64)
+        self.quote_at = np.zeros(capacity, dtype=np.int64)
+
+    def slot(self, exchange_name, symbol):
+        """Id of a symbol, growing the arrays when a new symbol appears."""
+        symbol_id = self.registry.intern(exchange_name, symbol)
+        capacity = len(self.last)
+        if symbol_id >= capacity:
+            grown = max(capacity * 2, symbol_id + 1)
+            last, bid, ask, trade_at, quote_at = (np.pad(a, (0, grown - capacity), constant_values=fill)
+                                                  for a, fill in ((self.last, np.nan), (self.bid, np.nan), (self.ask, np.nan), (self.trade_at, 0), (self.quote_at, 0)))
+            self.last, self.bid, self.ask, self.trade_at, self.quote_at = last, bid, ask, trade_at, quote_at
+        return symbol_id
+
+    def update_trade(self, exchange_name, symbol, price, amount=None, timestamp=None):
+        """WebSocketManager trade handler."""
+        i = self.slot(exchange_name, symbol)
+        self.last[i] = price
+        self.trade_at[i] = timestamp or int(time.time() * 1000)
+        self.updates += 1
+
+    def update_quote(self, exchange_name, symbol, bid, ask, timestamp=None):
+        """Best bid/ask from book ticker streams or local order books."""
+        i = self.slot(exchange_name, symbol)
+        if bid is not None:
+            self.bid[i] = bid
+        if ask is not None:
+            self.ask[i] = ask
+        self.quote_at[i] = timestamp or int(time.time() * 1000)
+        self.updates += 1
+
+    def update_tickers(self, exchange_name, tickers):
+        """Load a fetch_tickers() snapshot: one vectorized write for all symbols."""
+        if not tickers:
+            return
+        ids = np.fromiter((self.slot(exchange_name, symbol) for symbol in tickers), dtype=np.int64, count=len(tickers))
+        def column(field):
+            return np.fromiter((t.get(field) if t.get(field) is not None else np.nan for t in tickers.values()), dtype=np.float64, count=len(tickers))
+        now = int(time.time() * 1000)
+        timestamps = np.fromiter((t.get('timestamp') or now for t in tickers.values()), dtype=np.int64, count=len(tickers))
+        # Пишем только присутствующие поля: тикер без bid/ask не должен затирать живую котировку
+        last, bid, ask = column('last'), column('bid'), column('ask')
+        has_last, has_bid, has_ask = ~np.isnan(last), ~np.isnan(bid), ~np.isnan(ask)
+        self.last[ids[has_last]] = last[has_last]
+        self.trade_at[ids[has_last]] = timestamps[has_last]
+        self.bid[ids[has_bid]] = bid[has_bid]
+        self.ask[ids[has_ask]] = ask[has_ask]
+        self.quote_at[ids[has_bid | has_ask]] = timestamps[has_bid | has_ask]
+        self.updates += len(tickers)
+
+    def price(self, exchange_name, symbol, side=None, max_age=None):
+        """Executable price: ask for 'buy', bid for 'sell', last trade otherwise; None if unknown or stale."""
+        i = self.registry.get(exchange_name, symbol)
+        if i is None:
+            return None
+        max_age = self.max_age if max_age is None else max_age
+        cutoff = time.time() * 1000 - max_age * 1000 if max_age else None
+        if side in ('buy', 'sell') and (cutoff is None or self.quote_at[i] >= cutoff):
+            value = float(self.ask[i] if side == 'buy' else self.bid[i])
+            if not math.isnan(value):
+                return value
+        # Без свежей котировки нужной стороны — последняя сделка, если свежая она сама
+        if cutoff is not None and self.trade_at[i] < cutoff:
+            return None
+        value = float(self.last[i])
+        return None if math.isnan(value) else value
+
+    def quote(self, exchange_name, symbol):
+        """Return (bid, ask) or None."""
+        i = self.registry.get(exchange_name, symbol)
+        if i is None:
+            return None
+        bid, ask = float(self.bid[i]), float(self.ask[i])
+        return None if math.isnan(bid) or math.isnan(ask) else (bid, ask)
+
+    def prices(self, exchange_name, symbols):
+        """Last prices for many symbols at once (NaN for unknown ones)."""
+        ids = np.array([self.registry.ids.get((exchange_name, symbol.split(':')[0]), -1) for symbol in symbols], dtype=np.int64)
+        result = np.full(len(ids), np.nan)
+        known = ids >= 0
+        result[known] = self.last[ids[known]]
+        return result
+
+if __name__ == "__main__":
+    # Test run
+    board = PriceBoard()
+    for i in range(5000):
+        board.update_trade('binance', f"SYM{i}/USDT", 100.0 + i, 1.0)
+    board.update_quote('binance', 'SYM42/USDT', 141.9, 142.1)
+    start = time.perf_counter()
+    for _ in range(100000):
+        board.price('binance', 'SYM42/USDT', 'buy')
+    print(f"price(): {(time.perf_counter() - start) / 100000 * 1e6:.2f} us, SYM42 buy at {board.price('binance', 'SYM42/USDT', 'buy')}, {len(board.registry)} symbols")
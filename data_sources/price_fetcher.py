@@ -1,11 +1,15 @@
 from utils.logging_setup import setup_logging
+from data_sources.price_board import PriceBoard
 
 logger = setup_logging('price_fetcher')
 
 class PriceFetcher:
-    def __init__(self):
-        pass
+    def __init__(self, price_board=None):
+        self.price_board = price_board or PriceBoard()
 
-    def fetch_price(self, symbol, exchange):
-        logger.info(f"Fetching price for {symbol} from {exchange}")
-        return 1000  # Пример
+    def fetch_price(self, symbol, exchange, side=None):
+        """Return the current price from the streamed price board, or None if it is unknown or stale."""
+        price = self.price_board.price(exchange, symbol, side)
+        if price is None:
+            logger.warning(f"No fresh price for {symbol} on {exchange}")
+        return price
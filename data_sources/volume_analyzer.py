@@ -1,4 +1,5 @@
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
 
 logger = setup_logging('volume_analyzer')
 
@@ -8,4 +9,5 @@ class VolumeAnalyzer:
 
     def analyze(self, klines):
         logger.info("Analyzing volume")
-        return sum(kline[5] for kline in klines) / len(klines) if klines else 0
+        volumes = KlineFrame.ensure(klines).volume
+        return float(volumes.mean()) if len(volumes) else 0
@@ -1,11 +1,337 @@
+import asyncio
+import json
+import websockets
 from utils.logging_setup import setup_logging
 
 logger = setup_logging('websocket_manager')
 
+class BinanceStreamProtocol:
+    """Binance spot stream format: JSON SUBSCRIBE requests and kline/trade events."""
+
+    max_channels_per_connection = 1000
+    max_channels_per_message = 200
+
+    def __init__(self, url="wss://stream.binance.com:9443/ws"):
+        self.url = url
+
+    def market_id(self, symbol):
+        return symbol.split(':')[0].replace('/', '').upper()
+
+    def kline_channel(self, symbol, timeframe):
+        return f"{self.market_id(symbol).lower()}@kline_{timeframe}"
+
+    def trade_channel(self, symbol):
+        return f"{self.market_id(symbol).lower()}@trade"
+
+    def depth_channel(self, symbol):
+        return f"{self.market_id(symbol).lower()}@depth@100ms"
+
+    def quote_channel(self, symbol):
+        return f"{self.market_id(symbol).lower()}@bookTicker"
+
+    def subscribe_message(self, channels, request_id):
+        return json.dumps({"method": "SUBSCRIBE", "params": channels, "id": request_id})
+
+    def ping_message(self):
+        return None  # Binance шлёт ping сам, websockets отвечает автоматически
+
+    def parse(self, raw):
+        """Parse one message into ('kline', market_id, timeframe, row) / ('trade', market_id, price, amount, ts) events."""
+        message = json.loads(raw)
+        if 'data' in message:  # combined stream wrapper
+            message = message['data']
+        event = message.get('e')
+        if event is None and 'b' in message and 'a' in message:  # bookTicker приходит без поля 'e'
+            return [('quote', message['s'], float(message['b']), float(message['a']), None)]
+        if event == 'kline':
+            k = message['k']
+            row = [int(k['t']), float(k['o']), float(k['h']), float(k['l']), float(k['c']), float(k['v'])]
+            return [('kline', message['s'], k['i'], row)]
+        if event == 'trade':
+            return [('trade', message['s'], float(message['p']), float(message['q']), int(message['T']))]
+        if event == 'depthUpdate':
+            bids = [[float(p), float(q)] for p, q in message['b']]
+            asks = [[float(p), float(q)] for p, q in message['a']]
+            return [('depth', message['s'], bids, asks, int(message['U']), int(message['u']), int(message['E']))]
+        return []
+
+class MEXCStreamProtocol:
+    """MEXC spot v3 JSON stream format."""
+
+    max_channels_per_connection = 30
+    max_channels_per_message = 30
+    intervals = {'1m': 'Min1', '5m': 'Min5', '15m': 'Min15', '30m': 'Min30', '1h': 'Min60', '4h': 'Hour4', '1d': 'Day1', '1w': 'Week1', '1M': 'Month1'}
+
+    def __init__(self, url="wss://wbs.mexc.com/ws"):
+        self.url = url
+        self.timeframes = {interval: timeframe for timeframe, interval in self.intervals.items()}
+
+    def market_id(self, symbol):
+        return symbol.split(':')[0].replace('/', '').upper()
+
+    def kline_channel(self, symbol, timeframe):
+        return f"spot@public.kline.v3.api@{self.market_id(symbol)}@{self.intervals[timeframe]}"
+
+    def trade_channel(self, symbol):
+        return f"spot@public.deals.v3.api@{self.market_id(symbol)}"
+
+    def depth_channel(self, symbol):
+        return f"spot@public.increase.depth.v3.api@{self.market_id(symbol)}"
+
+    def quote_channel(self, symbol):
+        return f"spot@public.bookTicker.v3.api@{self.market_id(symbol)}"
+
+    def subscribe_message(self, channels, request_id):
+        return json.dumps({"method": "SUBSCRIPTION", "params": channels, "id": request_id})
+
+    def ping_message(self):
+        return json.dumps({"method": "PING"})
+
+    def parse(self, raw):
+        message = json.loads(raw)
+        channel = message.get('c', '')
+        data = message.get('d', {})
+        if channel.startswith('spot@public.kline.v3.api'):
+            k = data['k']
+            row = [int(k['t']) * 1000, float(k['o']), float(k['h']), float(k['l']), float(k['c']), float(k['v'])]
+            return [('kline', message['s'], self.timeframes.get(k['i'], k['i']), row)]
+        if channel.startswith('spot@public.deals.v3.api'):
+            return [('trade', message['s'], float(deal['p']), float(deal['v']), int(deal['t'])) for deal in data.get('deals', [])]
+        if channel.startswith('spot@public.bookTicker.v3.api'):
+            return [('quote', message['s'], float(data['b']), float(data['a']), int(message.get('t', 0)) or None)]
+        if channel.startswith('spot@public.increase.depth.v3.api'):
+            bids = [[float(level['p']), float(level['v'])] for level in data.get('bids', [])]
+            asks = [[float(level['p']), float(level['v'])] for level in data.get('asks', [])]
+            version = int(data['r'])
+            return [('depth', message['s'], bids, asks, version, version, int(message.get('t', 0)))]
+        return []
+
+STREAM_PROTOCOLS = {
+    'binance': BinanceStreamProtocol,
+    'mexc': MEXCStreamProtocol,
+}
+
+class StreamConnection:
+    """One websocket connection carrying a batch of channels for one exchange."""
+
+    def __init__(self, exchange, protocol):
+        self.exchange = exchange
+        self.protocol = protocol
+        self.channels = []
+        self.websocket = None
+        self.task = None
+        self.request_id = 0
+
+    @property
+    def has_room(self):
+        return len(self.channels) < self.protocol.max_channels_per_connection
+
+    async def subscribe(self, channels):
+        """Send subscription requests in batches of max_channels_per_message."""
+        if self.websocket is None:
+            return
+        step = self.protocol.max_channels_per_message
+        for i in range(0, len(channels), step):
+            self.request_id += 1
+            await self.websocket.send(self.protocol.subscribe_message(channels[i:i + step], self.request_id))
+
 class WebSocketManager:
-    def __init__(self):
-        pass
+    def __init__(self, market_data=None, protocols=None, ping_interval=20, max_reconnect_delay=60, order_books=None, price_board=None):
+        """Stream klines, trades, quotes and depth into candle buffers, the price board and local order books."""
+        self.market_data = market_data
+        self.order_books = order_books
+        self.price_board = price_board if price_board is not None else getattr(market_data, 'price_board', None)
+        self.protocols = {name: protocol_class() for name, protocol_class in STREAM_PROTOCOLS.items()}
+        self.protocols.update(protocols or {})
+        self.ping_interval = ping_interval
+        self.max_reconnect_delay = max_reconnect_delay
+        self.connections = {}  # exchange -> [StreamConnection]
+        self.routes = {}  # (exchange, market_id) -> symbol
+        self.kline_keys = {}  # exchange -> {channel: (symbol, timeframe)}
+        self.trade_handlers = []  # callback(exchange, symbol, price, amount, timestamp)
+        self.kline_handlers = []  # callback(exchange, symbol, timeframe, row)
+        self.depth_handlers = []  # callback(exchange, symbol, bids, asks, first_sequence, last_sequence, timestamp)
+        self.quote_handlers = []  # callback(exchange, symbol, bid, ask, timestamp)
+        self.stats = {'messages': 0, 'klines': 0, 'trades': 0, 'quotes': 0, 'depth': 0, 'reconnects': 0, 'errors': 0}
+        self.running = False
 
     def connect(self, exchange):
+        """Mark an exchange as streamable; connections are opened as channels are subscribed."""
+        if exchange not in self.protocols:
+            logger.warning(f"No stream protocol for {exchange}")
+            return False
+        self.running = True
+        self.connections.setdefault(exchange, [])
+        self.kline_keys.setdefault(exchange, {})
         logger.info(f"Connecting WebSocket to {exchange}")
         return True
+
+    async def subscribe_klines(self, exchange, symbols, timeframe):
+        """Subscribe to kline channels for many symbols on one exchange."""
+        protocol = self.protocols[exchange]
+        channels = []
+        for symbol in symbols:
+            channel = protocol.kline_channel(symbol, timeframe)
+            self.routes[(exchange, protocol.market_id(symbol))] = symbol
+            self.kline_keys.setdefault(exchange, {})[channel] = (symbol, timeframe)
+            channels.append(channel)
+        await self.add_channels(exchange, channels)
+
+    async def subscribe_trades(self, exchange, symbols):
+        """Subscribe to trade channels for many symbols on one exchange."""
+        protocol = self.protocols[exchange]
+        channels = []
+        for symbol in symbols:
+            self.routes[(exchange, protocol.market_id(symbol))] = symbol
+            channels.append(protocol.trade_channel(symbol))
+        await self.add_channels(exchange, channels)
+
+    async def subscribe_quotes(self, exchange, symbols):
+        """Subscribe to best bid/ask channels for many symbols on one exchange."""
+        protocol = self.protocols[exchange]
+        channels = []
+        for symbol in symbols:
+            self.routes[(exchange, protocol.market_id(symbol))] = symbol
+            channels.append(protocol.quote_channel(symbol))
+        await self.add_channels(exchange, channels)
+
+    async def subscribe_depth(self, exchange, symbols):
+        """Subscribe to incremental depth channels for many symbols on one exchange."""
+        protocol = self.protocols[exchange]
+        channels = []
+        for symbol in symbols:
+            self.routes[(exchange, protocol.market_id(symbol))] = symbol
+            channels.append(protocol.depth_channel(symbol))
+        await self.add_channels(exchange, channels)
+
+    async def add_channels(self, exchange, channels):
+        """Distribute new channels over existing connections and open new ones when they are full."""
+        if not self.connect(exchange):
+            return
+        connections = self.connections[exchange]
+        pending = [channel for channel in channels if not any(channel in c.channels for c in connections)]
+        while pending:
+            connection = next((c for c in connections if c.has_room), None)
+            if connection is None:
+                connection = StreamConnection(exchange, self.protocols[exchange])
+                connections.append(connection)
+                connection.task = asyncio.create_task(self.run_connection(connection))
+            room = connection.protocol.max_channels_per_connection - len(connection.channels)
+            batch, pending = pending[:room], pending[room:]
+            connection.channels.extend(batch)
+            try:
+                await connection.subscribe(batch)
+            except Exception as e:
+                logger.warning(f"Failed to subscribe {len(batch)} channels on {exchange}, will resubscribe on reconnect: {str(e)}")
+        logger.info(f"{exchange}: {sum(len(c.channels) for c in connections)} channels on {len(connections)} connections")
+
+    async def run_connection(self, connection):
+        """Keep one connection alive, resubscribing all of its channels after every reconnect."""
+        delay = 1
+        while self.running:
+            try:
+                async with websockets.connect(connection.protocol.url, ping_interval=self.ping_interval, close_timeout=1, max_size=None) as websocket:
+                    connection.websocket = websocket
+                    await connection.subscribe(list(connection.channels))
+                    # Сообщения копятся в сокете, пока REST догружает пропущенные за разрыв свечи
+                    await self.backfill(connection)
+                    self.set_streamed(connection, True)
+                    logger.info(f"WebSocket connected to {connection.exchange} with {len(connection.channels)} channels")
+                    delay = 1
+                    pinger = asyncio.create_task(self.keepalive(connection)) if connection.protocol.ping_message() else None
+                    try:
+                        async for raw in websocket:
+                            self.dispatch(connection, raw)
+                    finally:
+                        if pinger:
+                            pinger.cancel()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"WebSocket error on {connection.exchange}: {str(e)}")
+            finally:
+                connection.websocket = None
+                self.set_streamed(connection, False)
+            if self.running:
+                self.stats['reconnects'] += 1
+                logger.info(f"Reconnecting to {connection.exchange} in {delay}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def keepalive(self, connection):
+        """Send application-level pings for exchanges that require them."""
+        while connection.websocket is not None:
+            await asyncio.sleep(self.ping_interval)
+            await connection.websocket.send(connection.protocol.ping_message())
+
+    async def backfill(self, connection):
+        """Resync the candle buffers of a (re)connected stream before it is trusted as live again."""
+        if self.market_data is None:
+            return
+        keys = self.kline_keys.get(connection.exchange, {})
+        await asyncio.gather(*[self.market_data.resync(connection.exchange, *keys[channel]) for channel in connection.channels if channel in keys])
+
+    def set_streamed(self, connection, live):
+        """Tell AsyncMarketData which candle buffers are kept current by this connection."""
+        if self.market_data is None:
+            return
+        keys = self.kline_keys.get(connection.exchange, {})
+        for channel in connection.channels:
+            if channel in keys:
+                symbol, timeframe = keys[channel]
+                self.market_data.set_streamed(connection.exchange, symbol, timeframe, live)
+
+    def dispatch(self, connection, raw):
+        """Route parsed events into candle buffers and registered handlers."""
+        self.stats['messages'] += 1
+        try:
+            events = connection.protocol.parse(raw)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.debug(f"Unparsable message from {connection.exchange}: {str(e)}")
+            return
+        exchange = connection.exchange
+        for event in events:
+            symbol = self.routes.get((exchange, event[1]))
+            if symbol is None:
+                continue
+            if event[0] == 'kline':
+                self.stats['klines'] += 1
+                _, _, timeframe, row = event
+                if self.market_data is not None:
+                    self.market_data.apply_stream_kline(exchange, symbol, timeframe, row)
+                for handler in self.kline_handlers:
+                    handler(exchange, symbol, timeframe, row)
+            elif event[0] == 'trade':
+                self.stats['trades'] += 1
+                _, _, price, amount, timestamp = event
+                if self.price_board is not None:
+                    self.price_board.update_trade(exchange, symbol, price, amount, timestamp)
+                for handler in self.trade_handlers:
+                    handler(exchange, symbol, price, amount, timestamp)
+            elif event[0] == 'quote':
+                self.stats['quotes'] += 1
+                _, _, bid, ask, timestamp = event
+                if self.price_board is not None:
+                    self.price_board.update_quote(exchange, symbol, bid, ask, timestamp)
+                for handler in self.quote_handlers:
+                    handler(exchange, symbol, bid, ask, timestamp)
+            else:
+                self.stats['depth'] += 1
+                _, _, bids, asks, first_sequence, last_sequence, timestamp = event
+                if self.order_books is not None:
+                    self.order_books.on_depth(exchange, symbol, bids, asks, first_sequence, last_sequence, timestamp)
+                for handler in self.depth_handlers:
+                    handler(exchange, symbol, bids, asks, first_sequence, last_sequence, timestamp)
+
+    async def close(self):
+        """Stop all connections."""
+        self.running = False
+        for exchange, connections in self.connections.items():
+            for connection in connections:
+                if connection.task:
+                    connection.task.cancel()
+            await asyncio.gather(*[c.task for c in connections if c.task], return_exceptions=True)
+            logger.info(f"Closed WebSocket connections for {exchange}")
+        self.connections.clear()
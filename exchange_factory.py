@@ -1,30 +1,55 @@
-import ccxt
+import ccxt.async_support as ccxt
+import aiohttp
 from dotenv import load_dotenv
 import os
-from logging_setup import setup_logging
+from utils.logging_setup import setup_logging
 
 logger = setup_logging('exchange_factory')
 
 class ExchangeFactory:
+    keepalive_timeout = 120  # Секунды простоя, которые живёт TLS-соединение с биржей
+    connection_limit = 100
+
     @staticmethod
-    def create_exchange(exchange_id: str) -> ccxt.Exchange:
-        """Create an exchange instance with API keys from .env."""
-        try:
-            load_dotenv()
-            api_key = os.getenv(f'{exchange_id.upper()}_API_KEY')
-            api_secret = os.getenv(f'{exchange_id.upper()}_API_SECRET')
+    def credentials_from_env(exchange_id: str) -> dict:
+        """Read API credentials for an exchange from .env; missing keys mean public access."""
+        load_dotenv()
+        prefix = exchange_id.upper()
+        credentials = {
+            'apiKey': os.getenv(f'{prefix}_API_KEY'),
+            'secret': os.getenv(f'{prefix}_API_SECRET'),
+            'password': os.getenv(f'{prefix}_API_PASSWORD'),
+        }
+        return {key: value for key, value in credentials.items() if value}
 
-            if not api_key or not api_secret:
-                logger.error(f"API key or secret not found for {exchange_id} in .env")
-                raise ValueError(f"API key or secret not found for {exchange_id}")
+    @classmethod
+    def create_session(cls) -> aiohttp.ClientSession:
+        """HTTP session with long-lived keep-alive connections and cached DNS."""
+        connector = aiohttp.TCPConnector(
+            limit=cls.connection_limit,
+            keepalive_timeout=cls.keepalive_timeout,
+            ttl_dns_cache=300,
+            enable_cleanup_closed=True,
+        )
+        return aiohttp.ClientSession(connector=connector, trust_env=True)
+
+    @classmethod
+    def create_exchange(cls, exchange_id: str, credentials: dict = None, session: aiohttp.ClientSession = None) -> ccxt.Exchange:
+        """Create an async exchange client; must be called from a running event loop when ``session`` is given."""
+        try:
+            exchange_class = getattr(ccxt, exchange_id, None)
+            if exchange_class is None:
+                raise ValueError(f"Exchange {exchange_id} is not supported by ccxt.async_support")
 
-            exchange_class = getattr(ccxt, exchange_id)
-            exchange = exchange_class({
-                'apiKey': api_key,
-                'secret': api_secret,
-                'enableRateLimit': True,
-            })
-            logger.info(f"Created exchange instance for {exchange_id}")
+            config = {
+                'enableRateLimit': False,  # Запросы ограничивает ExchangeRateLimiter
+                **(credentials or {}),
+            }
+            if session is not None:
+                config['session'] = session
+            exchange = exchange_class(config)
+            access = "with API keys" if credentials else "without API keys (public access only)"
+            logger.info(f"Created exchange instance for {exchange_id} {access}")
             return exchange
         except Exception as e:
             logger.error(f"Failed to create exchange {exchange_id}: {str(e)}")
@@ -1,40 +1,170 @@
-from trading_bot.logging_setup import setup_logging
-from trading_bot.exchange_factory import ExchangeFactory
+import asyncio
+import hashlib
+import time
+import aiohttp
+import ccxt.async_support as ccxt
+from utils.logging_setup import setup_logging
+from utils.api_rate_limiter import ExchangeRateLimiter
+from exchange_factory import ExchangeFactory
+from data_sources.market_metadata import MarketMetadataService
 
 logger = setup_logging('exchange_pool')
 
+class ExchangeSession:
+    """One long-lived exchange client and its HTTP session."""
+
+    def __init__(self, exchange_id, exchange, http_session):
+        self.exchange_id = exchange_id
+        self.exchange = exchange
+        self.http_session = http_session
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.healthy = True
+        self.failures = 0
+
+    async def close(self):
+        await self.exchange.close()
+        await self.http_session.close()
+
 class ExchangePool:
-    def __init__(self, market_state: dict):
-        self.volatility = market_state['volatility']
-        self.factory = ExchangeFactory(market_state)
-        self.exchanges = {}
+    """Registry of shared async exchange clients, one per (exchange, credential set).
+
+    Market data, order execution and the deal pool get the same client for the
+    same credentials, so connections, loaded markets and TLS sessions are
+    reused. A background task checks sessions with a cheap request and
+    recreates clients whose connections went bad.
+    """
+
+    _instance = None
 
-    def add_exchange(self, exchange_name: str):
-        """Add an exchange to the pool."""
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ExchangePool, cls).__new__(cls)
+            cls._instance.sessions = {}  # (exchange_id, credential hash) -> ExchangeSession
+            cls._instance.locks = {}
+            cls._instance.rate_limiter = ExchangeRateLimiter()
+            cls._instance.metadata = MarketMetadataService()
+            cls._instance.health_interval = 60
+            cls._instance.health_timeout = 5
+            cls._instance.max_failures = 3
+            cls._instance.health_task = None
+        return cls._instance
+
+    @staticmethod
+    def session_key(exchange_id: str, credentials: dict = None):
+        """Registry key; credentials are hashed so keys and secrets never show up in logs or stats."""
+        if not credentials:
+            return exchange_id, 'public'
+        material = '\x00'.join(str(credentials.get(field, '')) for field in ('apiKey', 'secret', 'password'))
+        return exchange_id, hashlib.sha256(material.encode()).hexdigest()[:16]
+
+    async def get_exchange(self, exchange_id: str, credentials: dict = None, use_env: bool = True):
+        """Return the shared client for an exchange; credentials default to the ones in .env."""
+        if credentials is None and use_env:
+            credentials = ExchangeFactory.credentials_from_env(exchange_id)
+        key = self.session_key(exchange_id, credentials)
+        session = self.sessions.get(key)
+        if session is not None and session.healthy:
+            session.last_used = time.time()
+            return session.exchange
+
+        lock = self.locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            session = self.sessions.get(key)
+            if session is not None and not session.healthy:
+                logger.info(f"Recreating unhealthy {exchange_id} session")
+                self.sessions.pop(key)
+                await self.close_session(session)
+                session = None
+            if session is None:
+                session = await self.create_session(exchange_id, credentials)
+                self.sessions[key] = session
+            self.start_health_checks()
+            return session.exchange
+
+    async def create_session(self, exchange_id: str, credentials: dict = None):
+        http_session = ExchangeFactory.create_session()
         try:
-            exchange = self.factory.get_exchange(exchange_name)
-            self.exchanges[exchange_name] = exchange
-            logger.info(f"Added exchange {exchange_name} to pool")
-        except Exception as e:
-            logger.error(f"Failed to add exchange {exchange_name}: {str(e)}")
+            exchange = ExchangeFactory.create_exchange(exchange_id, credentials, session=http_session)
+            await self.metadata.ensure(exchange_id, exchange)
+        except Exception:
+            await http_session.close()
             raise
+        logger.info(f"Opened shared {exchange_id} session")
+        return ExchangeSession(exchange_id, exchange, http_session)
 
-    def get_exchange(self, exchange_name: str):
-        """Get an exchange from the pool."""
+    def report_failure(self, exchange, error: Exception):
+        """Count connection-level errors; returns True once the client's session is unhealthy and will be recreated."""
+        if not isinstance(error, (ccxt.NetworkError, aiohttp.ClientError)):
+            return False
+        for session in self.sessions.values():
+            if session.exchange is exchange:
+                session.failures += 1
+                if session.failures >= self.max_failures and session.healthy:
+                    session.healthy = False
+                    logger.warning(f"{session.exchange_id} session marked unhealthy after {session.failures} failures: {str(error)}")
+                return not session.healthy
+        return False
+
+    def start_health_checks(self):
+        if self.health_task is None or self.health_task.done():
+            self.health_task = asyncio.create_task(self.health_loop())
+
+    async def health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await asyncio.gather(*[self.check(session) for session in list(self.sessions.values())])
+
+    async def check(self, session: ExchangeSession):
+        """Ping the exchange over the pooled connection; this also keeps the connection warm."""
+        exchange = session.exchange
+        if not exchange.has.get('fetchTime'):
+            return
         try:
-            exchange = self.exchanges.get(exchange_name)
-            if not exchange:
-                raise ValueError(f"Exchange {exchange_name} not found in pool")
-            logger.info(f"Retrieved exchange {exchange_name} from pool")
-            return exchange
+            await asyncio.wait_for(self.rate_limiter.call(session.exchange_id, 'fetch_time', exchange.fetch_time), self.health_timeout)
+            session.failures = 0
+            session.healthy = True
         except Exception as e:
-            logger.error(f"Failed to get exchange {exchange_name}: {str(e)}")
-            raise
+            session.failures += 1
+            if session.failures >= self.max_failures:
+                session.healthy = False
+            logger.warning(f"Health check failed for {session.exchange_id} ({session.failures}): {str(e)}")
+
+    async def close_session(self, session: ExchangeSession):
+        try:
+            await session.close()
+            logger.info(f"Closed shared {session.exchange_id} session")
+        except Exception as e:
+            logger.error(f"Failed to close {session.exchange_id} session: {str(e)}")
+
+    def stats(self):
+        now = time.time()
+        return {
+            f"{exchange_id}:{credential}": {'healthy': s.healthy, 'failures': s.failures, 'age': now - s.created_at, 'idle': now - s.last_used}
+            for (exchange_id, credential), s in self.sessions.items()
+        }
+
+    async def close(self):
+        """Close every pooled client."""
+        await self.metadata.close()  # Фоновое обновление рынков иначе открыло бы клиента заново
+        if self.health_task is not None:
+            self.health_task.cancel()
+            await asyncio.gather(self.health_task, return_exceptions=True)
+            self.health_task = None
+        sessions = list(self.sessions.values())
+        self.sessions.clear()
+        await asyncio.gather(*[self.close_session(session) for session in sessions])
 
 if __name__ == "__main__":
     # Test run
-    market_state = {'volatility': 0.3}
-    pool = ExchangePool(market_state)
-    pool.add_exchange('binance')
-    exchange = pool.get_exchange('binance')
-    print(f"Exchange from pool: {exchange}")
+    async def main():
+        pool = ExchangePool()
+        exchange = await pool.get_exchange('binance')
+        same = await pool.get_exchange('binance')
+        print(f"Exchange from pool: {exchange}, shared: {exchange is same}")
+        start = time.monotonic()
+        await exchange.fetch_time()
+        print(f"fetch_time over pooled connection: {time.monotonic() - start:.3f}s, stats: {pool.stats()}")
+        await pool.close()
+
+    asyncio.run(main())
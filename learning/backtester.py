@@ -11,17 +11,20 @@ from strategies.macd_strategy import MACDStrategy
 logger = setup_logging('backtester')
 
 class Backtester:
-    def __init__(self, market_state: dict, market_data):
+    def __init__(self, market_state: dict, market_data, history_store=None):
         self.volatility = market_state['volatility']
         self.market_data = market_data
+        self.history_store = history_store
 
     async def run_backtest(self, symbols: list, strategy: str, timeframe: str = '1h', limit: int = 30, exchange_name: str = 'mexc') -> dict:
         """Run a backtest for the specified symbols and strategy."""
         try:
             results = {}
             for symbol in symbols:
-                # Получаем данные для символа
-                klines = await self.market_data.get_klines(symbol, timeframe, limit, exchange_name)
+                # Получаем данные для символа: сначала из локальной истории, без сети
+                klines = self.history_store.read(exchange_name, symbol, timeframe, limit=limit) if self.history_store else None
+                if not klines or len(klines) < limit:
+                    klines = await self.market_data.get_klines(symbol, timeframe, limit, exchange_name)
                 if not klines:
                     logger.warning(f"No data for {symbol} on {exchange_name}")
                     continue
@@ -42,9 +45,9 @@ class Backtester:
                 for i in range(1, len(klines)):
                     signal = await strat.generate_signal(symbol, timeframe, i, exchange_name)
                     if signal == 'buy':
-                        profit -= klines[i]['close']  # Покупаем
+                        profit -= klines.close[i]  # Покупаем
                     elif signal == 'sell' and profit < 0:
-                        profit += klines[i]['close']  # Продаём
+                        profit += klines.close[i]  # Продаём
 
                 results[symbol] = {'profit': profit}
                 logger.info(f"Backtest result for {symbol}: {results[symbol]}")
@@ -3,6 +3,7 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import time
 from models.local_model_api import LocalModelAPI
@@ -31,6 +32,9 @@ class OnlineLearning:
         self.performance_metrics = {}  # Track performance of each model
         self.retrain_interval = 300  # Retrain every 5 minutes
         self.last_retrain = {}
+        self.min_history = 40  # LSTM и RNN обучаются на окнах по 20 свечей и требуют не меньше 40
+        # Модели не рассчитаны на параллельные вызовы: один поток выполняет обучение и прогнозы вне цикла событий
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='online_learning')
         logger.info("Finished initialization of OnlineLearning")
 
     async def retrain(self, symbol: str, timeframe: str, limit: int, exchange_name: str):
@@ -41,9 +45,10 @@ class OnlineLearning:
                 logger.warning(f"No klines data for {symbol}, skipping retraining")
                 return
 
+            loop = asyncio.get_running_loop()
             for model_name, model in self.models.items():
                 if model_name not in self.last_retrain or (time.time() - self.last_retrain.get(model_name, 0)) > self.retrain_interval:
-                    success = model.train(klines)
+                    success = await loop.run_in_executor(self.executor, model.train, klines)
                     if success:
                         self.last_retrain[model_name] = time.time()
                         logger.info(f"Retrained {model_name} model for {symbol}")
@@ -60,12 +65,9 @@ class OnlineLearning:
                 logger.warning(f"No klines data for {symbol}, skipping prediction")
                 return None
 
-            predictions = {}
-            for model_name, model in self.models.items():
-                prediction = model.predict(klines)
-                if prediction is not None:
-                    predictions[model_name] = prediction
-                    logger.info(f"{model_name} predicted {prediction} for {symbol}")
+            predictions = await asyncio.get_running_loop().run_in_executor(self.executor, self.predict_all, klines)
+            for model_name, prediction in predictions.items():
+                logger.info(f"{model_name} predicted {prediction} for {symbol}")
 
             if not predictions:
                 logger.warning(f"No predictions available for {symbol}")
@@ -83,6 +85,15 @@ class OnlineLearning:
             logger.error(f"Failed to predict for {symbol}: {str(e)}")
             return None
 
+    def predict_all(self, klines):
+        """Run every model on the klines; called in the model executor thread."""
+        predictions = {}
+        for model_name, model in self.models.items():
+            prediction = model.predict(klines)
+            if prediction is not None:
+                predictions[model_name] = prediction
+        return predictions
+
     async def select_model(self, volatility: float):
         """Select the best model based on market volatility asynchronously."""
         try:
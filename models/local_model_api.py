@@ -5,6 +5,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import numpy as np
 import xgboost as xgb
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
 
 logger = setup_logging('local_model_api')
 
@@ -22,21 +23,9 @@ class LocalModelAPI:
                 logger.warning("Not enough klines data for XGBoost preprocessing")
                 return None, None
 
-            features = []
-            targets = []
-            for i in range(len(klines) - 1):
-                kline = klines[i]
-                feature = [
-                    kline[1],  # Open
-                    kline[2],  # High
-                    kline[3],  # Low
-                    kline[4],  # Close
-                    kline[5]   # Volume
-                ]
-                features.append(feature)
-                targets.append(klines[i + 1][4])  # Next closing price
-            X = np.array(features)
-            y = np.array(targets)
+            klines = KlineFrame.ensure(klines)
+            X = klines.values[:, :-1].T  # Open, High, Low, Close, Volume
+            y = klines.close[1:]  # Next closing price
             logger.info(f"Preprocessed {len(X)} samples for XGBoost")
             return X, y
         except Exception as e:
@@ -2,6 +2,7 @@ from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import SimpleRNN, Dense
 import numpy as np
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
 
 logger = setup_logging('rnn_model')
 
@@ -18,17 +19,12 @@ class RNNModel:
 
     def train(self, klines):
         try:
-            closes = [kline[4] for kline in klines][-200:]
+            closes = KlineFrame.ensure(klines).close[-200:]
             if len(closes) < 40:
                 logger.warning("Not enough data for training RNN")
                 return False
-            data = np.array(closes)
-            X, y = [], []
-            for i in range(len(data) - 20):
-                X.append(data[i:i+20])
-                y.append(data[i+20])
-            X = np.array(X).reshape(-1, 20, 1)
-            y = np.array(y)
+            X = np.lib.stride_tricks.sliding_window_view(closes[:-1], 20).reshape(-1, 20, 1)
+            y = closes[20:]
             self.model.fit(X, y, epochs=1, verbose=0)
             logger.info("RNN model trained successfully")
             return True
@@ -38,11 +34,11 @@ class RNNModel:
 
     def predict(self, klines):
         try:
-            closes = [kline[4] for kline in klines][-20:]
+            closes = KlineFrame.ensure(klines).close[-20:]
             if len(closes) < 20:
                 logger.warning("Not enough data for prediction")
                 return None
-            X = np.array(closes).reshape(1, 20, 1)
+            X = closes.reshape(1, 20, 1)
             prediction = self.model.predict(X, verbose=0)[0][0]
             logger.info(f"RNN prediction: {prediction}")
             return prediction
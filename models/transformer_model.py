@@ -7,6 +7,7 @@ import tensorflow as tf
 from tensorflow.keras.layers import Input, Dense, Dropout, LayerNormalization, MultiHeadAttention, GlobalAveragePooling1D
 from tensorflow.keras.models import Model
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
 
 logger = setup_logging('transformer_model')
 
@@ -48,13 +49,9 @@ class TransformerModel:
                 logger.warning("Not enough klines data for Transformer preprocessing")
                 return None, None
 
-            prices = np.array([kline[4] for kline in klines])  # Use closing prices
-            X, y = [], []
-            for i in range(len(prices) - self.lookback):
-                X.append(prices[i:i + self.lookback])
-                y.append(prices[i + self.lookback])
-            X = np.array(X).reshape(-1, self.lookback, 1)
-            y = np.array(y)
+            prices = KlineFrame.ensure(klines).close  # Use closing prices
+            X = np.lib.stride_tricks.sliding_window_view(prices[:-1], self.lookback).reshape(-1, self.lookback, 1)
+            y = prices[self.lookback:]
             logger.info(f"Preprocessed {len(X)} samples for Transformer")
             return X, y
         except Exception as e:
@@ -8,13 +8,15 @@ import json
 from datetime import datetime, timedelta
 from loguru import logger
 from ccxt.async_support import Exchange
+from exchange_pool import ExchangePool
 
 class DealPool:
-    def __init__(self, db_config: dict, redis_config: dict, archive_dir: str = "archives"):
+    def __init__(self, db_config: dict, redis_config: dict, archive_dir: str = "archives", exchange_pool: ExchangePool = None):
         """Initialize DealPool for managing trades."""
         self.db_config = db_config
         self.redis_config = redis_config
         self.archive_dir = archive_dir
+        self.exchange_pool = exchange_pool or ExchangePool()
         self.pool = None
         self.redis = None
         os.makedirs(archive_dir, exist_ok=True)
@@ -39,7 +41,7 @@ class DealPool:
         trade_id = trade["id"]
         trade_data = {
             "id": trade_id,
-            "exchange": exchange.name,
+            "exchange": exchange if isinstance(exchange, str) else exchange.name,
             "symbol": trade["symbol"],
             "amount": trade["amount"],
             "price": trade["price"],
@@ -70,6 +72,16 @@ class DealPool:
         await self.redis.setex(f"trade:{trade_id}", 3600, json.dumps(trade_data))
         logger.info("Saved trade {} to PostgreSQL and Redis", trade_id)
 
+    async def sync_trades(self, exchange_name: str, symbol: str = None, since: int = None) -> int:
+        """Fetch own trades through the shared exchange client and save them."""
+        exchange = await self.exchange_pool.get_exchange(exchange_name)
+        trades = await self.exchange_pool.rate_limiter.call(exchange_name, 'fetch_my_trades', exchange.fetch_my_trades, symbol, since)
+        for trade in trades:
+            fee = trade.get("fee") or {}
+            await self.save_trade(exchange, {**trade, "fee": fee.get("cost", 0.0) if isinstance(fee, dict) else fee})
+        logger.info("Synced {} trades from {}", len(trades), exchange_name)
+        return len(trades)
+
     async def archive_old_trades(self, days: int = 30):
         """Archive trades older than specified days to ZIP."""
         cutoff_date = datetime.utcnow() - timedelta(days=days)
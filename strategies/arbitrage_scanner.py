@@ -0,0 +1,201 @@
+import time
+from collections import Counter
+import numpy as np
+from utils.logging_setup import setup_logging
+from data_sources.price_board import PriceBoard
+from data_sources.market_metadata import MarketMetadataService
+
+logger = setup_logging('arbitrage_scanner')
+
+# Базовые тейкерские комиссии спота, если в метаданных рынка нет своей
+DEFAULT_TAKER_FEES = {
+    'mexc': 0.0005,
+    'binance': 0.001,
+    'bybit': 0.001,
+    'kucoin': 0.001,
+    'kraken': 0.0026,
+    'coinbase': 0.006,
+    'bitstamp': 0.004,
+    'htx': 0.002,
+}
+
+class ArbitrageScanner:
+    """Best bid/ask of a (symbol x exchange) universe with all fee-adjusted venue pairs scanned at once.
+
+    Buying on exchange i costs ask * (1 + fee) and selling on exchange j
+    yields bid * (1 - fee); the edge of every (symbol, i, j) triple is one
+    broadcast division over the matrices. A quote update rescans only its
+    symbol's row, so opportunities are ranked as soon as a book moves.
+    """
+
+    def __init__(self, exchanges=None, symbols=None, fees=None, min_edge=0.001, max_age=10, price_board=None, metadata=None):
+        self.exchanges = list(exchanges or DEFAULT_TAKER_FEES)
+        self.exchange_index = {name: j for j, name in enumerate(self.exchanges)}
+        self.fees = fees or {}
+        self.min_edge = min_edge
+        self.max_age = max_age  # Секунды; более старые котировки не участвуют в поиске
+        self.price_board = price_board or PriceBoard()
+        self.metadata = metadata or MarketMetadataService()
+        self.handlers = []  # callback(opportunities)
+        self.opportunities = {}  # symbol -> возможности последнего скана строки, лучшие первыми
+        self.symbols = []
+        self.symbol_index = {}
+        width = len(self.exchanges)
+        self.bid = np.empty((0, width))
+        self.ask = np.empty((0, width))
+        self.fee = np.empty((0, width))
+        self.updated_at = np.empty((0, width), dtype=np.int64)
+        self.board_ids = np.empty((0, width), dtype=np.int64)
+        self.stats = {'scans': 0, 'opportunities': 0}
+        self.add_symbols(symbols or [])
+
+    def shared_universe(self, min_exchanges=2):
+        """Symbols listed on at least ``min_exchanges`` of the scanned exchanges."""
+        counts = Counter(symbol for name in self.exchanges for symbol in set(self.metadata.get_symbols(name)))
+        return sorted(symbol for symbol, count in counts.items() if count >= min_exchanges)
+
+    def taker_fee(self, exchange_name, symbol):
+        market = self.metadata.get_market(exchange_name, symbol)
+        if market and market.get('taker') is not None:
+            return float(market['taker'])
+        return self.fees.get(exchange_name, DEFAULT_TAKER_FEES.get(exchange_name, 0.002))
+
+    def add_symbols(self, symbols):
+        """Append rows for symbols not yet in the matrix."""
+        new = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self.symbol_index]
+        if not new:
+            return
+        for symbol in new:
+            self.symbol_index[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        shape = (len(new), len(self.exchanges))
+        fee = np.array([[self.taker_fee(name, symbol) for name in self.exchanges] for symbol in new], dtype=np.float64).reshape(shape)
+        self.bid = np.vstack([self.bid, np.full(shape, np.nan)])
+        self.ask = np.vstack([self.ask, np.full(shape, np.nan)])
+        self.fee = np.vstack([self.fee, fee])
+        self.updated_at = np.vstack([self.updated_at, np.zeros(shape, dtype=np.int64)])
+        self.board_ids = np.vstack([self.board_ids, np.full(shape, -1, dtype=np.int64)])
+
+    def load_universe(self, min_exchanges=2):
+        self.add_symbols(self.shared_universe(min_exchanges))
+        logger.info(f"Arbitrage universe: {len(self.symbols)} symbols across {len(self.exchanges)} exchanges")
+
+    def attach(self, websocket_manager=None, order_books=None):
+        """Rescan a symbol on every quote from book ticker streams and local order books."""
+        if websocket_manager is not None:
+            websocket_manager.quote_handlers.append(self.on_quote)
+        if order_books is not None:
+            order_books.quote_handlers.append(self.on_quote)
+
+    def start(self, websocket_manager=None, order_books=None, min_exchanges=2):
+        """Load the shared universe once, rank it from the price board and follow quote updates from then on."""
+        self.load_universe(min_exchanges)
+        self.refresh()
+        self.rank()
+        self.attach(websocket_manager, order_books)
+
+    def refresh(self):
+        """Copy best bid/ask of the whole universe from the price board with one gather per column."""
+        for row, col in np.argwhere(self.board_ids < 0):
+            symbol_id = self.price_board.registry.get(self.exchanges[col], self.symbols[row])
+            if symbol_id is not None:
+                self.board_ids[row, col] = symbol_id
+        known = self.board_ids >= 0
+        ids = self.board_ids[known]
+        self.bid[known] = self.price_board.bid[ids]
+        self.ask[known] = self.price_board.ask[ids]
+        self.updated_at[known] = self.price_board.quote_at[ids]
+
+    def on_quote(self, exchange, symbol, bid, ask, timestamp=None):
+        """WebSocketManager quote handler: update one cell and rescan its symbol."""
+        col = self.exchange_index.get(exchange)
+        row = self.symbol_index.get(symbol)
+        if col is None or row is None:
+            return []
+        self.bid[row, col] = bid
+        self.ask[row, col] = ask
+        self.updated_at[row, col] = timestamp or int(time.time() * 1000)
+        opportunities = self.scan(rows=[row])
+        self.opportunities[symbol] = opportunities
+        if opportunities:
+            for handler in self.handlers:
+                handler(opportunities)
+        return opportunities
+
+    def edges(self, rows=None):
+        """Fee-adjusted edge[symbol, buy_exchange, sell_exchange]; NaN where a quote is missing or stale."""
+        rows = slice(None) if rows is None else rows
+        bid, ask, fee = self.bid[rows], self.ask[rows], self.fee[rows]
+        if self.max_age:
+            stale = self.updated_at[rows] < time.time() * 1000 - self.max_age * 1000
+            bid = np.where(stale, np.nan, bid)
+            ask = np.where(stale, np.nan, ask)
+        buy = ask * (1 + fee)
+        sell = bid * (1 - fee)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            edge = sell[:, None, :] / buy[:, :, None] - 1
+        diagonal = np.arange(len(self.exchanges))
+        edge[:, diagonal, diagonal] = np.nan
+        return edge
+
+    def scan(self, rows=None, min_edge=None):
+        """Profitable (buy venue, sell venue) pairs ranked by fee-adjusted edge, best first."""
+        min_edge = self.min_edge if min_edge is None else min_edge
+        row_ids = np.arange(len(self.symbols)) if rows is None else np.asarray(rows)
+        edge = self.edges(rows)
+        with np.errstate(invalid='ignore'):
+            s, i, j = np.nonzero(edge > min_edge)
+        values = edge[s, i, j]
+        order = np.argsort(-values, kind='stable')
+        s, i, j, values = row_ids[s[order]], i[order], j[order], values[order]
+        self.stats['scans'] += 1
+        self.stats['opportunities'] += len(values)
+        return [{
+            'symbol': self.symbols[row],
+            'buy_exchange': self.exchanges[buy],
+            'sell_exchange': self.exchanges[sell],
+            'buy_price': float(self.ask[row, buy]),
+            'sell_price': float(self.bid[row, sell]),
+            'edge': float(value),
+        } for row, buy, sell, value in zip(s.tolist(), i.tolist(), j.tolist(), values.tolist())]
+
+    def rank(self):
+        """Rescan the whole universe and keep the ranked opportunities of every symbol."""
+        self.opportunities = {}
+        for opportunity in self.scan():
+            self.opportunities.setdefault(opportunity['symbol'], []).append(opportunity)
+
+    def best_for(self, symbol, exchange_name, min_edge=None):
+        """Best ranked opportunity for a symbol with ``exchange_name`` as one leg and both quotes still fresh, or None."""
+        min_edge = self.min_edge if min_edge is None else min_edge
+        row = self.symbol_index.get(symbol)
+        cutoff = time.time() * 1000 - self.max_age * 1000 if self.max_age else None
+        for opportunity in self.opportunities.get(symbol, []):
+            if opportunity['edge'] <= min_edge or exchange_name not in (opportunity['buy_exchange'], opportunity['sell_exchange']):
+                continue
+            legs = [self.exchange_index[opportunity['buy_exchange']], self.exchange_index[opportunity['sell_exchange']]]
+            if cutoff is not None and (self.updated_at[row, legs] < cutoff).any():
+                continue
+            return opportunity
+        return None
+
+if __name__ == "__main__":
+    # Test run
+    class Metadata:
+        def get_market(self, exchange_name, symbol):
+            return None
+
+    rng = np.random.default_rng(0)
+    symbols = [f"SYM{i}/USDT" for i in range(2000)]
+    scanner = ArbitrageScanner(symbols=symbols, metadata=Metadata(), max_age=0)
+    mid = rng.uniform(1, 1000, (len(symbols), 1)) * (1 + rng.normal(0, 0.002, (len(symbols), len(scanner.exchanges))))
+    scanner.bid[:] = mid * 0.9998
+    scanner.ask[:] = mid * 1.0002
+    start = time.perf_counter()
+    opportunities = scanner.scan()
+    print(f"Full scan of {len(symbols)}x{len(scanner.exchanges)}: {(time.perf_counter() - start) * 1000:.2f} ms, {len(opportunities)} opportunities")
+    start = time.perf_counter()
+    for _ in range(10000):
+        scanner.on_quote('binance', 'SYM42/USDT', 100.0, 100.02)
+    print(f"Quote update + row scan: {(time.perf_counter() - start) / 10000 * 1e6:.1f} us")
+    print(opportunities[0])
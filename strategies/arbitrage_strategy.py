@@ -1,46 +1,105 @@
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
+from strategies.feature_cache import FeatureCache
+from strategies.parameter_store import ParameterStore
+from data_sources.order_book import OrderBookManager
+from strategies.arbitrage_scanner import ArbitrageScanner
 
 logger = setup_logging('arbitrage_strategy')
 
 class ArbitrageStrategy:
+    name = "arbitrage"
+
     def __init__(self, market_state, market_data, volatility_analyzer):
         self.market_state = market_state
         self.market_data = market_data
         self.volatility_analyzer = volatility_analyzer
-        self.price_diff_threshold = 0.02
+        self.feature_cache = FeatureCache()
+        self.parameter_store = ParameterStore()
+        self.base_price_diff_threshold = 0.02
+        self.defaults = {'price_diff_threshold': self.base_price_diff_threshold}
+        self.order_books = OrderBookManager()
+        self.exchanges = ["mexc", "binance", "bybit", "kucoin", "kraken", "coinbase", "bitstamp", "htx"]
+        self.trade_size = 100
+        self.scanner = ArbitrageScanner(self.exchanges)
 
     async def adapt_parameters(self, symbol, timeframe, limit, exchange_name):
         """Adapt arbitrage threshold based on volatility."""
+        params = self.parameter_store.get(self.name, exchange_name, symbol, timeframe, self.defaults)
         try:
             klines = await self.market_data.get_klines(symbol, timeframe, limit, exchange_name)
             if not klines:
                 logger.warning(f"No klines for {symbol}, using default threshold")
-                return
-            volatility_factor = self.volatility_analyzer.analyze(klines)
-            self.price_diff_threshold = 0.02 + 0.01 * volatility_factor
-            logger.info(f"Adapted price difference threshold for {symbol}: {self.price_diff_threshold}")
+                return params
+            volatility_factor = self.feature_cache.features(exchange_name, symbol, timeframe, klines).volatility(self.volatility_analyzer)
+            params = self.parameter_store.set(self.name, exchange_name, symbol, timeframe, {'price_diff_threshold': self.base_price_diff_threshold + 0.01 * volatility_factor})
+            logger.info(f"Adapted price difference threshold for {symbol}: {params['price_diff_threshold']}")
         except Exception as e:
             logger.error(f"Failed to adapt parameters for {symbol}: {str(e)}")
+        return params
+
+    def cross_exchange_signal(self, symbol, exchange_name, threshold):
+        """Compare executable prices for trade_size across local order books; None without two in-sync books."""
+        books = {name: self.order_books.get(name, symbol) for name in self.exchanges}
+        books = {name: book for name, book in books.items() if book is not None}
+        if exchange_name not in books or len(books) < 2:
+            return None
+        own = books[exchange_name]
+        buy_here = own.vwap('buy', self.trade_size)
+        sell_here = own.vwap('sell', self.trade_size)
+        for other_name, other in books.items():
+            if other_name == exchange_name:
+                continue
+            sell_there = other.vwap('sell', self.trade_size)
+            buy_there = other.vwap('buy', self.trade_size)
+            if buy_here and sell_there and (sell_there - buy_here) / buy_here > threshold:
+                return "buy", buy_here, (sell_there - buy_here) / buy_here
+            if sell_here and buy_there and (sell_here - buy_there) / buy_there > threshold:
+                return "sell", sell_here, (sell_here - buy_there) / buy_there
+        return "hold", own.mid_price(), 0.0
+
+    def attach_streams(self, websocket_manager, order_books):
+        """Start the scanner on the shared universe; from then on it rescans a symbol on each of its quote updates."""
+        self.scanner.start(websocket_manager, order_books)
+
+    def scanner_signal(self, symbol, exchange_name, threshold):
+        """Fee-adjusted top-of-book opportunity across all scanned exchanges with this exchange as one leg."""
+        opportunity = self.scanner.best_for(symbol, exchange_name, threshold)
+        if opportunity is None:
+            return None
+        if opportunity['buy_exchange'] == exchange_name:
+            return "buy", opportunity['buy_price'], opportunity['edge']
+        return "sell", opportunity['sell_price'], opportunity['edge']
 
     async def generate_signal(self, symbol, klines, timeframe, limit, exchange_name):
         """Generate an arbitrage signal (simplified)."""
         try:
-            await self.adapt_parameters(symbol, timeframe, limit, exchange_name)
-            closes = [kline[4] for kline in klines][-2:]
+            params = await self.adapt_parameters(symbol, timeframe, limit, exchange_name)
+            cross = self.cross_exchange_signal(symbol, exchange_name, params['price_diff_threshold'])
+            if cross is None or cross[0] == "hold":
+                # Без стаканов глубины ищем по лучшим ценам всех бирж с учётом комиссий
+                cross = self.scanner_signal(symbol, exchange_name, params['price_diff_threshold']) or cross
+            if cross is not None:
+                signal, price, edge = cross
+                logger.info(f"Generated order book arbitrage signal for {symbol}: {signal}, edge={edge}")
+                return {"symbol": symbol, "strategy": "arbitrage", "signal": signal, "entry_price": float(price), "trade_size": self.trade_size, "timeframe": timeframe, "limit": limit, "exchange_name": exchange_name}
+
+            klines = KlineFrame.ensure(klines)
+            closes = klines.close[-2:]
             if len(closes) < 2:
                 logger.warning(f"Not enough data for {symbol}")
                 return None
 
             price_diff = (closes[-1] - closes[-2]) / closes[-2] if closes[-2] != 0 else 0
-            if price_diff > self.price_diff_threshold:
+            if price_diff > params['price_diff_threshold']:
                 signal = "sell"
-            elif price_diff < -self.price_diff_threshold:
+            elif price_diff < -params['price_diff_threshold']:
                 signal = "buy"
             else:
                 signal = "hold"
 
             logger.info(f"Generated arbitrage signal for {symbol}: {signal}, price_diff={price_diff}")
-            return {"symbol": symbol, "strategy": "arbitrage", "signal": signal, "entry_price": closes[-1], "trade_size": 100, "timeframe": timeframe, "limit": limit, "exchange_name": exchange_name}
+            return {"symbol": symbol, "strategy": "arbitrage", "signal": signal, "entry_price": float(closes[-1]), "trade_size": self.trade_size, "timeframe": timeframe, "limit": limit, "exchange_name": exchange_name}
         except Exception as e:
             logger.error(f"Failed to generate arbitrage signal for {symbol}: {str(e)}")
             return None
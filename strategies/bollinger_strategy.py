@@ -1,43 +1,65 @@
 import numpy as np
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
+from strategies.feature_cache import FeatureCache
+from strategies.parameter_store import ParameterStore
 
 logger = setup_logging('bollinger_strategy')
 
 class BollingerStrategy:
+    name = "bollinger"
+
     def __init__(self, market_state, market_data, volatility_analyzer, period=20, deviation=2):
         self.market_state = market_state
         self.market_data = market_data
         self.volatility_analyzer = volatility_analyzer
+        self.feature_cache = FeatureCache()
+        self.parameter_store = ParameterStore()
         self.period = period
         self.base_deviation = deviation
-        self.deviation = deviation
+        self.defaults = {'deviation': deviation}
 
     async def adapt_parameters(self, symbol, timeframe, limit, exchange_name):
         """Adapt Bollinger Bands deviation based on market volatility."""
+        params = self.parameter_store.get(self.name, exchange_name, symbol, timeframe, self.defaults)
         try:
             klines = await self.market_data.get_klines(symbol, timeframe, limit, exchange_name)
             if not klines:
                 logger.warning(f"No klines for {symbol}, using default deviation")
-                return
-            self.deviation = self.base_deviation * (1 + self.volatility_analyzer.analyze(klines))
-            logger.info(f"Adapted deviation for {symbol}: {self.deviation}")
+                return params
+            volatility_factor = self.feature_cache.features(exchange_name, symbol, timeframe, klines).volatility(self.volatility_analyzer)
+            params = self.parameter_store.set(self.name, exchange_name, symbol, timeframe, {'deviation': self.base_deviation * (1 + volatility_factor)})
+            logger.info(f"Adapted deviation for {symbol}: {params['deviation']}")
         except Exception as e:
             logger.error(f"Failed to adapt parameters for {symbol}: {str(e)}")
+        return params
+
+    def signals_batch(self, close, high, low, volume, volatility):
+        """Vectorized generate_signal over (symbols x time) matrices: 1 buy, -1 sell, 0 hold per symbol."""
+        if close.shape[1] < self.period:
+            return np.zeros(len(close), dtype=np.int8)
+        window = close[:, -self.period:]
+        sma = window.mean(axis=1)
+        std = window.std(axis=1)
+        deviation = self.base_deviation * (1 + volatility)
+        price = close[:, -1]
+        return np.select([price > sma + deviation * std, price < sma - deviation * std], [-1, 1], 0).astype(np.int8)
 
     async def generate_signal(self, symbol, klines, timeframe, limit, exchange_name):
         """Generate a signal using Bollinger Bands."""
         try:
-            await self.adapt_parameters(symbol, timeframe, limit, exchange_name)
-            closes = [kline[4] for kline in klines][-self.period:]
+            params = await self.adapt_parameters(symbol, timeframe, limit, exchange_name)
+            klines = KlineFrame.ensure(klines)
+            features = self.feature_cache.features(exchange_name, symbol, timeframe, klines)
+            closes = klines.close[-self.period:]
             if len(closes) < self.period:
                 logger.warning(f"Not enough data for {symbol}")
                 return None
 
-            sma = np.mean(closes)
-            std = np.std(closes)
-            upper_band = sma + self.deviation * std
-            lower_band = sma - self.deviation * std
-            current_price = closes[-1]
+            sma, std = features.indicator('rolling_stats', self.period).value
+            upper_band = sma + params['deviation'] * std
+            lower_band = sma - params['deviation'] * std
+            current_price = float(closes[-1])
 
             if current_price > upper_band:
                 signal = "sell"
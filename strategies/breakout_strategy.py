@@ -1,44 +1,68 @@
+import numpy as np
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
+from strategies.feature_cache import FeatureCache
+from strategies.parameter_store import ParameterStore
 
 logger = setup_logging('breakout_strategy')
 
 class BreakoutStrategy:
+    name = "breakout"
+
     def __init__(self, market_state, market_data, volatility_analyzer):
         self.market_state = market_state
         self.market_data = market_data
         self.volatility_analyzer = volatility_analyzer
+        self.feature_cache = FeatureCache()
+        self.parameter_store = ParameterStore()
         self.lookback_period = 20
-        self.breakout_threshold = 0.03
+        self.base_breakout_threshold = 0.03
+        self.defaults = {'breakout_threshold': self.base_breakout_threshold}
 
     async def adapt_parameters(self, symbol, timeframe, limit, exchange_name):
         """Adapt breakout threshold based on volatility."""
+        params = self.parameter_store.get(self.name, exchange_name, symbol, timeframe, self.defaults)
         try:
             klines = await self.market_data.get_klines(symbol, timeframe, limit, exchange_name)
             if not klines:
                 logger.warning(f"No klines for {symbol}, using default breakout threshold")
-                return
-            volatility_factor = self.volatility_analyzer.analyze(klines)
-            self.breakout_threshold = 0.03 * (1 + volatility_factor)
-            logger.info(f"Adapted breakout threshold for {symbol}: {self.breakout_threshold}")
+                return params
+            volatility_factor = self.feature_cache.features(exchange_name, symbol, timeframe, klines).volatility(self.volatility_analyzer)
+            params = self.parameter_store.set(self.name, exchange_name, symbol, timeframe, {'breakout_threshold': self.base_breakout_threshold * (1 + volatility_factor)})
+            logger.info(f"Adapted breakout threshold for {symbol}: {params['breakout_threshold']}")
         except Exception as e:
             logger.error(f"Failed to adapt parameters for {symbol}: {str(e)}")
+        return params
+
+    def signals_batch(self, close, high, low, volume, volatility):
+        """Vectorized generate_signal over (symbols x time) matrices: 1 buy, -1 sell, 0 hold per symbol."""
+        if close.shape[1] < self.lookback_period:
+            return np.zeros(len(close), dtype=np.int8)
+        resistance = high[:, -self.lookback_period:-1].max(axis=1)
+        support = low[:, -self.lookback_period:-1].min(axis=1)
+        threshold = self.base_breakout_threshold * (1 + volatility)
+        price = close[:, -1]
+        return np.select([price > resistance * (1 + threshold), price < support * (1 - threshold)], [1, -1], 0).astype(np.int8)
 
     async def generate_signal(self, symbol, klines, timeframe, limit, exchange_name):
         """Generate a breakout signal."""
         try:
-            await self.adapt_parameters(symbol, timeframe, limit, exchange_name)
-            highs = [kline[2] for kline in klines][-self.lookback_period:]
-            lows = [kline[3] for kline in klines][-self.lookback_period:]
-            current_price = klines[-1][4]
+            params = await self.adapt_parameters(symbol, timeframe, limit, exchange_name)
+            klines = KlineFrame.ensure(klines)
+            features = self.feature_cache.features(exchange_name, symbol, timeframe, klines)
+            highs = klines.high[-self.lookback_period:]
+            lows = klines.low[-self.lookback_period:]
+            current_price = float(klines.close[-1])
 
             if len(highs) < self.lookback_period:
                 logger.warning(f"Not enough data for {symbol}")
                 return None
 
-            resistance = max(highs[:-1])
-            support = min(lows[:-1])
-            breakout_up = current_price > resistance * (1 + self.breakout_threshold)
-            breakout_down = current_price < support * (1 - self.breakout_threshold)
+            # Уровни по закрытым свечам до текущей: значение индикатора на предыдущей свече
+            resistance = features.indicator('rolling_max', self.lookback_period - 1, 'high').previous
+            support = features.indicator('rolling_min', self.lookback_period - 1, 'low').previous
+            breakout_up = current_price > resistance * (1 + params['breakout_threshold'])
+            breakout_down = current_price < support * (1 - params['breakout_threshold'])
 
             if breakout_up:
                 signal = "buy"
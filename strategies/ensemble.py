@@ -0,0 +1,134 @@
+import numpy as np
+from utils.logging_setup import setup_logging
+
+logger = setup_logging('ensemble')
+
+SIGNAL_SCORES = {"buy": 1.0, "sell": -1.0, "hold": 0.0}
+
+class SignalEnsemble:
+    """Weighted vote of all strategy signals over a (strategies x symbols) score matrix.
+
+    Each cell holds 1 buy, -1 sell or 0 hold, and optionally a confidence in
+    [0, 1]. The consensus of a symbol is the weighted mean score over the
+    strategies that answered; strategies that were dropped (deadline, error)
+    do not dilute it. Weights start from the configured values and are learned
+    with multiplicative updates from the returns that followed each vote.
+    """
+
+    def __init__(self, strategy_names, weights=None, threshold=0.3, trade_size=100, learning_rate=0.1, min_weight=0.05):
+        self.names = list(strategy_names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        weights = weights or {}
+        self.weights = np.array([float(weights.get(name, 1.0)) for name in self.names])
+        self.threshold = threshold  # Минимальный |консенсус| для сделки
+        self.trade_size = trade_size  # Размер при единогласном голосовании
+        self.learning_rate = learning_rate
+        self.min_weight = min_weight
+        self.pending = {}  # (exchange, symbol) -> (scores, answered, price) последнего голосования
+
+    def align(self, names, scores):
+        """Reorder rows of a matrix from generate_signals_batch to this ensemble's strategies; returns (scores, answered)."""
+        aligned = np.zeros((len(self.names), scores.shape[1]))
+        answered = np.zeros(aligned.shape, dtype=bool)
+        for row, name in enumerate(names):
+            if name in self.index:
+                aligned[self.index[name]] = scores[row]
+                answered[self.index[name]] = True
+        return aligned, answered
+
+    def score_matrix(self, signals_by_symbol):
+        """Build (scores, confidence, answered) matrices from generate_signals output, one list per symbol."""
+        shape = (len(self.names), len(signals_by_symbol))
+        scores = np.zeros(shape)
+        confidence = np.ones(shape)
+        answered = np.zeros(shape, dtype=bool)
+        for column, signals in enumerate(signals_by_symbol):
+            for signal in signals:
+                row = self.index.get(signal.get('strategy'))
+                if row is None or signal.get('signal') not in SIGNAL_SCORES:
+                    continue
+                scores[row, column] = SIGNAL_SCORES[signal['signal']]
+                confidence[row, column] = signal.get('confidence', 1.0)
+                answered[row, column] = True
+        return scores, confidence, answered
+
+    def consensus(self, scores, confidence=None, answered=None):
+        """Weighted mean score per symbol in [-1, 1]; 0 where no strategy answered."""
+        weighted = self.weights[:, None] * (confidence if confidence is not None else 1.0) * scores
+        weight_sums = self.weights[:, None] * (answered if answered is not None else np.ones(scores.shape, dtype=bool))
+        weight_sums = weight_sums.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(weight_sums > 0, weighted.sum(axis=0) / weight_sums, 0.0)
+
+    def actions(self, consensus):
+        """Return (actions, sizes) per symbol: 1 buy, -1 sell, 0 hold and a size scaled by the consensus strength."""
+        actions = np.where(np.abs(consensus) >= self.threshold, np.sign(consensus), 0).astype(np.int8)
+        sizes = np.where(actions != 0, self.trade_size * np.abs(consensus), 0.0)
+        return actions, sizes
+
+    def decide(self, scores, confidence=None, answered=None):
+        return self.actions(self.consensus(scores, confidence, answered))
+
+    def decisions(self, symbols, signals_by_symbol, timeframe, limit, exchange_name):
+        """Final trade signals for a universe of symbols from their strategy signals, without regenerating any."""
+        try:
+            scores, confidence, answered = self.score_matrix(signals_by_symbol)
+            consensus = self.consensus(scores, confidence, answered)
+            actions, sizes = self.actions(consensus)
+            result = []
+            for column, symbol in enumerate(symbols):
+                prices = [signal['entry_price'] for signal in signals_by_symbol[column] if signal.get('entry_price')]
+                if not prices:
+                    continue
+                price = float(np.median(prices))
+                self.pending[(exchange_name, symbol)] = (scores[:, column], answered[:, column], price)
+                if actions[column] == 0:
+                    continue
+                result.append({"symbol": symbol, "strategy": "ensemble", "signal": "buy" if actions[column] > 0 else "sell", "entry_price": price, "trade_size": float(sizes[column]), "consensus": float(consensus[column]), "timeframe": timeframe, "limit": limit, "exchange_name": exchange_name})
+            logger.info(f"Ensemble decisions for {len(symbols)} symbols: {len(result)} trades")
+            return result
+        except Exception as e:
+            logger.error(f"Failed to aggregate signals: {str(e)}")
+            return []
+
+    def update(self, scores, answered, returns):
+        """Multiplicative weight update: strategies gain weight when their votes matched the sign of the returns."""
+        hits = scores * np.sign(returns)[None, :] * answered
+        counts = answered.sum(axis=1)
+        reward = np.divide(hits.sum(axis=1), counts, out=np.zeros(len(self.names)), where=counts > 0)
+        self.weights = np.maximum(self.weights * np.exp(self.learning_rate * reward), self.min_weight)
+        self.weights *= len(self.names) / self.weights.sum()
+
+    def learn(self, symbols, prices, exchange_name):
+        """Score the previous votes of ``symbols`` against their current prices and update the weights."""
+        try:
+            scores, answered, returns = [], [], []
+            for symbol, price in zip(symbols, prices):
+                if (exchange_name, symbol) not in self.pending or not price:
+                    continue
+                symbol_scores, symbol_answered, entry_price = self.pending.pop((exchange_name, symbol))
+                scores.append(symbol_scores)
+                answered.append(symbol_answered)
+                returns.append(price / entry_price - 1)
+            if not returns:
+                return
+            self.update(np.column_stack(scores), np.column_stack(answered), np.array(returns))
+            logger.info(f"Ensemble weights: {dict(zip(self.names, np.round(self.weights, 3).tolist()))}")
+        except Exception as e:
+            logger.error(f"Failed to update ensemble weights: {str(e)}")
+
+if __name__ == "__main__":
+    # Test run: голосование по 10000 символам и обучение весов
+    import time
+    rng = np.random.default_rng(0)
+    names = ["good", "noise", "contrarian"]
+    ensemble = SignalEnsemble(names)
+    for _ in range(50):
+        returns = rng.normal(0, 0.01, 10000)
+        scores = np.vstack([np.sign(returns), rng.choice([-1.0, 0.0, 1.0], 10000), -np.sign(returns)])
+        ensemble.update(scores, np.ones(scores.shape, dtype=bool), returns)
+    print(dict(zip(names, np.round(ensemble.weights, 3).tolist())))
+    scores = rng.choice([-1.0, 0.0, 1.0], (3, 10000))
+    start = time.perf_counter()
+    actions, sizes = ensemble.decide(scores)
+    print(f"decide for 10000 symbols: {(time.perf_counter() - start) * 1000:.2f} ms, {np.count_nonzero(actions)} trades")
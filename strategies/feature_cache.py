@@ -0,0 +1,75 @@
+from collections import OrderedDict
+import numpy as np
+from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
+from strategies.streaming_indicators import IndicatorStore
+
+logger = setup_logging('feature_cache')
+
+class CandleFeatures:
+    """Features derived from one candle series as of its last candle, each computed once."""
+
+    def __init__(self, cache, key, klines, candle):
+        self.cache = cache
+        self.key = key
+        self.klines = klines
+        self.candle = candle  # (timestamp, close) последней свечи
+        self.values = {}
+
+    def get(self, name, compute):
+        """Return the cached feature ``name``, computing it with ``compute(klines)`` on the first request."""
+        if name in self.values:
+            self.cache.hits += 1
+            return self.values[name]
+        self.cache.misses += 1
+        value = compute(self.klines)
+        self.values[name] = value
+        return value
+
+    def volatility(self, volatility_analyzer):
+        return self.get(('volatility',), volatility_analyzer.analyze)
+
+    def log_returns(self):
+        return self.get(('log_returns',), lambda klines: np.diff(np.log(klines.close)))
+
+    def indicator(self, kind, *params):
+        """Streaming indicator of this series brought up to the current candle (see IndicatorStore)."""
+        exchange_name, symbol, timeframe = self.key
+        return self.get((kind,) + params, lambda klines: self.cache.indicator_store.indicator(exchange_name, symbol, timeframe, klines, kind, *params))
+
+class FeatureCache:
+    """Per-candle feature cache shared by all strategies of a StrategyManager.
+
+    Entries are keyed by (exchange, symbol, timeframe) and replaced when the
+    last candle changes: a new timestamp, or a new close of the still open
+    candle. Only the newest candle of each series is kept.
+    """
+
+    _instance = None
+
+    def __new__(cls, max_series=10000):
+        if cls._instance is None:
+            cls._instance = super(FeatureCache, cls).__new__(cls)
+            cls._instance.max_series = max_series
+            cls._instance.series = OrderedDict()  # (exchange, symbol, timeframe) -> CandleFeatures
+            cls._instance.indicator_store = IndicatorStore()
+            cls._instance.hits = 0
+            cls._instance.misses = 0
+        return cls._instance
+
+    def features(self, exchange_name, symbol, timeframe, klines):
+        klines = KlineFrame.ensure(klines)
+        key = (exchange_name, symbol.split(':')[0], timeframe)
+        candle = (klines.last_timestamp, float(klines.close[-1]) if klines else None)
+        features = self.series.get(key)
+        if features is None or features.candle != candle:
+            features = CandleFeatures(self, key, klines, candle)
+            self.series[key] = features
+            if len(self.series) > self.max_series:
+                self.series.popitem(last=False)
+        self.series.move_to_end(key)
+        return features
+
+    def get_stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0, 'series': len(self.series)}
@@ -1,39 +1,60 @@
+import numpy as np
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
+from strategies.feature_cache import FeatureCache
+from strategies.parameter_store import ParameterStore
 
 logger = setup_logging('grid_strategy')
 
 class GridStrategy:
+    name = "grid"
+
     def __init__(self, market_state, market_data, volatility_analyzer):
         self.market_state = market_state
         self.market_data = market_data
         self.volatility_analyzer = volatility_analyzer
+        self.feature_cache = FeatureCache()
+        self.parameter_store = ParameterStore()
         self.grid_levels = 5
-        self.grid_spacing = 0.01
+        self.base_grid_spacing = 0.01
+        self.defaults = {'grid_spacing': self.base_grid_spacing}
 
     async def adapt_parameters(self, symbol, timeframe, limit, exchange_name):
         """Adapt grid spacing based on volatility."""
+        params = self.parameter_store.get(self.name, exchange_name, symbol, timeframe, self.defaults)
         try:
             klines = await self.market_data.get_klines(symbol, timeframe, limit, exchange_name)
             if not klines:
                 logger.warning(f"No klines for {symbol}, using default grid spacing")
-                return
-            volatility_factor = self.volatility_analyzer.analyze(klines)
-            self.grid_spacing = 0.01 * (1 + volatility_factor)
-            logger.info(f"Adapted grid spacing for {symbol}: {self.grid_spacing}")
+                return params
+            volatility_factor = self.feature_cache.features(exchange_name, symbol, timeframe, klines).volatility(self.volatility_analyzer)
+            params = self.parameter_store.set(self.name, exchange_name, symbol, timeframe, {'grid_spacing': self.base_grid_spacing * (1 + volatility_factor)})
+            logger.info(f"Adapted grid spacing for {symbol}: {params['grid_spacing']}")
         except Exception as e:
             logger.error(f"Failed to adapt parameters for {symbol}: {str(e)}")
+        return params
+
+    def signals_batch(self, close, high, low, volume, volatility):
+        """Vectorized generate_signal over (symbols x time) matrices: 1 buy, -1 sell, 0 hold per symbol."""
+        price = close[:, -1]
+        base = close[:, -self.grid_levels] if close.shape[1] >= self.grid_levels else price
+        with np.errstate(invalid='ignore', divide='ignore'):
+            price_diff = np.where(base != 0, (price - base) / base, 0.0)
+        band = self.base_grid_spacing * (1 + volatility) * self.grid_levels
+        return np.select([price_diff > band, price_diff < -band], [-1, 1], 0).astype(np.int8)
 
     async def generate_signal(self, symbol, klines, timeframe, limit, exchange_name):
         """Generate a grid trading signal (simplified)."""
         try:
-            await self.adapt_parameters(symbol, timeframe, limit, exchange_name)
-            current_price = klines[-1][4]
-            base_price = klines[-self.grid_levels][4] if len(klines) >= self.grid_levels else current_price
+            params = await self.adapt_parameters(symbol, timeframe, limit, exchange_name)
+            klines = KlineFrame.ensure(klines)
+            current_price = float(klines.close[-1])
+            base_price = float(klines.close[-self.grid_levels]) if len(klines) >= self.grid_levels else current_price
             price_diff = (current_price - base_price) / base_price if base_price != 0 else 0
 
-            if price_diff > self.grid_spacing * self.grid_levels:
+            if price_diff > params['grid_spacing'] * self.grid_levels:
                 signal = "sell"
-            elif price_diff < -self.grid_spacing * self.grid_levels:
+            elif price_diff < -params['grid_spacing'] * self.grid_levels:
                 signal = "buy"
             else:
                 signal = "hold"
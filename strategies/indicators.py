@@ -0,0 +1,232 @@
+import numpy as np
+from scipy.signal import lfilter
+
+# Все индикаторы считаются по последней оси: одномерный ряд или матрица (символы x время).
+# Результат имеет ту же длину, что и вход; первые значения без полного окна равны NaN.
+
+def ema(values, period=None, alpha=None, initial=None):
+    """Exponential moving average as a first-order recursive filter; seeded with the first value by default."""
+    values = np.asarray(values, dtype=np.float64)
+    alpha = 2 / (period + 1) if alpha is None else alpha
+    if values.shape[-1] == 0:
+        return values.copy()
+    initial = values[..., 0] if initial is None else np.asarray(initial, dtype=np.float64)
+    zi = ((1 - alpha) * np.broadcast_to(initial, values.shape[:-1]))[..., None]
+    result, _ = lfilter([alpha], [1, alpha - 1], values, axis=-1, zi=zi)
+    return result
+
+def wilder(values, period, start=0):
+    """Wilder smoothing: the mean of the first ``period`` values, then an EMA with alpha = 1 / period."""
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(values.shape, np.nan)
+    seed_end = start + period
+    if values.shape[-1] < seed_end:
+        return result
+    seed = values[..., start:seed_end].mean(axis=-1)
+    result[..., seed_end - 1] = seed
+    result[..., seed_end:] = ema(values[..., seed_end:], alpha=1 / period, initial=seed)
+    return result
+
+def _window_sums(values, period):
+    # Суммы по окнам через кумулятивную сумму, центрированную на первом значении ради точности
+    reference = values[..., :1]
+    centered = values - reference
+    zeros = np.zeros(values.shape[:-1] + (1,))
+    sums = np.cumsum(np.concatenate([zeros, centered], axis=-1), axis=-1)
+    squares = np.cumsum(np.concatenate([zeros, centered * centered], axis=-1), axis=-1)
+    return reference, sums[..., period:] - sums[..., :-period], squares[..., period:] - squares[..., :-period]
+
+def sma(values, period):
+    """Simple moving average in O(n) regardless of the window."""
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(values.shape, np.nan)
+    if period < 1 or values.shape[-1] < period:
+        return result
+    reference, sums, _ = _window_sums(values, period)
+    result[..., period - 1:] = sums / period + reference
+    return result
+
+def rolling_std(values, period, ddof=0):
+    """Rolling standard deviation from windowed sums and sums of squares."""
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(values.shape, np.nan)
+    if period <= ddof or values.shape[-1] < period:
+        return result
+    _, sums, squares = _window_sums(values, period)
+    variance = (squares - sums * sums / period) / (period - ddof)
+    result[..., period - 1:] = np.sqrt(np.maximum(variance, 0))
+    return result
+
+def _rolling_extreme(values, period, ufunc, fill):
+    # van Herk / Gil-Werman: префиксные и суффиксные экстремумы блоков длины period дают O(n) для любого окна
+    values = np.asarray(values, dtype=np.float64)
+    n = values.shape[-1]
+    result = np.full(values.shape, np.nan)
+    if period < 1 or n < period:
+        return result
+    padded_length = n + (-n) % period
+    padded = np.full(values.shape[:-1] + (padded_length,), fill)
+    padded[..., :n] = values
+    blocks = padded.reshape(values.shape[:-1] + (padded_length // period, period))
+    prefix = ufunc.accumulate(blocks, axis=-1).reshape(padded.shape)
+    suffix = ufunc.accumulate(blocks[..., ::-1], axis=-1)[..., ::-1].reshape(padded.shape)
+    result[..., period - 1:] = ufunc(suffix[..., :n - period + 1], prefix[..., period - 1:n])
+    return result
+
+def rolling_max(values, period):
+    return _rolling_extreme(values, period, np.maximum, -np.inf)
+
+def rolling_min(values, period):
+    return _rolling_extreme(values, period, np.minimum, np.inf)
+
+def zscore(values, period):
+    """Distance of each value from its rolling mean in rolling standard deviations (0 for a flat window)."""
+    values = np.asarray(values, dtype=np.float64)
+    std = rolling_std(values, period)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(std == 0, 0.0, (values - sma(values, period)) / std)
+
+def rsi(close, period=14):
+    """Wilder RSI; 100 when there were no losses over the smoothing window."""
+    close = np.asarray(close, dtype=np.float64)
+    result = np.full(close.shape, np.nan)
+    delta = np.diff(close, axis=-1)
+    avg_gain = wilder(np.maximum(delta, 0), period)
+    avg_loss = wilder(np.maximum(-delta, 0), period)
+    # 100 - 100 / (1 + gain / loss) без деления на ноль при отсутствии потерь
+    total = avg_gain + avg_loss
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result[..., 1:] = np.where(total == 0, 50.0, 100 * avg_gain / total)
+    return result
+
+def macd(close, fast_period=12, slow_period=26, signal_period=9):
+    """Return (macd_line, signal_line, histogram)."""
+    line = ema(close, fast_period) - ema(close, slow_period)
+    signal = ema(line, signal_period)
+    return line, signal, line - signal
+
+def bollinger(close, period=20, deviation=2):
+    """Return (middle, upper, lower) bands with the population standard deviation."""
+    middle = sma(close, period)
+    std = rolling_std(close, period)
+    return middle, middle + deviation * std, middle - deviation * std
+
+def true_range(high, low, close):
+    high, low, close = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    result = high - low
+    previous = close[..., :-1]
+    result[..., 1:] = np.maximum(result[..., 1:], np.maximum(np.abs(high[..., 1:] - previous), np.abs(low[..., 1:] - previous)))
+    return result
+
+def atr(high, low, close, period=14):
+    """Wilder average true range, starting from the first bar that has a previous close."""
+    return wilder(true_range(high, low, close), period, start=1)
+
+def _directional_movement(high, low):
+    up = np.diff(high, axis=-1)
+    down = -np.diff(low, axis=-1)
+    plus_dm = np.where(up > np.maximum(down, 0), up, 0.0)
+    minus_dm = np.where(down > np.maximum(up, 0), down, 0.0)
+    return plus_dm, minus_dm
+
+def _adx_line(smoothed_plus, smoothed_minus, period):
+    # DX = |+DI - -DI| / (+DI + -DI); ATR в обоих DI сокращается
+    total = smoothed_plus + smoothed_minus
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dx = np.where(total == 0, 0.0, 100 * np.abs(smoothed_plus - smoothed_minus) / total)
+    return wilder(dx, period, start=period - 1)
+
+def dmi(high, low, close, period=14):
+    """Return (plus_di, minus_di, adx) of Wilder's directional movement system."""
+    high, low = np.asarray(high, dtype=np.float64), np.asarray(low, dtype=np.float64)
+    plus_dm, minus_dm = _directional_movement(high, low)
+    smoothed_plus, smoothed_minus = wilder(plus_dm, period), wilder(minus_dm, period)
+    smoothed_tr = wilder(true_range(high, low, close)[..., 1:], period)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        plus_di = 100 * smoothed_plus / smoothed_tr
+        minus_di = 100 * smoothed_minus / smoothed_tr
+    pad = np.full(high.shape[:-1] + (1,), np.nan)
+    return tuple(np.concatenate([pad, line], axis=-1) for line in (plus_di, minus_di, _adx_line(smoothed_plus, smoothed_minus, period)))
+
+def adx(high, low, close, period=14):
+    high, low = np.asarray(high, dtype=np.float64), np.asarray(low, dtype=np.float64)
+    plus_dm, minus_dm = _directional_movement(high, low)
+    result = np.full(high.shape, np.nan)
+    result[..., 1:] = _adx_line(wilder(plus_dm, period), wilder(minus_dm, period), period)
+    return result
+
+def by_period(compute, periods, *arrays):
+    """Evaluate ``compute(*rows, period)`` once per distinct period and scatter the per-row results back.
+
+    Lets strategies whose periods adapt per symbol still run a few vectorized
+    passes over the matrix instead of one pass per symbol.
+    """
+    periods = np.asarray(periods)
+    result = None
+    for period in np.unique(periods):
+        rows = np.flatnonzero(periods == period)
+        values = compute(*(a[rows] for a in arrays), int(period))
+        if result is None:
+            result = np.zeros(len(periods), dtype=np.asarray(values).dtype)
+        result[rows] = values
+    return result
+
+if __name__ == "__main__":
+    # Test run: сравнение с прежними реализациями на циклах
+    import time
+
+    def loop_rsi(closes, period):
+        deltas = np.diff(closes)
+        gains = np.where(deltas > 0, deltas, 0)
+        losses = np.where(deltas < 0, -deltas, 0)
+        avg_gain = np.mean(gains[:period])
+        avg_loss = np.mean(losses[:period])
+        for i in range(period, len(deltas)):
+            avg_gain = (avg_gain * (period - 1) + gains[i]) / period
+            avg_loss = (avg_loss * (period - 1) + losses[i]) / period
+        rs = avg_gain / avg_loss if avg_loss != 0 else 0
+        return 100 - (100 / (1 + rs))
+
+    def loop_ema(closes, period):
+        result = [closes[0]]
+        k = 2 / (period + 1)
+        for price in closes[1:]:
+            result.append(price * k + result[-1] * (1 - k))
+        return result
+
+    def loop_rolling(closes, period):
+        means = [np.mean(closes[i - period + 1:i + 1]) for i in range(period - 1, len(closes))]
+        stds = [np.std(closes[i - period + 1:i + 1]) for i in range(period - 1, len(closes))]
+        highs = [np.max(closes[i - period + 1:i + 1]) for i in range(period - 1, len(closes))]
+        return means, stds, highs
+
+    def bench(label, vectorized, loop, repeat=20):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            vectorized()
+        fast = (time.perf_counter() - start) / repeat
+        start = time.perf_counter()
+        for _ in range(repeat):
+            loop()
+        slow = (time.perf_counter() - start) / repeat
+        print(f"{label:<22} vectorized {fast * 1000:8.3f} ms   loop {slow * 1000:8.3f} ms   x{slow / fast:.0f}")
+
+    rng = np.random.default_rng(0)
+    n = 10000
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    high = close * (1 + rng.uniform(0, 0.01, n))
+    low = close * (1 - rng.uniform(0, 0.01, n))
+
+    assert np.isclose(rsi(close, 14)[-1], loop_rsi(close, 14))
+    assert np.allclose(ema(close, 26), loop_ema(close, 26))
+    means, stds, highs = loop_rolling(close, 20)
+    assert np.allclose(sma(close, 20)[19:], means) and np.allclose(rolling_std(close, 20)[19:], stds)
+    assert np.array_equal(rolling_max(close, 20)[19:], highs)
+
+    bench("RSI(14)", lambda: rsi(close, 14), lambda: loop_rsi(close, 14))
+    bench("EMA(26)", lambda: ema(close, 26), lambda: loop_ema(close, 26))
+    bench("SMA+std+max(20)", lambda: (sma(close, 20), rolling_std(close, 20), rolling_max(close, 20)), lambda: loop_rolling(close, 20), repeat=3)
+    matrix = np.tile(close, (500, 1))[:, :1000]
+    start = time.perf_counter()
+    rsi(matrix, 14), macd(matrix), bollinger(matrix), adx(matrix * 1.01, matrix * 0.99, matrix)
+    print(f"RSI+MACD+BB+ADX on 500x1000 matrix: {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -1,66 +1,86 @@
 import numpy as np
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
+from strategies.feature_cache import FeatureCache
+from strategies.parameter_store import ParameterStore
+from strategies.registry import MAX_VOLATILITY_FACTOR
+from strategies import indicators
 
 logger = setup_logging('macd_strategy')
 
 class MACDStrategy:
+    name = "macd"
+
     def __init__(self, market_state, market_data, volatility_analyzer, fast_period=12, slow_period=26, signal_period=9):
         self.market_state = market_state
         self.market_data = market_data
         self.volatility_analyzer = volatility_analyzer
-        self.fast_period = fast_period
-        self.slow_period = slow_period
+        self.feature_cache = FeatureCache()
+        self.parameter_store = ParameterStore()
         self.signal_period = signal_period
         self.base_fast_period = fast_period
         self.base_slow_period = slow_period
+        self.defaults = {'fast_period': fast_period, 'slow_period': slow_period}
 
     async def adapt_parameters(self, symbol, timeframe, limit, exchange_name):
         """Adapt MACD periods based on market volatility."""
+        params = self.parameter_store.get(self.name, exchange_name, symbol, timeframe, self.defaults)
         try:
             klines = await self.market_data.get_klines(symbol, timeframe, limit, exchange_name)
             if not klines:
                 logger.warning(f"No klines for {symbol}, using default MACD periods")
-                return
-            volatility_factor = self.volatility_analyzer.analyze(klines)
-            self.fast_period = int(self.base_fast_period * (1 + volatility_factor))
-            self.slow_period = int(self.base_slow_period * (1 + volatility_factor))
-            logger.info(f"Adapted MACD periods for {symbol}: fast={self.fast_period}, slow={self.slow_period}")
+                return params
+            # Периоды не выходят за lookback, объявленный в реестре
+            volatility_factor = min(self.feature_cache.features(exchange_name, symbol, timeframe, klines).volatility(self.volatility_analyzer), MAX_VOLATILITY_FACTOR)
+            params = self.parameter_store.set(self.name, exchange_name, symbol, timeframe, {'fast_period': int(self.base_fast_period * (1 + volatility_factor)), 'slow_period': int(self.base_slow_period * (1 + volatility_factor))})
+            logger.info(f"Adapted MACD periods for {symbol}: fast={params['fast_period']}, slow={params['slow_period']}")
         except Exception as e:
             logger.error(f"Failed to adapt parameters for {symbol}: {str(e)}")
+        return params
+
+    def signals_batch(self, close, high, low, volume, volatility):
+        """Vectorized generate_signal over (symbols x time) matrices: 1 buy, -1 sell, 0 hold per symbol."""
+        volatility = np.minimum(volatility, MAX_VOLATILITY_FACTOR)
+        fast = (self.base_fast_period * (1 + volatility)).astype(int)
+        slow = (self.base_slow_period * (1 + volatility)).astype(int)
 
-    def calculate_ema(self, closes, period):
-        ema = [closes[0]]
-        k = 2 / (period + 1)
-        for price in closes[1:]:
-            ema.append(price * k + ema[-1] * (1 - k))
-        return ema
+        def crossover(close, periods):
+            fast_period, slow_period = divmod(periods, 1000)
+            if close.shape[1] < max(slow_period, 2):
+                return np.zeros(len(close), dtype=np.int8)
+            line, signal, _ = indicators.macd(close, fast_period, slow_period, self.signal_period)
+            up = (line[:, -1] > signal[:, -1]) & (line[:, -2] <= signal[:, -2])
+            down = (line[:, -1] < signal[:, -1]) & (line[:, -2] >= signal[:, -2])
+            return np.select([up, down], [1, -1], 0).astype(np.int8)
+
+        # Периоды адаптируются к волатильности, поэтому символы считаются группами с общей парой периодов
+        return indicators.by_period(crossover, fast * 1000 + slow, close)
 
     async def generate_signal(self, symbol, klines, timeframe, limit, exchange_name):
         """Generate a signal using MACD."""
         try:
-            await self.adapt_parameters(symbol, timeframe, limit, exchange_name)
-            closes = [kline[4] for kline in klines][-self.slow_period*2:]
-            if len(closes) < self.slow_period:
+            params = await self.adapt_parameters(symbol, timeframe, limit, exchange_name)
+            klines = KlineFrame.ensure(klines)
+            features = self.feature_cache.features(exchange_name, symbol, timeframe, klines)
+            closes = klines.close
+            if len(closes) < params['slow_period']:
                 logger.warning(f"Not enough data for {symbol}")
                 return None
 
-            fast_ema = self.calculate_ema(closes, self.fast_period)
-            slow_ema = self.calculate_ema(closes, self.slow_period)
-            macd = [f - s for f, s in zip(fast_ema, slow_ema)]
-            signal_line = self.calculate_ema(macd, self.signal_period)
-
-            if len(macd) < 2 or len(signal_line) < 2:
+            indicator = features.indicator('macd', params['fast_period'], params['slow_period'], self.signal_period)
+            if indicator.previous is None:
                 return None
+            (macd, signal_line, _), (previous_macd, previous_signal, _) = indicator.value, indicator.previous
 
-            if macd[-1] > signal_line[-1] and macd[-2] <= signal_line[-2]:
+            if macd > signal_line and previous_macd <= previous_signal:
                 signal = "buy"
-            elif macd[-1] < signal_line[-1] and macd[-2] >= signal_line[-2]:
+            elif macd < signal_line and previous_macd >= previous_signal:
                 signal = "sell"
             else:
                 signal = "hold"
 
             logger.info(f"Generated MACD signal for {symbol}: {signal}")
-            return {"symbol": symbol, "strategy": "macd", "signal": signal, "entry_price": closes[-1], "trade_size": 100, "timeframe": timeframe, "limit": limit, "exchange_name": exchange_name}
+            return {"symbol": symbol, "strategy": "macd", "signal": signal, "entry_price": float(closes[-1]), "trade_size": 100, "timeframe": timeframe, "limit": limit, "exchange_name": exchange_name}
         except Exception as e:
             logger.error(f"Failed to generate MACD signal for {symbol}: {str(e)}")
             return None
@@ -1,51 +1,73 @@
 import numpy as np
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
+from strategies.feature_cache import FeatureCache
+from strategies.parameter_store import ParameterStore
 
 logger = setup_logging('mean_reversion_strategy')
 
 class MeanReversionStrategy:
+    name = "mean_reversion"
+
     def __init__(self, market_state, market_data, volatility_analyzer):
         self.market_state = market_state
         self.market_data = market_data
         self.volatility_analyzer = volatility_analyzer
+        self.feature_cache = FeatureCache()
+        self.parameter_store = ParameterStore()
         self.lookback_period = 20
-        self.z_score_threshold = 2
+        self.base_z_score_threshold = 2
+        self.defaults = {'z_score_threshold': self.base_z_score_threshold}
 
     async def adapt_parameters(self, symbol, timeframe, limit, exchange_name):
         """Adapt z-score threshold based on volatility."""
+        params = self.parameter_store.get(self.name, exchange_name, symbol, timeframe, self.defaults)
         try:
             klines = await self.market_data.get_klines(symbol, timeframe, limit, exchange_name)
             if not klines:
                 logger.warning(f"No klines for {symbol}, using default z-score threshold")
-                return
-            volatility_factor = self.volatility_analyzer.analyze(klines)
-            self.z_score_threshold = 2 + volatility_factor
-            logger.info(f"Adapted z-score threshold for {symbol}: {self.z_score_threshold}")
+                return params
+            volatility_factor = self.feature_cache.features(exchange_name, symbol, timeframe, klines).volatility(self.volatility_analyzer)
+            params = self.parameter_store.set(self.name, exchange_name, symbol, timeframe, {'z_score_threshold': self.base_z_score_threshold + volatility_factor})
+            logger.info(f"Adapted z-score threshold for {symbol}: {params['z_score_threshold']}")
         except Exception as e:
             logger.error(f"Failed to adapt parameters for {symbol}: {str(e)}")
+        return params
+
+    def signals_batch(self, close, high, low, volume, volatility):
+        """Vectorized generate_signal over (symbols x time) matrices: 1 buy, -1 sell, 0 hold per symbol."""
+        if close.shape[1] < self.lookback_period:
+            return np.zeros(len(close), dtype=np.int8)
+        window = close[:, -self.lookback_period:]
+        std = window.std(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z_score = np.where(std != 0, (close[:, -1] - window.mean(axis=1)) / std, 0.0)
+        threshold = self.base_z_score_threshold + volatility
+        return np.select([z_score > threshold, z_score < -threshold], [-1, 1], 0).astype(np.int8)
 
     async def generate_signal(self, symbol, klines, timeframe, limit, exchange_name):
         """Generate a mean reversion signal."""
         try:
-            await self.adapt_parameters(symbol, timeframe, limit, exchange_name)
-            closes = [kline[4] for kline in klines][-self.lookback_period:]
+            params = await self.adapt_parameters(symbol, timeframe, limit, exchange_name)
+            klines = KlineFrame.ensure(klines)
+            features = self.feature_cache.features(exchange_name, symbol, timeframe, klines)
+            closes = klines.close[-self.lookback_period:]
             if len(closes) < self.lookback_period:
                 logger.warning(f"Not enough data for {symbol}")
                 return None
 
-            mean = np.mean(closes)
-            std = np.std(closes)
+            mean, std = features.indicator('rolling_stats', self.lookback_period).value
             z_score = (closes[-1] - mean) / std if std != 0 else 0
 
-            if z_score > self.z_score_threshold:
+            if z_score > params['z_score_threshold']:
                 signal = "sell"
-            elif z_score < -self.z_score_threshold:
+            elif z_score < -params['z_score_threshold']:
                 signal = "buy"
             else:
                 signal = "hold"
 
             logger.info(f"Generated mean reversion signal for {symbol}: {signal}, z_score={z_score}")
-            return {"symbol": symbol, "strategy": "mean_reversion", "signal": signal, "entry_price": closes[-1], "trade_size": 100, "timeframe": timeframe, "limit": limit, "exchange_name": exchange_name}
+            return {"symbol": symbol, "strategy": "mean_reversion", "signal": signal, "entry_price": float(closes[-1]), "trade_size": 100, "timeframe": timeframe, "limit": limit, "exchange_name": exchange_name}
         except Exception as e:
             logger.error(f"Failed to generate mean reversion signal for {symbol}: {str(e)}")
             return None
@@ -1,8 +1,11 @@
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
 
 logger = setup_logging('ml_strategy')
 
 class MLStrategy:
+    name = "ml"
+
     def __init__(self, market_state, market_data, volatility_analyzer, model):
         self.market_state = market_state
         self.market_data = market_data
@@ -19,7 +22,7 @@ class MLStrategy:
 
             signal = "buy" if prediction > 0 else "sell" if prediction < 0 else "hold"
             logger.info(f"ML signal for {symbol}: {signal}, prediction={prediction}")
-            return {"symbol": symbol, "strategy": "ml", "signal": signal, "entry_price": klines[-1][4], "trade_size": 100, "timeframe": timeframe, "limit": limit, "exchange_name": exchange_name}
+            return {"symbol": symbol, "strategy": "ml", "signal": signal, "entry_price": float(KlineFrame.ensure(klines).close[-1]), "trade_size": 100, "timeframe": timeframe, "limit": limit, "exchange_name": exchange_name}
         except Exception as e:
             logger.error(f"Failed to generate ML signal for {symbol}: {str(e)}")
             return None
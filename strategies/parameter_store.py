@@ -0,0 +1,55 @@
+import time
+from utils.logging_setup import setup_logging
+
+logger = setup_logging('parameter_store')
+
+class ParameterStore:
+    """Adapted strategy parameters keyed by (exchange, symbol, timeframe) and strategy name.
+
+    Strategies keep only their base configuration; whatever adapt_parameters
+    derives for a symbol lives here, so concurrent evaluations of different
+    symbols never see each other's thresholds. Stored parameters are plain
+    dicts that are replaced, never mutated, so readers need no locking and a
+    snapshot can be shipped to worker processes.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ParameterStore, cls).__new__(cls)
+            cls._instance.series = {}  # (exchange, symbol, timeframe) -> {strategy: params}
+            cls._instance.last_used = {}  # (exchange, symbol, timeframe) -> time.time()
+        return cls._instance
+
+    def series_key(self, exchange_name, symbol, timeframe):
+        return (exchange_name, symbol.split(':')[0], timeframe)
+
+    def get(self, strategy_name, exchange_name, symbol, timeframe, defaults):
+        """Last adapted parameters of the strategy for the series, or ``defaults`` before the first adaptation."""
+        key = self.series_key(exchange_name, symbol, timeframe)
+        self.last_used[key] = time.time()
+        return self.series.get(key, {}).get(strategy_name, defaults)
+
+    def set(self, strategy_name, exchange_name, symbol, timeframe, params):
+        key = self.series_key(exchange_name, symbol, timeframe)
+        self.last_used[key] = time.time()
+        self.series.setdefault(key, {})[strategy_name] = dict(params)
+        return self.series[key][strategy_name]
+
+    def snapshot(self):
+        return {key: dict(strategies) for key, strategies in self.series.items()}
+
+    def restore(self, snapshot):
+        for key, strategies in snapshot.items():
+            for strategy_name, params in strategies.items():
+                self.set(strategy_name, *key, params)
+
+    def prune(self, max_idle=3600):
+        """Drop series not used for ``max_idle`` seconds; returns how many."""
+        cutoff = time.time() - max_idle
+        idle = [key for key, used in self.last_used.items() if used < cutoff]
+        for key in idle:
+            self.series.pop(key, None)
+            self.last_used.pop(key, None)
+        return len(idle)
@@ -0,0 +1,74 @@
+import os
+import importlib
+from dotenv import load_dotenv
+from utils.logging_setup import setup_logging
+
+logger = setup_logging('strategy_registry')
+
+# Адаптивные периоды растут как base * (1 + волатильность); стратегии ограничивают волатильность этим значением,
+# поэтому lookback ниже покрывает любой период, который они могут запросить
+MAX_VOLATILITY_FACTOR = 2
+
+class StrategySpec:
+    """A registered strategy: where its class lives and what data it needs, known without importing it.
+
+    ``lookback`` is the number of candles generate_signal needs, including
+    the room adaptive periods grow into and indicator warm-up; ``timeframe``
+    None means the bot's timeframe. ``features`` lists what the strategy
+    reads from the FeatureCache or other shared state.
+    """
+
+    def __init__(self, name, module, class_name, lookback, timeframe=None, features=(), needs_model=False):
+        self.name = name
+        self.module = module
+        self.class_name = class_name
+        self.lookback = lookback
+        self.timeframe = timeframe
+        self.features = tuple(features)
+        self.needs_model = needs_model
+
+    def load(self):
+        return getattr(importlib.import_module(self.module), self.class_name)
+
+    def build(self, market_state, market_data, volatility_analyzer, online_learning=None):
+        strategy_class = self.load()
+        if self.needs_model:
+            return strategy_class(market_state, market_data, volatility_analyzer, online_learning)
+        return strategy_class(market_state, market_data, volatility_analyzer)
+
+STRATEGIES = {spec.name: spec for spec in [
+    StrategySpec("bollinger", "strategies.bollinger_strategy", "BollingerStrategy", 20, features=('volatility', 'rolling_stats')),
+    # ADX появляется после двух периодов, остальное — прогрев сглаживания Уайлдера
+    StrategySpec("rsi", "strategies.rsi_strategy", "RSIStrategy", 100, features=('volatility', 'rsi', 'adx')),
+    # Наибольший slow_period и ещё столько же на прогрев EMA
+    StrategySpec("macd", "strategies.macd_strategy", "MACDStrategy", 2 * 26 * (1 + MAX_VOLATILITY_FACTOR), features=('volatility', 'macd')),
+    # Модели обучаются на скользящих окнах по 20 свечей
+    StrategySpec("ml", "strategies.ml_strategy", "MLStrategy", 200, features=('prediction',), needs_model=True),
+    StrategySpec("arbitrage", "strategies.arbitrage_strategy", "ArbitrageStrategy", 2, features=('volatility', 'order_book', 'price_board')),
+    StrategySpec("mean_reversion", "strategies.mean_reversion_strategy", "MeanReversionStrategy", 20, features=('volatility', 'rolling_stats')),
+    StrategySpec("grid", "strategies.grid_strategy", "GridStrategy", 5, features=('volatility',)),
+    StrategySpec("breakout", "strategies.breakout_strategy", "BreakoutStrategy", 20, features=('volatility', 'rolling_max', 'rolling_min')),
+    StrategySpec("scalping", "strategies.scalping_strategy", "ScalpingStrategy", 2, features=('volatility',)),
+    # Наибольший lookback_period
+    StrategySpec("trend", "strategies.trend_strategy", "TrendStrategy", 50 * (1 + MAX_VOLATILITY_FACTOR), features=('volatility', 'rolling_stats')),
+    StrategySpec("volatility", "strategies.volatility_strategy", "VolatilityStrategy", 30, features=('volatility',)),
+    StrategySpec("signal_generator", "strategies.signal_generator", "SignalGenerator", 30, features=('volatility',)),
+]}
+
+def enabled_strategies(names=None):
+    """Specs of the enabled strategies: ``names``, else the comma-separated ENABLED_STRATEGIES setting, else all."""
+    if names is None:
+        load_dotenv()
+        setting = os.getenv('ENABLED_STRATEGIES')
+        names = [name.strip() for name in setting.split(',') if name.strip()] if setting else list(STRATEGIES)
+    specs = []
+    for name in names:
+        if name not in STRATEGIES:
+            logger.error(f"Unknown strategy {name} in config, skipping")
+            continue
+        specs.append(STRATEGIES[name])
+    return specs
+
+def lookback(specs, timeframe):
+    """Candles to fetch once per symbol on ``timeframe`` so that every spec on it has enough history."""
+    return max((spec.lookback for spec in specs if spec.timeframe in (None, timeframe)), default=0)
@@ -1,46 +1,68 @@
+import numpy as np
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
+from strategies.feature_cache import FeatureCache
+from strategies.parameter_store import ParameterStore
 
 logger = setup_logging('scalping_strategy')
 
 class ScalpingStrategy:
+    name = "scalping"
+
     def __init__(self, market_state, market_data, volatility_analyzer):
         self.market_state = market_state
         self.market_data = market_data
         self.volatility_analyzer = volatility_analyzer
-        self.scalp_range = 0.005
+        self.feature_cache = FeatureCache()
+        self.parameter_store = ParameterStore()
+        self.base_scalp_range = 0.005
+        self.defaults = {'scalp_range': self.base_scalp_range}
 
     async def adapt_parameters(self, symbol, timeframe, limit, exchange_name):
         """Adapt scalp range based on volatility."""
+        params = self.parameter_store.get(self.name, exchange_name, symbol, timeframe, self.defaults)
         try:
             klines = await self.market_data.get_klines(symbol, timeframe, limit, exchange_name)
             if not klines:
                 logger.warning(f"No klines for {symbol}, using default scalp range")
-                return
-            volatility_factor = self.volatility_analyzer.analyze(klines)
-            self.scalp_range = 0.005 * (1 + volatility_factor)
-            logger.info(f"Adapted scalp range for {symbol}: {self.scalp_range}")
+                return params
+            volatility_factor = self.feature_cache.features(exchange_name, symbol, timeframe, klines).volatility(self.volatility_analyzer)
+            params = self.parameter_store.set(self.name, exchange_name, symbol, timeframe, {'scalp_range': self.base_scalp_range * (1 + volatility_factor)})
+            logger.info(f"Adapted scalp range for {symbol}: {params['scalp_range']}")
         except Exception as e:
             logger.error(f"Failed to adapt parameters for {symbol}: {str(e)}")
+        return params
+
+    def signals_batch(self, close, high, low, volume, volatility):
+        """Vectorized generate_signal over (symbols x time) matrices: 1 buy, -1 sell, 0 hold per symbol."""
+        if close.shape[1] < 2:
+            return np.zeros(len(close), dtype=np.int8)
+        previous = close[:, -2]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            price_change = np.where(previous != 0, close[:, -1] / previous - 1, 0.0)
+        scalp_range = self.base_scalp_range * (1 + volatility)
+        return np.select([price_change > scalp_range, price_change < -scalp_range], [-1, 1], 0).astype(np.int8)
 
     async def generate_signal(self, symbol, klines, timeframe, limit, exchange_name):
         """Generate a scalping signal (simplified)."""
         try:
-            await self.adapt_parameters(symbol, timeframe, limit, exchange_name)
-            closes = [kline[4] for kline in klines][-2:]
+            params = await self.adapt_parameters(symbol, timeframe, limit, exchange_name)
+            klines = KlineFrame.ensure(klines)
+            closes = klines.close[-2:]
             if len(closes) < 2:
                 logger.warning(f"Not enough data for {symbol}")
                 return None
 
             price_change = (closes[-1] - closes[-2]) / closes[-2] if closes[-2] != 0 else 0
-            if price_change > self.scalp_range:
+            if price_change > params['scalp_range']:
                 signal = "sell"
-            elif price_change < -self.scalp_range:
+            elif price_change < -params['scalp_range']:
                 signal = "buy"
             else:
                 signal = "hold"
 
             logger.info(f"Generated scalping signal for {symbol}: {signal}")
-            return {"symbol": symbol, "strategy": "scalping", "signal": signal, "entry_price": closes[-1], "trade_size": 100, "timeframe": timeframe, "limit": limit, "exchange_name": exchange_name}
+            return {"symbol": symbol, "strategy": "scalping", "signal": signal, "entry_price": float(closes[-1]), "trade_size": 100, "timeframe": timeframe, "limit": limit, "exchange_name": exchange_name}
         except Exception as e:
             logger.error(f"Failed to generate scalping signal for {symbol}: {str(e)}")
             return None
@@ -1,18 +1,24 @@
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
+from strategies.feature_cache import FeatureCache
 
 logger = setup_logging('signal_generator')
 
 class SignalGenerator:
+    name = "signal_generator"
+
     def __init__(self, market_state, market_data, volatility_analyzer):
         self.market_state = market_state
         self.market_data = market_data
         self.volatility_analyzer = volatility_analyzer
+        self.feature_cache = FeatureCache()
 
     async def generate(self, symbol, klines, timeframe, limit, exchange_name):
         """Generate a signal based on volatility and price movement."""
         try:
-            volatility = self.volatility_analyzer.analyze(klines)
-            closes = [kline[4] for kline in klines][-2:]
+            klines = KlineFrame.ensure(klines)
+            volatility = self.feature_cache.features(exchange_name, symbol, timeframe, klines).volatility(self.volatility_analyzer)
+            closes = klines.close[-2:]
             if len(closes) < 2:
                 logger.warning(f"Not enough data for {symbol}")
                 return None
@@ -26,7 +32,11 @@ class SignalGenerator:
                 signal = "hold"
 
             logger.info(f"Generated signal for {symbol}: {signal}, volatility={volatility}, price_change={price_change}")
-            return {"symbol": symbol, "strategy": "signal_generator", "signal": signal, "entry_price": closes[-1], "trade_size": 100, "timeframe": timeframe, "limit": limit, "exchange_name": exchange_name}
+            return {"symbol": symbol, "strategy": "signal_generator", "signal": signal, "entry_price": float(closes[-1]), "trade_size": 100, "timeframe": timeframe, "limit": limit, "exchange_name": exchange_name}
         except Exception as e:
             logger.error(f"Failed to generate signal for {symbol}: {str(e)}")
             return None
+
+    async def generate_signal(self, symbol, klines, timeframe, limit, exchange_name):
+        """Strategy interface used by StrategyManager."""
+        return await self.generate(symbol, klines, timeframe, limit, exchange_name)
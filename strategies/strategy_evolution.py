@@ -1,5 +1,6 @@
-import numpy as np
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
+from strategies import indicators
 import random
 
 logger = setup_logging('strategy_evolution')
@@ -68,7 +69,8 @@ class StrategyEvolution:
     def evaluate_strategy(self, strategy, klines):
         """Оцениваем производительность стратегии на основе симуляции."""
         try:
-            closes = [kline[4] for kline in klines][-100:]
+            klines = KlineFrame.ensure(klines)
+            closes = klines.close[-100:]
             if len(closes) < 40:
                 return 0.0
 
@@ -76,31 +78,24 @@ class StrategyEvolution:
             position = 0  # 0 - нет позиции, 1 - лонг, -1 - шорт
             entry_price = 0.0
 
-            # Рассчитываем сигналы для каждого индикатора
+            highs = klines.high[-100:]
+            lows = klines.low[-100:]
+
+            # Рассчитываем сигналы для каждого индикатора; периоды после мутаций ограничиваем длиной истории
+            def window(period):
+                return max(2, min(int(period), len(closes)))
+
             signals = {}
             for indicator, params in strategy['indicators'].items():
                 signal_score = 0.0
                 if indicator == 'rsi':
-                    period = params['period']
+                    period = window(params['period'])
                     overbought = params['overbought']
                     oversold = params['oversold']
                     adx_threshold = params['adx_threshold']
 
-                    deltas = np.diff(closes)
-                    gains = np.where(deltas > 0, deltas, 0)
-                    losses = np.where(deltas < 0, -deltas, 0)
-                    avg_gain = np.mean(gains[:period]) if len(gains) >= period else 0
-                    avg_loss = np.mean(losses[:period]) if len(losses) >= period else 0
-                    for i in range(period, len(deltas)):
-                        avg_gain = (avg_gain * (period - 1) + gains[i]) / period
-                        avg_loss = (avg_loss * (period - 1) + losses[i]) / period
-                    rs = avg_gain / avg_loss if avg_loss != 0 else 0
-                    rsi = 100 - (100 / (1 + rs))
-
-                    highs = [kline[2] for kline in klines][-period:]
-                    lows = [kline[3] for kline in klines][-period:]
-                    tr = [max(highs[i] - lows[i], abs(highs[i] - closes[i-1]), abs(lows[i] - closes[i-1])) for i in range(1, len(highs))]
-                    adx = np.mean(tr) if tr else 0
+                    rsi = indicators.rsi(closes, period)[-1]
+                    adx = indicators.adx(highs, lows, closes, period)[-1]
 
                     if rsi > overbought and adx > adx_threshold:
                         signal_score = -1.0  # Продать
@@ -108,47 +103,24 @@ class StrategyEvolution:
                         signal_score = 1.0  # Купить
 
                 elif indicator == 'macd':
-                    fast_period = params['fast_period']
-                    slow_period = params['slow_period']
-                    signal_period = params['signal_period']
-
-                    def ema(data, period):
-                        weights = np.exp(np.linspace(-1., 0., period))
-                        weights /= weights.sum()
-                        return np.convolve(data, weights, mode='valid')[0]
+                    macd_line, signal_line, _ = indicators.macd(closes, window(params['fast_period']), window(params['slow_period']), window(params['signal_period']))
 
-                    fast_ema = ema(np.array(closes[-fast_period:]), fast_period)
-                    slow_ema = ema(np.array(closes[-slow_period:]), slow_period)
-                    macd_line = fast_ema - slow_ema
-                    signal_line = ema(np.array([fast_ema - slow_ema] * signal_period), signal_period)
-
-                    if macd_line > signal_line:
+                    if macd_line[-1] > signal_line[-1]:
                         signal_score = 1.0  # Купить
-                    elif macd_line < signal_line:
+                    elif macd_line[-1] < signal_line[-1]:
                         signal_score = -1.0  # Продать
 
                 elif indicator == 'bollinger':
-                    period = params['period']
-                    std_dev = params['std_dev']
-
-                    lookback_data = closes[-period:]
-                    sma = np.mean(lookback_data)
-                    std = np.std(lookback_data)
-                    upper_band = sma + std_dev * std
-                    lower_band = sma - std_dev * std
+                    _, upper_band, lower_band = indicators.bollinger(closes, window(params['period']), params['std_dev'])
 
-                    if closes[-1] > upper_band:
+                    if closes[-1] > upper_band[-1]:
                         signal_score = -1.0  # Продать
-                    elif closes[-1] < lower_band:
+                    elif closes[-1] < lower_band[-1]:
                         signal_score = 1.0  # Купить
 
                 elif indicator == 'mean_reversion':
-                    lookback_period = params['lookback_period']
                     z_score_threshold = params['z_score_threshold']
-                    lookback_data = closes[-lookback_period:]
-                    mean = np.mean(lookback_data)
-                    std = np.std(lookback_data)
-                    z_score = (closes[-1] - mean) / std if std != 0 else 0
+                    z_score = indicators.zscore(closes, window(params['lookback_period']))[-1]
 
                     if z_score > z_score_threshold:
                         signal_score = -1.0  # Продать
@@ -156,9 +128,8 @@ class StrategyEvolution:
                         signal_score = 1.0  # Купить
 
                 else:  # trend
-                    lookback_period = params['lookback_period']
-                    short_ma = np.mean(closes[-10:])
-                    long_ma = np.mean(closes[-lookback_period:])
+                    short_ma = indicators.sma(closes, 10)[-1]
+                    long_ma = indicators.sma(closes, window(params['lookback_period']))[-1]
                     if short_ma > long_ma:
                         signal_score = 1.0  # Купить
                     elif short_ma < long_ma:
@@ -1,50 +1,148 @@
+import asyncio
+import numpy as np
 from utils.logging_setup import setup_logging
-from .bollinger_strategy import BollingerStrategy
-from .rsi_strategy import RSIStrategy
-from .macd_strategy import MACDStrategy
-from .ml_strategy import MLStrategy
-from .arbitrage_strategy import ArbitrageStrategy
-from .mean_reversion_strategy import MeanReversionStrategy
-from .grid_strategy import GridStrategy
-from .breakout_strategy import BreakoutStrategy
-from .scalping_strategy import ScalpingStrategy
-from .trend_strategy import TrendStrategy
-from .volatility_strategy import VolatilityStrategy
-from .signal_generator import SignalGenerator
+from data_sources.candle_resampler import timeframe_ms
+from .feature_cache import FeatureCache
+from .parameter_store import ParameterStore
+from . import registry
 
 logger = setup_logging('strategy_manager')
 
 class StrategyManager:
-    def __init__(self, market_state, market_data, volatility_analyzer, online_learning):
+    def __init__(self, market_state, market_data, volatility_analyzer, online_learning, signal_deadline=5.0, enabled=None):
         self.market_state = market_state
         self.market_data = market_data
         self.volatility_analyzer = volatility_analyzer
         self.online_learning = online_learning
-        self.strategies = [
-            BollingerStrategy(market_state, market_data, volatility_analyzer),
-            RSIStrategy(market_state, market_data, volatility_analyzer),
-            MACDStrategy(market_state, market_data, volatility_analyzer),
-            MLStrategy(market_state, market_data, volatility_analyzer, self.online_learning),
-            ArbitrageStrategy(market_state, market_data, volatility_analyzer),
-            MeanReversionStrategy(market_state, market_data, volatility_analyzer),
-            GridStrategy(market_state, market_data, volatility_analyzer),
-            BreakoutStrategy(market_state, market_data, volatility_analyzer),
-            ScalpingStrategy(market_state, market_data, volatility_analyzer),
-            TrendStrategy(market_state, market_data, volatility_analyzer),
-            VolatilityStrategy(market_state, market_data, volatility_analyzer),
-            SignalGenerator(market_state, market_data, volatility_analyzer)
-        ]
-
-    async def generate_signals(self, symbol, klines, prediction):
-        """Generate signals from all strategies asynchronously."""
+        self.feature_cache = FeatureCache()  # Общий для всех стратегий: признаки свечи считаются один раз
+        self.signal_deadline = signal_deadline  # Секунды на все стратегии одного символа
+        self.stats = {'runs': 0, 'timeouts': 0, 'errors': 0}
+        # Импортируются только стратегии, включённые в конфиге (ENABLED_STRATEGIES)
+        self.strategies = []
+        self.specs = []
+        for spec in registry.enabled_strategies(enabled):
+            try:
+                self.strategies.append(spec.build(market_state, market_data, volatility_analyzer, self.online_learning))
+                self.specs.append(spec)
+            except Exception as e:
+                logger.error(f"Failed to load strategy {spec.name}: {str(e)}")
+        logger.info(f"Loaded strategies: {[spec.name for spec in self.specs]}")
+
+    def attach_streams(self, websocket_manager, order_books):
+        """Feed streamed candles to the shared indicators and let strategies that follow live quotes or books subscribe."""
+        self.feature_cache.indicator_store.attach(websocket_manager)
+        for strategy in self.strategies:
+            if hasattr(strategy, 'attach_streams'):
+                try:
+                    strategy.attach_streams(websocket_manager, order_books)
+                except Exception as e:
+                    logger.error(f"Failed to attach streams to {strategy.name}: {str(e)}")
+
+    def lookback(self, timeframe):
+        """Largest history the enabled strategies declare for ``timeframe``: fetch this once per symbol."""
+        return registry.lookback(self.specs, timeframe)
+
+    async def run_strategy(self, strategy, spec, symbol, klines, timeframe, limit, exchange_name):
+        if spec.timeframe not in (None, timeframe):
+            # Стратегия работает на своём таймфрейме; запросы одного символа объединяет AsyncMarketData
+            timeframe, limit = spec.timeframe, self.lookback(spec.timeframe)
+            klines = await self.market_data.get_klines(symbol, timeframe, limit, exchange_name)
+            if not klines:
+                return None
+        return await strategy.generate_signal(symbol, klines, timeframe, limit, exchange_name)
+
+    async def generate_signals(self, symbol, klines, prediction, timeframe="1m", limit=200, exchange_name="mexc"):
+        """Run all strategies concurrently; strategies that miss the per-symbol deadline are dropped."""
         try:
+            tasks = {asyncio.create_task(self.run_strategy(strategy, spec, symbol, klines, timeframe, limit, exchange_name)): strategy for strategy, spec in zip(self.strategies, self.specs)}
+            done, pending = await asyncio.wait(tasks, timeout=self.signal_deadline)
+            for task in pending:
+                task.cancel()
+            self.stats['runs'] += len(tasks)
+            if pending:
+                self.stats['timeouts'] += len(pending)
+                logger.warning(f"Dropped {[tasks[task].name for task in pending]} for {symbol}: missed the {self.signal_deadline}s deadline")
+
             signals = []
-            for strategy in self.strategies:
-                signal = await strategy.generate_signal(symbol, klines, "1m", 200, "mexc")
-                if signal:
-                    signals.append(signal)
+            for task in done:
+                if task.exception() is not None:
+                    self.stats['errors'] += 1
+                    logger.error(f"Strategy {tasks[task].name} failed for {symbol}: {str(task.exception())}")
+                elif task.result():
+                    signals.append(task.result())
             logger.info(f"Generated signals for {symbol}: {signals}")
             return signals
         except Exception as e:
             logger.error(f"Failed to generate signals for {symbol}: {str(e)}")
             return []
+
+    def generate_signals_batch(self, close, high, low, volume, timeframe="1m"):
+        """Signals of every vectorized strategy for a whole universe in one pass.
+
+        Takes (symbols x time) matrices aligned on the last candle (see
+        stack_frames) and returns the strategy names with an int8
+        (strategies x symbols) matrix of 1 buy, -1 sell, 0 hold.
+        """
+        volatility = self.volatility_analyzer.analyze_batch(close, timeframe_ms(timeframe))
+        strategies = [strategy for strategy in self.strategies if hasattr(strategy, 'signals_batch')]
+        signals = np.zeros((len(strategies), len(close)), dtype=np.int8)
+        for i, strategy in enumerate(strategies):
+            try:
+                signals[i] = strategy.signals_batch(close, high, low, volume, volatility)
+            except Exception as e:
+                logger.error(f"Failed to generate batch signals for {strategy.name}: {str(e)}")
+        return [strategy.name for strategy in strategies], signals
+
+    def prune(self, max_idle=3600):
+        """Drop per-symbol state not used for ``max_idle`` seconds: delisted symbols and superseded adaptive periods."""
+        indicators = self.feature_cache.indicator_store.prune(max_idle)
+        parameters = ParameterStore().prune(max_idle)
+        if indicators or parameters:
+            logger.info(f"Pruned {indicators} idle streaming indicators and adapted parameters of {parameters} series")
+
+    def get_cache_stats(self):
+        return self.feature_cache.get_stats()
+
+if __name__ == "__main__":
+    # Test run: поштучная генерация сигналов против пакетной на матрице символов
+    import asyncio
+    import time
+    from data_sources.kline_frame import KlineFrame, stack_frames
+    from volatility_analyzer import VolatilityAnalyzer
+
+    rng = np.random.default_rng(0)
+    length = 200
+
+    def make_frames(count):
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, (count, length)), axis=1))
+        ts = np.arange(length, dtype=np.int64) * 60000
+        return {f"SYM{i}/USDT": KlineFrame.from_columns(ts, close[i], close[i] * 1.001, close[i] * 0.999, close[i], np.ones(length)) for i in range(count)}
+
+    class MarketData:
+        def __init__(self, frames):
+            self.frames = frames
+
+        async def get_klines(self, symbol, timeframe, limit, exchange_name):
+            return self.frames[symbol]
+
+    async def per_symbol(manager, frames):
+        strategies = [strategy for strategy in manager.strategies if hasattr(strategy, 'signals_batch')]
+        for symbol, klines in frames.items():
+            for strategy in strategies:
+                await strategy.generate_signal(symbol, klines, "1m", length, "mexc")
+
+    frames = make_frames(200)
+    market_data = MarketData(frames)
+    manager = StrategyManager({}, market_data, VolatilityAnalyzer({}, market_data), None)
+    start = time.perf_counter()
+    asyncio.run(per_symbol(manager, frames))
+    print(f"generate_signal loop: {(time.perf_counter() - start) / len(frames) * 1e6:.0f} us per symbol")
+
+    for count in (100, 1000, 5000):
+        frames = make_frames(count)
+        _, high, low, close, volume = stack_frames(list(frames.values()), length)
+        start = time.perf_counter()
+        names, signals = manager.generate_signals_batch(close, high, low, volume)
+        elapsed = time.perf_counter() - start
+        print(f"generate_signals_batch, {count} symbols: {elapsed * 1000:.1f} ms, {elapsed / count * 1e6:.1f} us per symbol")
+    print(dict(zip(names, (signals != 0).sum(axis=1).tolist())))
@@ -0,0 +1,468 @@
+import copy
+import math
+import time
+from collections import deque
+import numpy as np
+import ccxt.async_support as ccxt
+from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
+
+logger = setup_logging('streaming_indicators')
+
+FIELDS = {'open': 1, 'high': 2, 'low': 3, 'close': 4, 'volume': 5}
+
+class StreamingIndicator:
+    """Indicator updated with one ``[ts, o, h, l, c, v]`` candle at a time.
+
+    Closed candles are folded into the state by ``commit``; the newest candle
+    is only ``peek``-ed, so repeated updates of a still open candle with the
+    same timestamp replace it without any undo work. ``previous`` holds the
+    value as of the last closed candle.
+    """
+
+    field = 'close'
+
+    def __init__(self):
+        self.timestamp = None
+        self.pending = None
+        self.value = None
+        self.previous = None
+
+    @property
+    def params(self):
+        return ()
+
+    def extract(self, row):
+        return float(row[FIELDS[self.field]])
+
+    def update(self, row):
+        ts = int(row[0])
+        if self.timestamp is not None:
+            if ts < self.timestamp:
+                return self.value
+            if ts > self.timestamp:
+                self.commit(self.pending)
+                self.previous = self.value
+        self.timestamp = ts
+        self.pending = self.extract(row)
+        self.value = self.peek(self.pending)
+        return self.value
+
+    def commit(self, x):
+        raise NotImplementedError
+
+    def peek(self, x):
+        raise NotImplementedError
+
+    def reset(self):
+        self.__init__(*self.params)
+
+    def snapshot(self):
+        return copy.deepcopy(self.__dict__)
+
+    def restore(self, snapshot):
+        self.__dict__.update(copy.deepcopy(snapshot))
+
+class Wilder:
+    """Wilder smoothing: the mean of the first ``period`` inputs, then avg += (x - avg) / period."""
+
+    def __init__(self, period):
+        self.period = period
+        self.count = 0
+        self.average = 0.0  # Пока идёт затравка, здесь накапливается сумма
+
+    def peek(self, x):
+        if self.count < self.period - 1:
+            return None
+        if self.count == self.period - 1:
+            return (self.average + x) / self.period
+        return self.average + (x - self.average) / self.period
+
+    def commit(self, x):
+        value = self.peek(x)
+        self.count += 1
+        self.average = self.average + x if value is None else value
+
+class EMA(StreamingIndicator):
+    def __init__(self, period):
+        super().__init__()
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self.ema = None
+
+    @property
+    def params(self):
+        return (self.period,)
+
+    def peek(self, x):
+        return x if self.ema is None else self.ema + self.alpha * (x - self.ema)
+
+    def commit(self, x):
+        self.ema = self.peek(x)
+
+class MACD(StreamingIndicator):
+    """Value is (macd_line, signal_line, histogram)."""
+
+    def __init__(self, fast_period=12, slow_period=26, signal_period=9):
+        super().__init__()
+        self.fast = EMA(fast_period)
+        self.slow = EMA(slow_period)
+        self.signal = EMA(signal_period)
+
+    @property
+    def params(self):
+        return (self.fast.period, self.slow.period, self.signal.period)
+
+    def peek(self, x):
+        line = self.fast.peek(x) - self.slow.peek(x)
+        signal = self.signal.peek(line)
+        return line, signal, line - signal
+
+    def commit(self, x):
+        line = self.fast.peek(x) - self.slow.peek(x)
+        self.fast.commit(x)
+        self.slow.commit(x)
+        self.signal.commit(line)
+
+class RSI(StreamingIndicator):
+    """Wilder RSI; None until ``period`` price changes have been seen."""
+
+    def __init__(self, period=14):
+        super().__init__()
+        self.period = period
+        self.prev_close = None
+        self.gain = Wilder(period)
+        self.loss = Wilder(period)
+
+    @property
+    def params(self):
+        return (self.period,)
+
+    def peek(self, x):
+        if self.prev_close is None:
+            return None
+        delta = x - self.prev_close
+        avg_gain = self.gain.peek(max(delta, 0.0))
+        avg_loss = self.loss.peek(max(-delta, 0.0))
+        if avg_gain is None:
+            return None
+        if avg_loss == 0:
+            return 50.0 if avg_gain == 0 else 100.0
+        return 100 - 100 / (1 + avg_gain / avg_loss)
+
+    def commit(self, x):
+        if self.prev_close is not None:
+            delta = x - self.prev_close
+            self.gain.commit(max(delta, 0.0))
+            self.loss.commit(max(-delta, 0.0))
+        self.prev_close = x
+
+class RollingStats(StreamingIndicator):
+    """Rolling (mean, population std) by Welford's method with a removal step for the evicted value."""
+
+    recompute_every = 10000  # Периодический точный пересчёт гасит накопление ошибки округления
+
+    def __init__(self, period, field='close'):
+        super().__init__()
+        self.period = period
+        self.field = field
+        self.window = deque()  # Закрытые значения, не больше period - 1
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.commits = 0
+
+    @property
+    def params(self):
+        return (self.period, self.field)
+
+    def peek(self, x):
+        n = len(self.window)
+        if n < self.period - 1:
+            return None
+        count = n + 1
+        delta = x - self.mean
+        mean = self.mean + delta / count
+        m2 = self.m2 + delta * (x - mean)
+        return mean, math.sqrt(max(m2, 0.0) / count)
+
+    def commit(self, x):
+        if self.period < 2:
+            return
+        if len(self.window) == self.period - 1:
+            old = self.window.popleft()
+            n = len(self.window) + 1
+            if n == 1:
+                self.mean, self.m2 = 0.0, 0.0
+            else:
+                mean = (n * self.mean - old) / (n - 1)
+                self.m2 -= (old - self.mean) * (old - mean)
+                self.mean = mean
+        self.window.append(x)
+        delta = x - self.mean
+        self.mean += delta / len(self.window)
+        self.m2 += delta * (x - self.mean)
+        self.commits += 1
+        if self.commits % self.recompute_every == 0:
+            values = np.fromiter(self.window, dtype=np.float64)
+            self.mean = float(values.mean())
+            self.m2 = float(((values - self.mean) ** 2).sum())
+
+class RollingMax(StreamingIndicator):
+    """Rolling maximum over ``period`` candles with a monotonic deque of closed candles."""
+
+    def __init__(self, period, field='close'):
+        super().__init__()
+        self.period = period
+        self.field = field
+        self.index = 0
+        self.candidates = deque()  # (index, value), значения монотонно убывают
+
+    @property
+    def params(self):
+        return (self.period, self.field)
+
+    def better(self, a, b):
+        return a >= b
+
+    def peek(self, x):
+        if self.index < self.period - 1:
+            return None
+        if not self.candidates:
+            return x
+        best = self.candidates[0][1]
+        return best if self.better(best, x) else x
+
+    def commit(self, x):
+        self.index += 1
+        if self.period < 2:
+            return
+        while self.candidates and self.better(x, self.candidates[-1][1]):
+            self.candidates.pop()
+        self.candidates.append((self.index, x))
+        while self.candidates[0][0] <= self.index - (self.period - 1):
+            self.candidates.popleft()
+
+class RollingMin(RollingMax):
+    """Rolling minimum over ``period`` candles with a monotonic deque of closed candles."""
+
+    def better(self, a, b):
+        return a <= b
+
+class ATR(StreamingIndicator):
+    """Wilder average true range."""
+
+    def __init__(self, period=14):
+        super().__init__()
+        self.period = period
+        self.prev_close = None
+        self.tr = Wilder(period)
+
+    @property
+    def params(self):
+        return (self.period,)
+
+    def extract(self, row):
+        return float(row[2]), float(row[3]), float(row[4])
+
+    def true_range(self, candle):
+        high, low, _ = candle
+        return max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+
+    def peek(self, candle):
+        return None if self.prev_close is None else self.tr.peek(self.true_range(candle))
+
+    def commit(self, candle):
+        if self.prev_close is not None:
+            self.tr.commit(self.true_range(candle))
+        self.prev_close = candle[2]
+
+class ADX(ATR):
+    """Wilder average directional index."""
+
+    def __init__(self, period=14):
+        super().__init__(period)
+        self.prev_high = None
+        self.prev_low = None
+        self.plus_dm = Wilder(period)
+        self.minus_dm = Wilder(period)
+        self.dx = Wilder(period)
+
+    def directional(self, candle):
+        up = candle[0] - self.prev_high
+        down = self.prev_low - candle[1]
+        return (up if up > down and up > 0 else 0.0), (down if down > up and down > 0 else 0.0)
+
+    def step(self, candle):
+        tr = self.true_range(candle)
+        plus, minus = self.directional(candle)
+        smoothed_tr, smoothed_plus, smoothed_minus = self.tr.peek(tr), self.plus_dm.peek(plus), self.minus_dm.peek(minus)
+        if smoothed_tr is None:
+            return tr, plus, minus, None
+        if smoothed_tr == 0:
+            return tr, plus, minus, 0.0
+        plus_di, minus_di = 100 * smoothed_plus / smoothed_tr, 100 * smoothed_minus / smoothed_tr
+        total = plus_di + minus_di
+        return tr, plus, minus, (0.0 if total == 0 else 100 * abs(plus_di - minus_di) / total)
+
+    def peek(self, candle):
+        if self.prev_close is None:
+            return None
+        dx = self.step(candle)[3]
+        return None if dx is None else self.dx.peek(dx)
+
+    def commit(self, candle):
+        if self.prev_close is not None:
+            tr, plus, minus, dx = self.step(candle)
+            self.tr.commit(tr)
+            self.plus_dm.commit(plus)
+            self.minus_dm.commit(minus)
+            if dx is not None:
+                self.dx.commit(dx)
+        self.prev_high, self.prev_low, self.prev_close = candle
+
+INDICATORS = {
+    'ema': EMA,
+    'macd': MACD,
+    'rsi': RSI,
+    'rolling_stats': RollingStats,
+    'rolling_max': RollingMax,
+    'rolling_min': RollingMin,
+    'atr': ATR,
+    'adx': ADX,
+}
+
+class IndicatorStore:
+    """Streaming indicators keyed by (exchange, symbol, timeframe) and (kind, params).
+
+    ``sync`` feeds an indicator only the candles it has not seen, so a cycle
+    over thousands of symbols costs one or two O(1) updates per indicator. A new
+    indicator, or one that fell behind the frame, is seeded from the frame.
+    Adaptive periods create a new indicator per period, so ``prune`` drops
+    every indicator that has not been requested for a while.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(IndicatorStore, cls).__new__(cls)
+            cls._instance.series = {}  # (exchange, symbol, timeframe) -> {(kind, params): indicator}
+            cls._instance.last_used = {}  # ((exchange, symbol, timeframe), (kind, params)) -> time.time()
+            cls._instance.stats = {'seeded': 0, 'updates': 0}
+        return cls._instance
+
+    def series_key(self, exchange_name, symbol, timeframe):
+        return (exchange_name, symbol.split(':')[0], timeframe)
+
+    def get(self, exchange_name, symbol, timeframe, kind, *params):
+        key = self.series_key(exchange_name, symbol, timeframe)
+        indicators = self.series.setdefault(key, {})
+        self.last_used[(key, (kind, params))] = time.time()
+        indicator = indicators.get((kind, params))
+        if indicator is None:
+            indicator = INDICATORS[kind](*params)
+            indicators[(kind, params)] = indicator
+        return indicator
+
+    def sync(self, indicator, klines):
+        """Feed the candles of ``klines`` the indicator has not seen yet; returns the indicator."""
+        klines = KlineFrame.ensure(klines)
+        if not klines:
+            return indicator
+        if indicator.timestamp is not None and indicator.timestamp < klines.ts[0]:
+            indicator.reset()  # Разрыв между состоянием и новой историей
+        if indicator.timestamp is None:
+            start = 0
+            self.stats['seeded'] += 1
+        else:
+            start = int(np.searchsorted(klines.ts, indicator.timestamp, side='left'))
+        for row in klines[start:]:
+            indicator.update(row)
+        self.stats['updates'] += len(klines) - start
+        return indicator
+
+    def indicator(self, exchange_name, symbol, timeframe, klines, kind, *params):
+        """Return the keyed indicator brought up to date with ``klines``."""
+        return self.sync(self.get(exchange_name, symbol, timeframe, kind, *params), klines)
+
+    def on_kline(self, exchange, symbol, timeframe, row):
+        """WebSocketManager kline handler: update every seeded indicator of the series with one candle.
+
+        An indicator that missed candles (e.g. while the stream reconnected) is
+        reset instead, and the next ``sync`` seeds it again from the frame.
+        """
+        indicators = self.series.get(self.series_key(exchange, symbol, timeframe))
+        if not indicators:
+            return
+        ts = int(row[0])
+        step = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        for indicator in indicators.values():
+            if indicator.timestamp is None:
+                continue
+            if ts > indicator.timestamp + step:
+                indicator.reset()
+            else:
+                indicator.update(row)
+
+    def attach(self, websocket_manager):
+        websocket_manager.kline_handlers.append(self.on_kline)
+
+    def snapshot(self):
+        return {key: {name: indicator.snapshot() for name, indicator in indicators.items()} for key, indicators in self.series.items()}
+
+    def restore(self, snapshot):
+        for key, indicators in snapshot.items():
+            for (kind, params), state in indicators.items():
+                indicator = self.get(*key, kind, *params)
+                indicator.restore(state)
+
+    def prune(self, max_idle=3600):
+        """Drop indicators not requested for ``max_idle`` seconds (e.g. after adaptive periods changed); returns how many."""
+        cutoff = time.time() - max_idle
+        idle = [name for name, used in self.last_used.items() if used < cutoff]
+        for key, indicator_key in idle:
+            del self.last_used[(key, indicator_key)]
+            indicators = self.series.get(key, {})
+            indicators.pop(indicator_key, None)
+            if not indicators:
+                self.series.pop(key, None)
+        return len(idle)
+
+if __name__ == "__main__":
+    # Test run
+    from strategies import indicators
+
+    rng = np.random.default_rng(0)
+    n = 2000
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    high, low = close * (1 + rng.uniform(0, 0.01, n)), close * (1 - rng.uniform(0, 0.01, n))
+    klines = KlineFrame.from_columns(np.arange(n, dtype=np.int64) * 60000, close, high, low, close, np.ones(n))
+
+    store = IndicatorStore()
+    # Каждая свеча приходит дважды: сначала незакрытой, затем окончательной
+    for i in range(n):
+        for kind, params in (('rsi', (14,)), ('macd', (12, 26, 9)), ('rolling_stats', (20,)), ('rolling_max', (20, 'high')), ('atr', (14,)), ('adx', (14,))):
+            indicator = store.get('binance', 'BTC/USDT', '1m', kind, *params)
+            row = klines.row(i)
+            indicator.update([row[0], row[1], row[2] * 0.99, row[3] * 1.01, row[4] * 1.02, row[5]])
+            indicator.update(row)
+
+    def get(kind, *params):
+        return store.get('binance', 'BTC/USDT', '1m', kind, *params).value
+
+    print(f"RSI {get('rsi', 14):.6f} vs {indicators.rsi(close, 14)[-1]:.6f}")
+    print(f"MACD {get('macd', 12, 26, 9)[1]:.6f} vs {indicators.macd(close)[1][-1]:.6f}")
+    print(f"Mean/std {get('rolling_stats', 20)} vs {indicators.sma(close, 20)[-1]}, {indicators.rolling_std(close, 20)[-1]}")
+    print(f"Max {get('rolling_max', 20, 'high'):.6f} vs {indicators.rolling_max(high, 20)[-1]:.6f}")
+    print(f"ATR {get('atr', 14):.6f} vs {indicators.atr(high, low, close)[-1]:.6f}, ADX {get('adx', 14):.6f} vs {indicators.adx(high, low, close)[-1]:.6f}")
+
+    rsi = store.get('binance', 'BTC/USDT', '1m', 'rsi', 14)
+    saved = rsi.snapshot()
+    rsi.update([n * 60000, 0, 0, 0, 1.0, 0])
+    rsi.restore(saved)
+    print(f"Restored RSI: {rsi.value:.6f}")
+
+    start = time.perf_counter()
+    for i in range(100000):
+        rsi.update([(n + i) * 60000, 0, 0, 0, 100.0 + i % 7, 0])
+    print(f"RSI update: {(time.perf_counter() - start) / 100000 * 1e6:.2f} us")
@@ -1,39 +1,67 @@
 import numpy as np
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
+from strategies.feature_cache import FeatureCache
+from strategies.parameter_store import ParameterStore
+from strategies.registry import MAX_VOLATILITY_FACTOR
+from strategies import indicators
 
 logger = setup_logging('trend_strategy')
 
 class TrendStrategy:
+    name = "trend"
+
     def __init__(self, market_state, market_data, volatility_analyzer):
         self.market_state = market_state
         self.market_data = market_data
         self.volatility_analyzer = volatility_analyzer
-        self.lookback_period = 50
+        self.feature_cache = FeatureCache()
+        self.parameter_store = ParameterStore()
+        self.base_lookback_period = 50
+        self.defaults = {'lookback_period': self.base_lookback_period}
 
     async def adapt_parameters(self, symbol, timeframe, limit, exchange_name):
         """Adapt lookback period based on volatility."""
+        params = self.parameter_store.get(self.name, exchange_name, symbol, timeframe, self.defaults)
         try:
             klines = await self.market_data.get_klines(symbol, timeframe, limit, exchange_name)
             if not klines:
                 logger.warning(f"No klines for {symbol}, using default lookback period")
-                return
-            volatility_factor = self.volatility_analyzer.analyze(klines)
-            self.lookback_period = int(50 * (1 + volatility_factor))
-            logger.info(f"Adapted lookback period for {symbol}: {self.lookback_period}")
+                return params
+            # Период не выходит за lookback, объявленный в реестре
+            volatility_factor = min(self.feature_cache.features(exchange_name, symbol, timeframe, klines).volatility(self.volatility_analyzer), MAX_VOLATILITY_FACTOR)
+            params = self.parameter_store.set(self.name, exchange_name, symbol, timeframe, {'lookback_period': int(self.base_lookback_period * (1 + volatility_factor))})
+            logger.info(f"Adapted lookback period for {symbol}: {params['lookback_period']}")
         except Exception as e:
             logger.error(f"Failed to adapt parameters for {symbol}: {str(e)}")
+        return params
+
+    def signals_batch(self, close, high, low, volume, volatility):
+        """Vectorized generate_signal over (symbols x time) matrices: 1 buy, -1 sell, 0 hold per symbol."""
+        lookback = (self.base_lookback_period * (1 + np.minimum(volatility, MAX_VOLATILITY_FACTOR))).astype(int)
+
+        def trend(close, lookback):
+            if close.shape[1] < lookback:
+                return np.zeros(len(close), dtype=np.int8)
+            short_ma = close[:, -10:].mean(axis=1)
+            long_ma = close[:, -lookback:].mean(axis=1)
+            return np.select([short_ma > long_ma, short_ma < long_ma], [1, -1], 0).astype(np.int8)
+
+        return indicators.by_period(trend, lookback, close)
 
     async def generate_signal(self, symbol, klines, timeframe, limit, exchange_name):
         """Generate a trend-following signal."""
         try:
-            await self.adapt_parameters(symbol, timeframe, limit, exchange_name)
-            closes = [kline[4] for kline in klines][-self.lookback_period:]
-            if len(closes) < self.lookback_period:
+            params = await self.adapt_parameters(symbol, timeframe, limit, exchange_name)
+            klines = KlineFrame.ensure(klines)
+            features = self.feature_cache.features(exchange_name, symbol, timeframe, klines)
+            closes = klines.close[-params['lookback_period']:]
+            if len(closes) < params['lookback_period']:
                 logger.warning(f"Not enough data for {symbol}")
                 return None
 
-            short_ma = np.mean(closes[-10:])
-            long_ma = np.mean(closes)
+            short_ma = features.indicator('rolling_stats', 10).value[0]
+            long_ma = features.indicator('rolling_stats', params['lookback_period']).value[0]
             if short_ma > long_ma:
                 signal = "buy"
             elif short_ma < long_ma:
@@ -42,7 +70,7 @@ class TrendStrategy:
                 signal = "hold"
 
             logger.info(f"Generated trend signal for {symbol}: {signal}")
-            return {"symbol": symbol, "strategy": "trend", "signal": signal, "entry_price": closes[-1], "trade_size": 100, "timeframe": timeframe, "limit": limit, "exchange_name": exchange_name}
+            return {"symbol": symbol, "strategy": "trend", "signal": signal, "entry_price": float(closes[-1]), "trade_size": 100, "timeframe": timeframe, "limit": limit, "exchange_name": exchange_name}
         except Exception as e:
             logger.error(f"Failed to generate trend signal for {symbol}: {str(e)}")
             return None
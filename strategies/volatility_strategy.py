@@ -1,38 +1,58 @@
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
+from strategies.feature_cache import FeatureCache
+from strategies.parameter_store import ParameterStore
 
 logger = setup_logging('volatility_strategy')
 
 class VolatilityStrategy:
-    def __init__(self, market_state, market_data, volatility_analyzer):
+    """Follow the move of the last ``window`` candles when they are far more volatile than the whole history, hold otherwise."""
+
+    name = "volatility"
+
+    def __init__(self, market_state, market_data, volatility_analyzer, window=10):
         self.market_state = market_state
         self.market_data = market_data
         self.volatility_analyzer = volatility_analyzer
-        self.volatility_threshold = 0.05
+        self.feature_cache = FeatureCache()
+        self.parameter_store = ParameterStore()
+        self.window = window
+        self.defaults = {'volatility_threshold': 0.05}
 
     async def adapt_parameters(self, symbol, timeframe, limit, exchange_name):
-        """Adapt volatility threshold dynamically."""
+        """Adapt the expansion threshold to the volatility of the whole history."""
+        params = self.parameter_store.get(self.name, exchange_name, symbol, timeframe, self.defaults)
         try:
             klines = await self.market_data.get_klines(symbol, timeframe, limit, exchange_name)
             if not klines:
                 logger.warning(f"No klines for {symbol}, using default volatility threshold")
-                return
-            volatility = self.volatility_analyzer.analyze(klines)
-            self.volatility_threshold = volatility * 1.2
-            logger.info(f"Adapted volatility threshold for {symbol}: {self.volatility_threshold}")
+                return params
+            volatility = self.feature_cache.features(exchange_name, symbol, timeframe, klines).volatility(self.volatility_analyzer)
+            params = self.parameter_store.set(self.name, exchange_name, symbol, timeframe, {'volatility_threshold': volatility * 1.2})
+            logger.info(f"Adapted volatility threshold for {symbol}: {params['volatility_threshold']}")
         except Exception as e:
             logger.error(f"Failed to adapt parameters for {symbol}: {str(e)}")
+        return params
 
     async def generate_signal(self, symbol, klines, timeframe, limit, exchange_name):
         """Generate a volatility-based signal."""
         try:
-            await self.adapt_parameters(symbol, timeframe, limit, exchange_name)
-            volatility = self.volatility_analyzer.analyze(klines)
-            current_price = klines[-1][4]
+            params = await self.adapt_parameters(symbol, timeframe, limit, exchange_name)
+            klines = KlineFrame.ensure(klines)
+            if len(klines) <= self.window:
+                logger.warning(f"Not enough data for {symbol}")
+                return None
+            features = self.feature_cache.features(exchange_name, symbol, timeframe, klines)
+            volatility = features.get(('recent_volatility', self.window), lambda klines: self.volatility_analyzer.analyze(klines.tail(self.window + 1)))
+            current_price = float(klines.close[-1])
+            window_start = float(klines.close[-self.window - 1])
 
-            if volatility > self.volatility_threshold:
+            if volatility <= params['volatility_threshold'] or current_price == window_start:
                 signal = "hold"
-            else:
+            elif current_price > window_start:
                 signal = "buy"
+            else:
+                signal = "sell"
 
             logger.info(f"Generated volatility signal for {symbol}: {signal}, volatility={volatility}")
             return {"symbol": symbol, "strategy": "volatility", "signal": signal, "entry_price": current_price, "trade_size": 100, "timeframe": timeframe, "limit": limit, "exchange_name": exchange_name}
@@ -6,6 +6,7 @@ import asyncio
 import math
 import numpy as np
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
 from volatility_analyzer import VolatilityAnalyzer
 
 logger = setup_logging('symbol_filter')
@@ -19,9 +20,44 @@ class SymbolFilter:
         self.filters = {
             'min_liquidity': self.market_state.get('min_liquidity', 500),
             'max_volatility': self.market_state.get('max_volatility', 1.0),
-            'liquidity_period': self.market_state.get('liquidity_period', 240)
+            'liquidity_period': self.market_state.get('liquidity_period', 240),
+            'min_quote_volume': self.market_state.get('min_quote_volume', 50000),
+            'max_spread': self.market_state.get('max_spread', 0.01)
         }
 
+    async def prefilter_by_tickers(self, symbols: list, exchange_name: str) -> list:
+        """Drop symbols by 24h quote volume and bid/ask spread using one ticker snapshot."""
+        try:
+            tickers = await self.market_data.get_tickers(exchange_name)
+            if not tickers:
+                logger.warning(f"No tickers for {exchange_name}, skipping ticker prefilter")
+                return symbols
+
+            empty = {}
+            rows = [tickers.get(symbol) or empty for symbol in symbols]
+
+            def column(field):
+                # NaN только для отсутствующего поля: настоящий ноль должен отсеиваться
+                return np.fromiter((t.get(field) if t.get(field) is not None else np.nan for t in rows), dtype=np.float64, count=len(rows))
+
+            quote_volume, base_volume, last, bid, ask = (column(field) for field in ('quoteVolume', 'baseVolume', 'last', 'bid', 'ask'))
+
+            # Если биржа не отдаёт quoteVolume, считаем его из baseVolume * last
+            quote_volume = np.where(np.isnan(quote_volume), base_volume * last, quote_volume)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                spread = (ask - bid) / ((ask + bid) / 2)
+
+            # Неизвестный объём или спред (NaN) не повод отбросить символ: его проверит фильтр по свечам.
+            # Нулевой объём известен и отсеивается как любой объём ниже порога
+            keep = ~(quote_volume < self.filters['min_quote_volume']) & ~(spread > self.filters['max_spread'])
+            survivors = [symbol for symbol, ok in zip(symbols, keep) if ok]
+            logger.info(f"Ticker prefilter on {exchange_name}: {len(survivors)} of {len(symbols)} symbols passed "
+                        f"(min_quote_volume={self.filters['min_quote_volume']}, max_spread={self.filters['max_spread']})")
+            return survivors
+        except Exception as e:
+            logger.error(f"Failed to prefilter symbols by tickers on {exchange_name}: {str(e)}")
+            return symbols
+
     async def determine_liquidity_period(self, symbols: list, exchange_name: str, timeframe: str) -> int:
         """Determine the optimal liquidity period based on market volatility."""
         try:
@@ -48,6 +84,15 @@ class SymbolFilter:
             logger.error(f"Failed to determine liquidity period, using default (240): {str(e)}")
             return 240
 
+    def liquidity_and_volatility(self, klines, period: int) -> tuple:
+        """Compute average quote liquidity and high-low price range for one symbol."""
+        klines = KlineFrame.ensure(klines)
+        prices = klines.close
+        liquidity = float(klines.volume.sum() * prices[-1] / period)
+        min_price = prices.min()
+        volatility = float((prices.max() - min_price) / min_price) if min_price != 0 else float('inf')
+        return liquidity, volatility
+
     async def fetch_klines_batch(self, symbols: list, timeframe: str, limit: int, exchange_name: str) -> dict:
         """Fetch klines for a batch of symbols asynchronously."""
         tasks = []
@@ -59,7 +104,7 @@ class SymbolFilter:
         for symbol, klines in zip(symbols, klines_list):
             if isinstance(klines, Exception):
                 logger.warning(f"Error fetching klines for {symbol}: {str(klines)}")
-                result[symbol] = []
+                result[symbol] = None
             else:
                 result[symbol] = klines
         return result
@@ -74,17 +119,12 @@ class SymbolFilter:
             volatilities = []
 
             for symbol in sample_symbols:
-                klines = klines_batch.get(symbol, [])
+                klines = klines_batch.get(symbol)
                 if not klines:
                     continue
 
-                total_volume = sum(kline['volume'] for kline in klines)
-                latest_price = klines[-1]['close']
-                liquidity = total_volume * latest_price / period
+                liquidity, volatility = self.liquidity_and_volatility(klines, period)
                 liquidities.append(liquidity)
-
-                prices = [kline['close'] for kline in klines]
-                volatility = (max(prices) - min(prices)) / min(prices) if min(prices) != 0 else float('inf')
                 volatilities.append(volatility)
 
             # Адаптируем min_liquidity как 25-й процентиль ликвидности
@@ -115,6 +155,12 @@ class SymbolFilter:
             logger.warning(f"Timeframe {timeframe} not supported on {exchange_name}. Using {supported_timeframes[0]} instead.")
             timeframe = supported_timeframes[0]
 
+        # Дешёвый первый этап: один снимок тикеров вместо свечей по каждому символу
+        symbols = await self.prefilter_by_tickers(symbols, exchange_name)
+        if not symbols:
+            logger.info(f"No symbols passed the ticker prefilter on {exchange_name}")
+            return []
+
         self.filters['liquidity_period'] = await self.determine_liquidity_period(symbols, exchange_name, timeframe)
 
         # Адаптируем пороги фильтрации
@@ -129,20 +175,16 @@ class SymbolFilter:
 
             for symbol in batch:
                 try:
-                    klines = klines_batch.get(symbol, [])
+                    klines = klines_batch.get(symbol)
                     if not klines:
                         logger.warning(f"No klines data for {symbol} on {exchange_name} with timeframe {timeframe}, skipping")
                         continue
 
-                    total_volume = sum(kline['volume'] for kline in klines)
-                    latest_price = klines[-1]['close']
-                    liquidity = total_volume * latest_price / self.filters['liquidity_period']
+                    liquidity, volatility = self.liquidity_and_volatility(klines, self.filters['liquidity_period'])
                     if liquidity < self.filters['min_liquidity']:
                         logger.debug(f"Skipping {symbol} due to low liquidity: {liquidity}")
                         continue
 
-                    prices = [kline['close'] for kline in klines]
-                    volatility = (max(prices) - min(prices)) / min(prices) if min(prices) != 0 else float('inf')
                     if volatility > self.filters['max_volatility']:
                         logger.debug(f"Skipping {symbol} due to high volatility: {volatility}")
                         continue
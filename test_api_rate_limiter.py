@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+from utils.api_rate_limiter import ExchangeRateLimiter, TokenBucket
+
+def test_order_book_weight_depends_on_limit():
+    limiter = ExchangeRateLimiter()
+    assert limiter.weight('binance', 'fetch_order_book') == 5
+    assert limiter.weight('binance', 'fetch_order_book', 100) == 5
+    assert limiter.weight('binance', 'fetch_order_book', 500) == 25
+    assert limiter.weight('binance', 'fetch_order_book', 1000) == 50
+    assert limiter.weight('binance', 'fetch_order_book', 5000) == 250
+    assert limiter.weight('mexc', 'fetch_order_book', 1000) == 1
+    assert limiter.weight('unknown', 'fetch_ohlcv', 1000) == 1
+
+def test_bucket_refills_over_time_up_to_capacity():
+    bucket = TokenBucket(10, 10)
+    assert bucket.acquire_blocking(10) == 0
+    assert bucket._try_take(1) > 0
+    # Полсекунды простоя возвращают 5 жетонов, но не больше вместимости
+    bucket.updated -= 0.5
+    assert bucket._try_take(5) == 0
+    bucket.updated -= 60
+    bucket._refill()
+    assert bucket.tokens == 10
+
+def test_bucket_waits_for_missing_tokens():
+    bucket = TokenBucket(10, 100)
+    asyncio.run(bucket.acquire(10))
+    start = time.monotonic()
+    waited = asyncio.run(bucket.acquire(5))
+    assert waited > 0
+    assert time.monotonic() - start >= 0.04
+
+def test_weighted_requests_drain_the_exchange_bucket():
+    limiter = ExchangeRateLimiter()
+    asyncio.run(limiter.acquire('mexc-weights', 'fetch_ohlcv'))
+    bucket = limiter.bucket('mexc-weights')
+    assert bucket.capacity - bucket.tokens < 2
+    limiter.acquire_blocking('unlisted-weights', 'fetch_tickers')
+    assert limiter.stats['unlisted-weights']['weight'] == 1  # Неизвестная биржа: вес по умолчанию
+    before = limiter.stats.get('binance', {}).get('weight', 0)
+    limiter.acquire_blocking('binance', 'fetch_tickers')
+    assert limiter.stats['binance']['weight'] - before == 80
+
+class RateLimitExceeded(Exception):
+    pass
+
+class DDoSProtection(Exception):
+    pass
+
+def test_rate_limit_errors_pause_the_exchange():
+    limiter = ExchangeRateLimiter()
+
+    async def throttled(error):
+        raise error
+
+    for name, error in (('penalty-429', RateLimitExceeded('429')), ('penalty-ddos', DDoSProtection('418'))):
+        try:
+            asyncio.run(limiter.call(name, 'fetch_ticker', throttled, error))
+        except type(error):
+            pass
+        # После ответа 429/418 корзина уходит в долг на ban_backoff секунд
+        assert limiter.stats[name]['bans'] == 1
+        assert limiter.bucket(name)._try_take(1) >= limiter.ban_backoff
+
+    try:
+        asyncio.run(limiter.call('penalty-other', 'fetch_ticker', throttled, ValueError('bad symbol')))
+    except ValueError:
+        pass
+    assert limiter.stats['penalty-other']['bans'] == 0
+
+def test_bucket_is_usable_from_several_event_loops():
+    bucket = TokenBucket(1, 200)
+
+    async def contended():
+        # Ожидающие в очереди привязывают asyncio.Lock к текущему циклу событий
+        await asyncio.gather(*[bucket.acquire(1) for _ in range(3)])
+
+    # Каждый asyncio.run создаёт новый цикл; общая корзина не должна быть привязана к первому из них
+    for _ in range(3):
+        asyncio.run(contended())
+
+    def worker():
+        asyncio.run(contended())
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    assert len(bucket.async_locks) <= 1  # Блокировки завершённых циклов не накапливаются
@@ -0,0 +1,45 @@
+import math
+import time
+from strategies.arbitrage_scanner import ArbitrageScanner
+
+class Metadata:
+    def __init__(self, markets=None):
+        self.markets = markets or {}
+
+    def get_market(self, exchange_name, symbol):
+        return self.markets.get((exchange_name, symbol))
+
+def scanner(**kwargs):
+    return ArbitrageScanner(exchanges=['a', 'b'], symbols=['X/USDT'], fees={'a': 0.001, 'b': 0.001}, metadata=Metadata(kwargs.pop('markets', None)), **kwargs)
+
+def now_ms():
+    return int(time.time() * 1000)
+
+def test_edge_is_net_of_both_taker_fees():
+    arbitrage = scanner(min_edge=0)
+    arbitrage.on_quote('a', 'X/USDT', 99.9, 100.0, now_ms())
+    opportunities = arbitrage.on_quote('b', 'X/USDT', 101.0, 101.1, now_ms())
+    assert [(o['buy_exchange'], o['sell_exchange']) for o in opportunities] == [('a', 'b')]
+    assert math.isclose(opportunities[0]['edge'], 101.0 * 0.999 / (100.0 * 1.001) - 1)
+
+def test_fees_can_eat_the_whole_spread():
+    # Разница 0.15% меньше двух комиссий по 0.1%: возможности нет
+    arbitrage = scanner(min_edge=0)
+    arbitrage.on_quote('a', 'X/USDT', 99.9, 100.0, now_ms())
+    assert arbitrage.on_quote('b', 'X/USDT', 100.15, 100.2, now_ms()) == []
+
+def test_market_taker_fee_overrides_default():
+    arbitrage = scanner(min_edge=0, markets={('b', 'X/USDT'): {'taker': 0.02}})
+    arbitrage.on_quote('a', 'X/USDT', 99.9, 100.0, now_ms())
+    assert arbitrage.on_quote('b', 'X/USDT', 101.0, 101.1, now_ms()) == []
+
+def test_stale_quotes_are_masked():
+    arbitrage = scanner(min_edge=0, max_age=10)
+    arbitrage.on_quote('a', 'X/USDT', 99.9, 100.0, now_ms() - 60000)
+    # Котировка минутной давности не участвует, хотя разница цен велика
+    assert arbitrage.on_quote('b', 'X/USDT', 105.0, 105.1, now_ms()) == []
+    arbitrage.on_quote('a', 'X/USDT', 99.9, 100.0, now_ms())
+    arbitrage.rank()
+    assert arbitrage.best_for('X/USDT', 'a')['sell_exchange'] == 'b'
+    arbitrage.updated_at[0, 0] = now_ms() - 60000
+    assert arbitrage.best_for('X/USDT', 'a') is None
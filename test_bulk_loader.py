@@ -0,0 +1,59 @@
+import asyncio
+import tempfile
+from data_sources.bulk_loader import BulkHistoryLoader
+from data_sources.ohlcv_store import OHLCVStore
+
+MINUTE = 60000
+WINDOW = 1000 * MINUTE  # MAX_CANDLES_PER_REQUEST['binance'] минутных свечей
+
+class PassThroughRateLimiter:
+    async def call(self, exchange_name, method, fn, *args, **kwargs):
+        return await fn(*args, **kwargs)
+
+class FlakyExchange:
+    id = 'binance'
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+
+    async def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        if since in self.failing:
+            raise Exception('exchange unavailable')
+        return [[since + i * MINUTE, 1.0, 2.0, 0.5, 1.5, 10.0] for i in range(limit)]
+
+class FakeMarketData:
+    rate_limiter = PassThroughRateLimiter()
+
+    def __init__(self, exchange):
+        self.exchanges = {'binance': exchange}
+
+    async def initialize_exchange(self, exchange_name):
+        return True
+
+def backfill(store, exchange, start_ms, end_ms):
+    loader = BulkHistoryLoader(market_data=FakeMarketData(exchange), store=store, max_retries=0)
+    asyncio.run(loader.backfill({'binance': ['A/USDT']}, '1m', start_ms, end_ms))
+    return loader
+
+def test_failed_window_leaves_no_interior_hole():
+    store = OHLCVStore(tempfile.mkdtemp())
+    loader = backfill(store, FlakyExchange(failing=[2 * WINDOW]), 0, 5 * WINDOW)
+    # Запись останавливается перед дырой, дальше ничего не пишется
+    assert loader.holes == [('binance', 'A/USDT', '1m', 2 * WINDOW, 3 * WINDOW)]
+    assert loader.stats['binance']['holes'] == 1
+    assert store.info('binance', 'A/USDT', '1m') == {'first_ts': 0, 'last_ts': 2 * WINDOW - MINUTE, 'count': 2000}
+
+    # Повторный запуск догружает дыру и всё после неё
+    loader = backfill(store, FlakyExchange(), 0, 5 * WINDOW)
+    assert loader.holes == []
+    assert store.info('binance', 'A/USDT', '1m') == {'first_ts': 0, 'last_ts': 5 * WINDOW - MINUTE, 'count': 5000}
+
+def test_failed_older_window_keeps_history_contiguous():
+    store = OHLCVStore(tempfile.mkdtemp())
+    backfill(store, FlakyExchange(), 3 * WINDOW, 4 * WINDOW)
+    loader = backfill(store, FlakyExchange(failing=[WINDOW]), 0, 4 * WINDOW)
+    # Окно 0 лежит до дыры и отбрасывается, окно 2 примыкает к сохранённой истории
+    assert [hole[3] for hole in loader.holes] == [WINDOW]
+    assert store.info('binance', 'A/USDT', '1m')['first_ts'] == 2 * WINDOW
+    ts = store.read('binance', 'A/USDT', '1m').ts
+    assert (ts[1:] - ts[:-1] == MINUTE).all()
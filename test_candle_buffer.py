@@ -0,0 +1,25 @@
+from data_sources.candle_buffer import CandleRingBuffer
+
+MINUTE = 60000
+
+def candles(start, stop, close=1.0):
+    return [[i * MINUTE, 1.0, 2.0, 0.5, close, 10.0] for i in range(start, stop)]
+
+def test_merge_overwrites_open_candle_and_appends_newer():
+    buffer = CandleRingBuffer(capacity=10)
+    assert buffer.merge(candles(0, 5)) == 5
+    # Последняя свеча ещё не закрыта: её значения перезаписываются, новые добавляются в конец
+    assert buffer.merge(candles(4, 7, close=3.0)) == 2
+    frame = buffer.frame()
+    assert frame.ts.tolist() == [i * MINUTE for i in range(7)]
+    assert frame.close.tolist() == [1.0] * 4 + [3.0] * 3
+    assert buffer.merge(candles(0, 3)) == 0
+
+def test_buffer_keeps_latest_capacity_candles_across_wraps():
+    buffer = CandleRingBuffer(capacity=20)
+    for start in range(0, 200, 7):
+        buffer.merge(candles(start, start + 7))
+    frame = buffer.frame()
+    assert len(buffer) == 20
+    assert frame.ts.tolist() == [i * MINUTE for i in range(183, 203)]
+    assert buffer.frame(5).ts.tolist() == [i * MINUTE for i in range(198, 203)]
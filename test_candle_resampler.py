@@ -0,0 +1,47 @@
+import numpy as np
+from data_sources.kline_frame import KlineFrame
+from data_sources.candle_resampler import resample, CandleResampler
+
+MINUTE = 60000
+
+def candles(minutes, close=None):
+    ts = np.asarray(minutes, dtype=np.int64) * MINUTE
+    close = np.asarray(close if close is not None else 100.0 + np.arange(len(ts)), dtype=np.float64)
+    return KlineFrame.from_columns(ts, close - 0.5, close + 1, close - 1, close, np.ones(len(ts)))
+
+def test_resample_aggregates_buckets():
+    klines = resample(candles(range(10)), '5m')
+    assert klines.ts.tolist() == [0, 5 * MINUTE]
+    assert klines.open.tolist() == [99.5, 104.5]
+    assert klines.high.tolist() == [105.0, 110.0]
+    assert klines.low.tolist() == [99.0, 104.0]
+    assert klines.close.tolist() == [104.0, 109.0]
+    assert klines.volume.tolist() == [5.0, 5.0]
+
+def test_resample_drops_partial_head():
+    assert resample(candles(range(2, 10)), '5m').ts.tolist() == [5 * MINUTE]
+    assert resample(candles(range(2, 10)), '5m', drop_partial_head=False).ts.tolist() == [0, 5 * MINUTE]
+
+def test_update_builds_bucket_without_first_base_candle():
+    # Регрессия: минуты 5 нет (на неликвидной паре сделок не было), свеча 5m всё равно должна появиться
+    resampler = CandleResampler(targets=('5m',), capacity=16)
+    resampler.seed(candles(range(5)))
+    resampler.update(candles([6], close=[200.0]))
+    frame = resampler.frame('5m')
+    assert frame.ts.tolist() == [0, 5 * MINUTE]
+    assert frame.open[-1] == 199.5
+    assert frame.close[-1] == 200.0
+
+def test_incremental_updates_match_batch():
+    rng = np.random.default_rng(0)
+    n = 600
+    base = candles(range(n), 100 * np.exp(np.cumsum(rng.normal(0, 0.001, n))))
+    resampler = CandleResampler(targets=('5m', '15m', '1h'), capacity=64)
+    resampler.seed(base[:n // 2])
+    for i in range(n // 2, n):
+        resampler.update(base[i:i + 1])
+    for target in ('5m', '15m', '1h'):
+        frame = resampler.frame(target)
+        expected = resample(base, target).tail(len(frame))
+        assert frame.ts.tolist() == expected.ts.tolist()
+        assert np.allclose(frame.values, expected.values)
@@ -0,0 +1,63 @@
+import tempfile
+import numpy as np
+from data_sources import data_utils
+from data_sources.data_utils import encode_klines, decode_klines, encode_order_book, decode_order_book, OHLCV_HEADER
+from data_sources.kline_frame import KlineFrame
+from data_sources.ohlcv_store import OHLCVStore
+
+MINUTE = 60000
+OHLCV = [[i * MINUTE, 1.0 + i, 2.0 + i, 0.5 + i, 1.5 + i, 10.0 * i] for i in range(1, 6)]
+
+def test_klines_round_trip():
+    klines = decode_klines(encode_klines(OHLCV))
+    assert isinstance(klines, KlineFrame)
+    assert klines.to_ohlcv() == OHLCV
+    assert klines.ts.dtype == np.int64
+    assert len(decode_klines(encode_klines([]))) == 0
+
+def test_klines_payload_header_is_checked():
+    payload = encode_klines(OHLCV)
+    for header in (OHLCV_HEADER.pack(b'XXXX', 1, len(OHLCV)), OHLCV_HEADER.pack(b'OHLC', 99, len(OHLCV))):
+        try:
+            decode_klines(header + payload[OHLCV_HEADER.size:])
+        except ValueError:
+            continue
+        assert False, "payload with a foreign magic or version must be rejected"
+
+def test_order_book_keeps_ccxt_shape():
+    order_book = {'bids': [[100.0, 1.0, 3], [99.5, 2.0, 1]], 'asks': [[100.5, 0.5, 2]], 'timestamp': 1700000000000}
+    decoded = decode_order_book(encode_order_book(order_book), 'A/USDT')
+    assert decoded == {'symbol': 'A/USDT', 'bids': [[100.0, 1.0], [99.5, 2.0]], 'asks': [[100.5, 0.5]], 'timestamp': 1700000000000}
+
+class FakeExchange:
+    id = 'fake-batch'
+
+    def __init__(self, failing=()):
+        self.failing = failing
+        self.fetched = []
+
+    def parse_timeframe(self, timeframe):
+        return 60
+
+    def milliseconds(self):
+        return 5 * MINUTE
+
+    def fetch_ohlcv(self, symbol, timeframe, limit=None):
+        self.fetched.append(symbol)
+        if symbol in self.failing:
+            raise Exception('exchange error')
+        return OHLCV[-limit:]
+
+def test_batch_fetches_only_stale_symbols():
+    saved = data_utils.history_store
+    data_utils.history_store = OHLCVStore(root=tempfile.mkdtemp())
+    try:
+        data_utils.history_store.append('fake-batch', 'FRESH/USDT', '1m', OHLCV)
+        exchange = FakeExchange(failing=('BROKEN/USDT',))
+        result = data_utils.load_klines_batch(exchange, ['FRESH/USDT', 'A/USDT', 'B/USDT', 'BROKEN/USDT'], '1m', 5)
+        # Свежая история не запрашивается, ошибка одного символа не роняет остальные
+        assert sorted(exchange.fetched) == ['A/USDT', 'B/USDT', 'BROKEN/USDT']
+        assert sorted(result) == ['A/USDT', 'B/USDT', 'FRESH/USDT']
+        assert result['A/USDT'].to_ohlcv() == OHLCV
+    finally:
+        data_utils.history_store = saved
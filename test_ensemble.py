@@ -0,0 +1,36 @@
+import numpy as np
+from strategies.ensemble import SignalEnsemble
+
+def signal(strategy, value, price=100.0):
+    return {'strategy': strategy, 'signal': value, 'entry_price': price}
+
+def test_weighted_consensus_and_threshold():
+    ensemble = SignalEnsemble(['a', 'b', 'c'], weights={'a': 2.0}, threshold=0.3)
+    scores = np.array([[1.0, 1.0, -1.0], [1.0, -1.0, 0.0], [1.0, 0.0, 0.0]])
+    consensus = ensemble.consensus(scores)
+    assert np.allclose(consensus, [1.0, 0.25, -0.5])
+    actions, sizes = ensemble.actions(consensus)
+    assert actions.tolist() == [1, 0, -1]
+    assert np.allclose(sizes, [100.0, 0.0, 50.0])
+
+def test_missing_strategies_do_not_dilute():
+    ensemble = SignalEnsemble(['a', 'b', 'c'])
+    decisions = ensemble.decisions(['X/USDT'], [[signal('a', 'buy'), signal('b', 'buy')]], '1m', 100, 'test')
+    assert len(decisions) == 1
+    assert decisions[0]['signal'] == 'buy' and decisions[0]['consensus'] == 1.0
+
+def test_learning_favours_the_right_strategy():
+    ensemble = SignalEnsemble(['right', 'wrong'], threshold=0.0)
+    for step in range(20):
+        price = 100.0 + step
+        ensemble.learn(['X/USDT'], [price], 'test')
+        ensemble.decisions(['X/USDT'], [[signal('right', 'buy', price), signal('wrong', 'sell', price)]], '1m', 100, 'test')
+    weights = dict(zip(ensemble.names, ensemble.weights))
+    assert weights['right'] > weights['wrong'] > 0
+    assert np.isclose(ensemble.weights.sum(), len(ensemble.names))
+
+def test_align_reorders_batch_rows():
+    ensemble = SignalEnsemble(['a', 'b', 'c'])
+    aligned, answered = ensemble.align(['c', 'a'], np.array([[1.0, -1.0], [0.0, 1.0]]))
+    assert aligned.tolist() == [[0.0, 1.0], [0.0, 0.0], [1.0, -1.0]]
+    assert answered[:, 0].tolist() == [True, False, True]
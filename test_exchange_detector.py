@@ -0,0 +1,76 @@
+import asyncio
+import os
+import tempfile
+from data_sources import exchange_detector
+from data_sources.exchange_detector import ExchangeDetector
+
+MEXC_KEY = 'mx0' + 'a' * 15
+MEXC_SECRET = '0' * 32
+FAKE_IDS = ('mexc', 'okx', 'binance', 'fakeex')
+
+def fake_exchanges(accepting):
+    """Install fake ccxt clients that record every probe; only ``accepting`` takes the key."""
+    probed = []
+
+    def make(exchange_id):
+        class FakeExchange:
+            has = {'fetchBalance': True}
+
+            def __init__(self, config):
+                self.config = config
+                probed.append((exchange_id, config))
+
+            async def fetch_balance(self):
+                if exchange_id != accepting:
+                    raise Exception('AuthenticationError')
+                return {}
+
+            async def close(self):
+                pass
+        return FakeExchange
+
+    saved = (exchange_detector.ccxt.exchanges, {e: getattr(exchange_detector.ccxt, e, None) for e in FAKE_IDS})
+    exchange_detector.ccxt.exchanges = list(FAKE_IDS)
+    for exchange_id in FAKE_IDS:
+        setattr(exchange_detector.ccxt, exchange_id, make(exchange_id))
+    return probed, saved
+
+def restore(saved):
+    exchanges, classes = saved
+    exchange_detector.ccxt.exchanges = exchanges
+    for exchange_id, cls in classes.items():
+        if cls is None:
+            delattr(exchange_detector.ccxt, exchange_id)
+        else:
+            setattr(exchange_detector.ccxt, exchange_id, cls)
+
+def detector(**kwargs):
+    return ExchangeDetector(cache_path=os.path.join(tempfile.mkdtemp(), 'detector.json'), **kwargs)
+
+def test_key_goes_only_to_exchanges_with_matching_format():
+    probed, saved = fake_exchanges(accepting='mexc')
+    try:
+        exchange = asyncio.run(detector().detect_exchange(MEXC_KEY, MEXC_SECRET))
+        assert exchange is not None
+        assert [exchange_id for exchange_id, _ in probed] == ['mexc']
+    finally:
+        restore(saved)
+
+def test_unknown_key_format_probes_nothing():
+    probed, saved = fake_exchanges(accepting='fakeex')
+    try:
+        # Ключ неизвестного формата не отправляется ни на одну биржу из ccxt
+        assert asyncio.run(detector().detect_exchange('not-a-known-key', 'secret')) is None
+        assert probed == []
+    finally:
+        restore(saved)
+
+def test_allowlisted_exchange_is_probed_with_passphrase():
+    probed, saved = fake_exchanges(accepting='fakeex')
+    try:
+        exchange = asyncio.run(detector(allowed_exchanges=['fakeex']).detect_exchange('not-a-known-key', 'secret', passphrase='phrase'))
+        assert exchange is not None
+        assert [exchange_id for exchange_id, _ in probed] == ['fakeex']
+        assert probed[0][1]['password'] == 'phrase'
+    finally:
+        restore(saved)
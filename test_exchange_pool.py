@@ -0,0 +1,66 @@
+import asyncio
+from exchange_pool import ExchangePool, ExchangeSession
+
+class FakeClient:
+    has = {}
+
+    async def close(self):
+        pass
+
+class FakeHttpSession:
+    async def close(self):
+        pass
+
+def fake_pool():
+    pool = ExchangePool()
+    created = []
+
+    async def create_session(exchange_id, credentials=None):
+        await asyncio.sleep(0.01)
+        created.append((exchange_id, credentials))
+        return ExchangeSession(exchange_id, FakeClient(), FakeHttpSession())
+
+    pool.create_session = create_session
+    return pool, created
+
+async def reset(pool):
+    del pool.create_session
+    if pool.health_task is not None:
+        pool.health_task.cancel()
+        await asyncio.gather(pool.health_task, return_exceptions=True)
+        pool.health_task = None
+    pool.sessions.clear()
+    pool.locks.clear()
+
+async def run_same_credentials_share_one_client():
+    pool, created = fake_pool()
+    try:
+        credentials = {'apiKey': 'key', 'secret': 'secret'}
+        clients = await asyncio.gather(*[pool.get_exchange('fake', credentials) for _ in range(5)])
+        # Пять одновременных запросов открывают одну сессию
+        assert len(created) == 1
+        assert all(client is clients[0] for client in clients)
+        other = await pool.get_exchange('fake', {'apiKey': 'other', 'secret': 'secret'})
+        public = await pool.get_exchange('fake', use_env=False)
+        assert other is not clients[0] and public is not clients[0]
+        assert len(created) == 3
+        assert all('key' not in name and 'secret' not in name for name in pool.stats())
+    finally:
+        await reset(pool)
+
+def test_same_credentials_share_one_client():
+    asyncio.run(run_same_credentials_share_one_client())
+
+async def run_unhealthy_session_is_recreated():
+    pool, created = fake_pool()
+    try:
+        first = await pool.get_exchange('fake', use_env=False)
+        pool.sessions[pool.session_key('fake')].healthy = False
+        second = await pool.get_exchange('fake', use_env=False)
+        assert second is not first
+        assert len(created) == 2
+    finally:
+        await reset(pool)
+
+def test_unhealthy_session_is_recreated():
+    asyncio.run(run_unhealthy_session_is_recreated())
@@ -0,0 +1,42 @@
+import numpy as np
+from data_sources.kline_frame import KlineFrame
+from strategies.feature_cache import FeatureCache
+
+def frame(closes, start=0):
+    ts = (np.arange(len(closes), dtype=np.int64) + start) * 60000
+    closes = np.asarray(closes, dtype=np.float64)
+    return KlineFrame.from_columns(ts, closes, closes, closes, closes, np.ones(len(closes)))
+
+class CountingAnalyzer:
+    def __init__(self):
+        self.calls = 0
+
+    def analyze(self, klines):
+        self.calls += 1
+        return 0.5
+
+def test_feature_is_computed_once_per_candle():
+    cache = FeatureCache()
+    analyzer = CountingAnalyzer()
+    klines = frame([1.0, 2.0, 3.0])
+    # Несколько стратегий читают одну и ту же свечу: волатильность считается один раз
+    for _ in range(3):
+        assert cache.features('fc', 'A/USDT', '1m', klines).volatility(analyzer) == 0.5
+    assert analyzer.calls == 1
+
+def test_new_close_or_candle_invalidates_features():
+    cache = FeatureCache()
+    analyzer = CountingAnalyzer()
+    cache.features('fc', 'B/USDT', '1m', frame([1.0, 2.0, 3.0])).volatility(analyzer)
+    cache.features('fc', 'B/USDT', '1m', frame([1.0, 2.0, 3.5])).volatility(analyzer)  # Открытая свеча обновила close
+    cache.features('fc', 'B/USDT', '1m', frame([2.0, 3.5, 4.0], start=1)).volatility(analyzer)  # Новая свеча
+    assert analyzer.calls == 3
+
+def test_series_are_kept_apart():
+    cache = FeatureCache()
+    analyzer = CountingAnalyzer()
+    klines = frame([1.0, 2.0, 3.0])
+    for key in (('fc', 'C/USDT', '1m'), ('fc', 'C/USDT', '5m'), ('fc', 'D/USDT', '1m'), ('other', 'C/USDT', '1m')):
+        cache.features(*key, klines).volatility(analyzer)
+    assert analyzer.calls == 4
+    assert cache.features('fc', 'C/USDT:USDT', '1m', klines) is cache.features('fc', 'C/USDT', '1m', klines)
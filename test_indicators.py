@@ -0,0 +1,87 @@
+import numpy as np
+from strategies import indicators
+
+PERIOD = 14
+
+def series(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    high = close * (1 + rng.uniform(0, 0.01, n))
+    low = close * (1 - rng.uniform(0, 0.01, n))
+    return high, low, close
+
+# Эталонные реализации на циклах по классическим определениям Уайлдера
+
+def loop_wilder(values, period):
+    """Smoothed values aligned to ``values``: NaN until the first full window."""
+    result = [np.nan] * len(values)
+    average = sum(values[:period]) / period
+    result[period - 1] = average
+    for i in range(period, len(values)):
+        average = (average * (period - 1) + values[i]) / period
+        result[i] = average
+    return result
+
+def loop_ema(values, period):
+    k = 2 / (period + 1)
+    result = [values[0]]
+    for value in values[1:]:
+        result.append(value * k + result[-1] * (1 - k))
+    return np.array(result)
+
+def loop_rsi(close, period):
+    gains = [max(close[i] - close[i - 1], 0) for i in range(1, len(close))]
+    losses = [max(close[i - 1] - close[i], 0) for i in range(1, len(close))]
+    avg_gain, avg_loss = loop_wilder(gains, period), loop_wilder(losses, period)
+    return np.array([np.nan] + [100 - 100 / (1 + g / l) for g, l in zip(avg_gain, avg_loss)])
+
+def loop_true_ranges(high, low, close):
+    return [max(high[i] - low[i], abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1])) for i in range(1, len(close))]
+
+def loop_atr(high, low, close, period):
+    return np.array([np.nan] + loop_wilder(loop_true_ranges(high, low, close), period))
+
+def loop_adx(high, low, close, period):
+    plus_dm, minus_dm = [], []
+    for i in range(1, len(close)):
+        up, down = high[i] - high[i - 1], low[i - 1] - low[i]
+        plus_dm.append(up if up > down and up > 0 else 0.0)
+        minus_dm.append(down if down > up and down > 0 else 0.0)
+    tr = loop_wilder(loop_true_ranges(high, low, close), period)
+    plus, minus = loop_wilder(plus_dm, period), loop_wilder(minus_dm, period)
+    dx = []
+    for p, m, t in zip(plus[period - 1:], minus[period - 1:], tr[period - 1:]):
+        plus_di, minus_di = 100 * p / t, 100 * m / t
+        dx.append(100 * abs(plus_di - minus_di) / (plus_di + minus_di))
+    return np.array([np.nan] * period + loop_wilder(dx, period))
+
+def test_rsi_matches_loop():
+    _, _, close = series()
+    assert np.allclose(indicators.rsi(close, PERIOD), loop_rsi(close, PERIOD), equal_nan=True)
+
+def test_macd_matches_loop():
+    _, _, close = series()
+    line, signal, histogram = indicators.macd(close)
+    expected_line = loop_ema(close, 12) - loop_ema(close, 26)
+    expected_signal = loop_ema(expected_line, 9)
+    assert np.allclose(line, expected_line)
+    assert np.allclose(signal, expected_signal)
+    assert np.allclose(histogram, expected_line - expected_signal)
+
+def test_atr_matches_loop():
+    high, low, close = series()
+    assert np.allclose(indicators.atr(high, low, close, PERIOD), loop_atr(high, low, close, PERIOD), equal_nan=True)
+
+def test_adx_matches_loop():
+    high, low, close = series()
+    expected = loop_adx(high, low, close, PERIOD)
+    assert np.allclose(indicators.adx(high, low, close, PERIOD), expected, equal_nan=True)
+    assert np.allclose(indicators.dmi(high, low, close, PERIOD)[2], expected, equal_nan=True)
+
+def test_matrix_rows_match_single_series():
+    rows = [series(seed=seed) for seed in range(4)]
+    high, low, close = (np.vstack([row[i] for row in rows]) for i in range(3))
+    # Матрица (символы x время) считается за один проход и совпадает с построчным расчётом
+    for i, (h, l, c) in enumerate(rows):
+        assert np.allclose(indicators.rsi(close, PERIOD)[i], indicators.rsi(c, PERIOD), equal_nan=True)
+        assert np.allclose(indicators.adx(high, low, close, PERIOD)[i], indicators.adx(h, l, c, PERIOD), equal_nan=True)
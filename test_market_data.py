@@ -0,0 +1,105 @@
+import asyncio
+import time
+from data_sources.market_data import AsyncMarketData
+
+MINUTE = 60000
+
+class FakeExchange:
+    """Candles that end at the current bar, with a log of every fetch."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    async def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self.calls.append((symbol, timeframe, since, limit))
+        await asyncio.sleep(self.delay)
+        step = int(timeframe[:-1]) * (60 if timeframe.endswith('h') else 1) * MINUTE
+        end = int(time.time() * 1000) // step * step
+        start = since if since is not None else end - (limit - 1) * step
+        return [[ts, 1.0, 2.0, 0.5, 1.5, 10.0] for ts in range(start, end + 1, step)][-limit:]
+
+def attach(exchange_name, exchange, symbols):
+    market_data = AsyncMarketData()
+    market_data.exchanges[exchange_name] = exchange
+    market_data.symbol_cache[exchange_name] = set(symbols)
+    return market_data
+
+def detach(market_data, exchange_name):
+    market_data.exchanges.pop(exchange_name, None)
+    market_data.symbol_cache.pop(exchange_name, None)
+    for state in (market_data.buffers, market_data.kline_cache, market_data.derived):
+        for key in [key for key in state if key[0] == exchange_name]:
+            del state[key]
+    for key in [key for key in market_data.resamplers if key[0] == exchange_name]:
+        del market_data.resamplers[key]
+    market_data.streamed = {key for key in market_data.streamed if key[0] != exchange_name}
+
+async def run_resampled_timeframe():
+    exchange = FakeExchange()
+    market_data = attach('fake-resample', exchange, ['A/USDT'])
+    try:
+        await market_data.enable_resampling('A/USDT', 'fake-resample', ('5m',), limit=10)
+        seeded = len(exchange.calls)
+        resampled = market_data.cache_stats['resampled']
+        klines = await market_data.get_klines('A/USDT', '5m', 10, 'fake-resample')
+        # Старший таймфрейм обслуживается из локального буфера, запрашиваются только 1m свечи
+        assert len(klines) == 10
+        assert market_data.cache_stats['resampled'] == resampled + 1
+        assert all(call[1] == '1m' for call in exchange.calls[seeded:])
+    finally:
+        detach(market_data, 'fake-resample')
+
+def test_higher_timeframe_is_served_from_base_candles():
+    asyncio.run(run_resampled_timeframe())
+
+async def run_concurrent_callers_share_one_fetch():
+    exchange = FakeExchange(delay=0.05)
+    market_data = attach('fake-flight', exchange, ['A/USDT'])
+    try:
+        results = await asyncio.gather(*[market_data.get_klines('A/USDT', '1m', 20, 'fake-flight') for _ in range(10)])
+        # Десять одновременных запросов обслуживает один fetch_ohlcv
+        assert len(exchange.calls) == 1
+        assert all(len(klines) == 20 for klines in results)
+    finally:
+        detach(market_data, 'fake-flight')
+
+def test_concurrent_callers_share_one_fetch():
+    asyncio.run(run_concurrent_callers_share_one_fetch())
+
+class ShortHistoryExchange(FakeExchange):
+    async def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        return (await super().fetch_ohlcv(symbol, timeframe, since, limit))[-5:]
+
+async def run_short_history_is_cached():
+    exchange = ShortHistoryExchange()
+    market_data = attach('fake-short', exchange, ['NEW/USDT'])
+    try:
+        first = await market_data.get_klines('NEW/USDT', '1h', 100, 'fake-short')
+        second = await market_data.get_klines('NEW/USDT', '1h', 100, 'fake-short')
+        # Новый листинг отдаёт 5 свечей из 100 запрошенных; повторный запрос берётся из кэша
+        assert len(first) == len(second) == 5
+        assert len(exchange.calls) == 1
+    finally:
+        detach(market_data, 'fake-short')
+
+def test_short_history_is_cached():
+    asyncio.run(run_short_history_is_cached())
+
+async def run_refresh_fetches_only_new_candles():
+    exchange = FakeExchange()
+    market_data = attach('fake-sync', exchange, ['A/USDT'])
+    try:
+        await market_data.get_klines('A/USDT', '1m', 50, 'fake-sync')
+        last = market_data.buffers[('fake-sync', 'A/USDT', '1m')].last_timestamp
+        market_data.kline_cache.pop(('fake-sync', 'A/USDT', '1m'))
+        klines = await market_data.get_klines('A/USDT', '1m', 50, 'fake-sync')
+        # Второй запрос догружает свечи с последней сохранённой, а не всю историю заново
+        assert len(klines) == 50
+        assert exchange.calls[0][2] is None and exchange.calls[0][3] == 50
+        assert exchange.calls[1][2] == last and exchange.calls[1][3] < 50
+    finally:
+        detach(market_data, 'fake-sync')
+
+def test_refresh_fetches_only_new_candles():
+    asyncio.run(run_refresh_fetches_only_new_candles())
@@ -0,0 +1,71 @@
+import asyncio
+from utils.market_data_collector import MarketDataCollector
+
+MINUTE = 60000
+PAYLOADS = {
+    'binance': [[i * MINUTE, 1.0, 2.0, 0.5, 1.5, 10.0] for i in range(5)],
+    'bybit': {'result': {'list': [[str(i * MINUTE), '1', '2', '0.5', '1.5', '10'] for i in range(5)]}},
+}
+
+class FakeResponse:
+    def __init__(self, status, payload):
+        self.status = status
+        self.payload = payload
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise Exception(f"HTTP {self.status}")
+
+    async def json(self, content_type=None):
+        return self.payload
+
+class FakeRequest:
+    def __init__(self, session, exchange_name):
+        self.session = session
+        self.exchange_name = exchange_name
+
+    async def __aenter__(self):
+        delay, status = self.session.behaviour[self.exchange_name]
+        self.session.requested.append(self.exchange_name)
+        await asyncio.sleep(delay)
+        return FakeResponse(status, PAYLOADS[self.exchange_name])
+
+    async def __aexit__(self, *exc):
+        return False
+
+class FakeSession:
+    """Answers each exchange's candle URL after a set delay with a set HTTP status."""
+
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.requested = []
+
+    def get(self, url, params=None, timeout=None):
+        return FakeRequest(self, 'bybit' if 'bybit' in url else 'binance')
+
+def collector(behaviour):
+    collector = MarketDataCollector(exchanges=['binance', 'bybit'], hedge_min=0.01, hedge_max=0.05)
+    collector.session = FakeSession(behaviour)
+    return collector
+
+def test_failover_to_next_exchange():
+    router = collector({'binance': (0, 500), 'bybit': (0, 200)})
+    klines = asyncio.run(router.collect_klines('BTC/USDT', '1m', 5))
+    assert len(klines) == 5
+    assert router.session.requested == ['binance', 'bybit']
+    assert router.stats['failovers'] == 1
+    assert router.trackers['binance'].error_rate == 1.0
+    # Отказавший источник опускается в рейтинге
+    assert router.rank('BTC/USDT', '1m') == ['bybit', 'binance']
+
+def test_hedge_wins_without_counting_the_loser():
+    router = collector({'binance': (0.5, 200), 'bybit': (0, 200)})
+    klines = asyncio.run(router.collect_klines('BTC/USDT', '1m', 5))
+    assert len(klines) == 5
+    assert router.stats['hedged'] == 1
+    assert router.stats['hedge_wins'] == 1
+    # Отменённый запрос даёт нижнюю оценку задержки, но не считается ни успехом, ни ошибкой
+    binance = router.trackers['binance']
+    assert len(binance.outcomes) == 0
+    assert len(binance.latencies) == 1 and binance.latencies[0] >= 0.05
+    assert router.rank('BTC/USDT', '1m') == ['bybit', 'binance']
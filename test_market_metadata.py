@@ -0,0 +1,51 @@
+import asyncio
+import json
+import os
+import tempfile
+from data_sources.market_metadata import MarketMetadataService
+
+MARKETS = {'A/USDT': {'symbol': 'A/USDT', 'active': True, 'precision': {'price': 0.01}, 'info': {'filters': [{'filterType': 'PRICE_FILTER'}]}}}
+
+class FakeExchange:
+    timeframes = {'1m': '1m'}
+
+    def __init__(self):
+        self.installed = None
+        self.loads = 0
+
+    async def load_markets(self, reload=False):
+        self.loads += 1
+        return MARKETS
+
+    def set_markets(self, markets):
+        self.installed = markets
+
+def fresh_service():
+    service = MarketMetadataService()
+    service.root = tempfile.mkdtemp()
+    for state in (service.markets, service.timeframes, service.symbols, service.fetched_at):
+        state.pop('fake', None)
+    return service
+
+async def run_cached_load_keeps_info():
+    service = fresh_service()
+    await service.refresh('fake', FakeExchange())
+    service.markets.pop('fake')
+    exchange = FakeExchange()
+    await service.ensure('fake', exchange)
+    await service.close()
+    # Клиент получает рынки с диска без запроса к бирже, и ccxt найдёт в них 'info'
+    assert exchange.loads == 0
+    assert exchange.installed['A/USDT']['info'] == MARKETS['A/USDT']['info']
+    assert service.get_precision('fake', 'A/USDT') == {'price': 0.01}
+
+def test_cached_load_keeps_raw_market_info():
+    asyncio.run(run_cached_load_keeps_info())
+
+def test_snapshot_without_info_is_reloaded():
+    service = fresh_service()
+    stripped = {'A/USDT': {key: value for key, value in MARKETS['A/USDT'].items() if key != 'info'}}
+    with open(os.path.join(service.root, 'fake.json'), 'w') as f:
+        json.dump({'fetched_at': 0, 'timeframes': ['1m'], 'markets': stripped}, f)
+    assert not service.load('fake')
+    assert 'fake' not in service.markets
@@ -0,0 +1,38 @@
+import tempfile
+import numpy as np
+from data_sources.kline_frame import KlineFrame
+from data_sources.ohlcv_store import OHLCVStore
+
+MINUTE = 60000
+
+def candles(minutes, close=100.0):
+    ts = np.asarray(minutes, dtype=np.int64) * MINUTE
+    close = np.full(len(ts), close)
+    return KlineFrame.from_columns(ts, close, close, close, close, np.ones(len(ts)))
+
+def test_append_in_place_and_overwrite_open_candle():
+    store = OHLCVStore(tempfile.mkdtemp())
+    assert store.append('test', 'A/USDT', '1m', candles(range(5))) == 5
+    # Последняя свеча была открытой: её новая версия перезаписывает старую
+    assert store.append('test', 'A/USDT', '1m', candles(range(4, 8), close=101.0)) == 3
+    klines = store.read('test', 'A/USDT', '1m')
+    assert klines.ts.tolist() == [i * MINUTE for i in range(8)]
+    assert klines.close[3] == 100.0 and klines.close[4] == 101.0
+    assert store.info('test', 'A/USDT', '1m') == {'first_ts': 0, 'last_ts': 7 * MINUTE, 'count': 8}
+
+def test_older_history_is_merged():
+    store = OHLCVStore(tempfile.mkdtemp())
+    store.append('test', 'A/USDT', '1m', candles(range(10, 15)))
+    assert store.append('test', 'A/USDT', '1m', candles(range(5, 12), close=99.0)) == 5
+    klines = store.read('test', 'A/USDT', '1m')
+    assert klines.ts.tolist() == [i * MINUTE for i in range(5, 15)]
+    assert store.info('test', 'A/USDT', '1m')['first_ts'] == 5 * MINUTE
+    assert store.read('test', 'A/USDT', '1m', start=7 * MINUTE, end=9 * MINUTE).ts.tolist() == [7 * MINUTE, 8 * MINUTE, 9 * MINUTE]
+    assert len(store.read('test', 'A/USDT', '1m', limit=3)) == 3
+
+def test_flushed_index_survives_restart():
+    root = tempfile.mkdtemp()
+    store = OHLCVStore(root)
+    store.append('test', 'A/USDT', '1m', candles(range(3)))
+    store.flush_index()
+    assert OHLCVStore(root).index == store.index
@@ -0,0 +1,70 @@
+import asyncio
+from data_sources.order_book import LocalOrderBook, OrderBookManager
+
+def make_book():
+    book = LocalOrderBook('test', 'BOOK/USDT')
+    book.apply_snapshot([[99.0, 1.0], [98.0, 2.0]], [[101.0, 1.0], [102.0, 2.0]], sequence=10)
+    return book
+
+def test_deltas_update_and_remove_levels():
+    book = make_book()
+    assert book.apply_delta([[99.5, 1.0], [98.0, 0.0]], [[101.0, 3.0]], 11, 11)
+    assert book.best_bid() == (99.5, 1.0)
+    assert book.bids.prices.tolist() == [99.5, 99.0]
+    assert book.best_ask() == (101.0, 3.0)
+    assert book.mid_price() == 100.25
+
+def test_vwap_walks_the_book():
+    book = make_book()
+    assert book.vwap('buy', 2.0) == (101.0 + 102.0) / 2
+    assert book.vwap('sell', 1.0) == 99.0
+    assert book.vwap('buy', 10.0) is None
+    assert book.slippage_bps('buy', 1.0) == 0.0
+
+def test_old_deltas_are_ignored_and_gaps_unsync():
+    book = make_book()
+    assert book.apply_delta([[99.0, 5.0]], [], 9, 10)
+    assert book.best_bid() == (99.0, 1.0)
+    assert not book.apply_delta([[99.0, 5.0]], [], 13, 13)
+    assert not book.synced
+
+class FakeExchange:
+    limits = []
+
+    async def fetch_order_book(self, symbol, limit=None):
+        self.limits.append(limit)
+        return {'bids': [[99.0, 1.0]], 'asks': [[101.0, 1.0]], 'nonce': 10, 'timestamp': None}
+
+class FakeMarketData:
+    exchanges = {'test': FakeExchange()}
+
+class FakeRateLimiter:
+    async def call(self, exchange_name, method, fn, *args, **kwargs):
+        return await fn(*args, **kwargs)
+
+async def run_manager_resync():
+    manager = OrderBookManager()
+    saved = manager.market_data, manager.rate_limiter
+    manager.market_data, manager.rate_limiter = FakeMarketData(), FakeRateLimiter()
+    quotes = []
+    handler = lambda exchange, symbol, bid, ask, timestamp: quotes.append((symbol, bid, ask))
+    manager.quote_handlers.append(handler)
+    try:
+        # Дельты до снимка буферизуются и применяются после него, устаревшие отбрасываются
+        manager.on_depth('test', 'SYNC/USDT', [[99.5, 2.0]], [], 9, 10, None)
+        manager.on_depth('test', 'SYNC/USDT', [[99.5, 2.0]], [[100.5, 1.0]], 11, 11, None)
+        await manager.resyncs[('test', 'SYNC/USDT')]
+        book = manager.get('test', 'SYNC/USDT')
+        assert book is not None and book.sequence == 11
+        assert book.best_bid() == (99.5, 2.0)
+        assert book.best_ask() == (100.5, 1.0)
+        assert quotes[-1] == ('SYNC/USDT', 99.5, 100.5)
+        assert manager.price_board.quote('test', 'SYNC/USDT') == (99.5, 100.5)
+        # Небольшой снимок по умолчанию: на Binance глубина 1000 весит в десять раз больше
+        assert FakeMarketData.exchanges['test'].limits == [manager.snapshot_depth] and manager.snapshot_depth <= 100
+    finally:
+        manager.quote_handlers.remove(handler)
+        manager.market_data, manager.rate_limiter = saved
+
+def test_manager_replays_buffered_deltas_after_snapshot():
+    asyncio.run(run_manager_resync())
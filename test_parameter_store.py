@@ -0,0 +1,62 @@
+import asyncio
+import time
+import numpy as np
+from data_sources.kline_frame import KlineFrame
+from strategies.parameter_store import ParameterStore
+from strategies.rsi_strategy import RSIStrategy
+
+def test_parameters_are_isolated_per_symbol():
+    store = ParameterStore()
+    defaults = {'overbought': 70}
+    store.set('rsi', 'iso', 'A/USDT', '1m', {'overbought': 80})
+    store.set('rsi', 'iso', 'B/USDT', '1m', {'overbought': 60})
+    assert store.get('rsi', 'iso', 'A/USDT', '1m', defaults) == {'overbought': 80}
+    assert store.get('rsi', 'iso', 'B/USDT', '1m', defaults) == {'overbought': 60}
+    # Другой таймфрейм, другая стратегия и суффикс деривативов ccxt
+    assert store.get('rsi', 'iso', 'A/USDT', '5m', defaults) is defaults
+    assert store.get('macd', 'iso', 'A/USDT', '1m', defaults) is defaults
+    assert store.get('rsi', 'iso', 'A/USDT:USDT', '1m', defaults) == {'overbought': 80}
+
+def test_stored_parameters_are_copies():
+    store = ParameterStore()
+    params = {'overbought': 75}
+    stored = store.set('rsi', 'copy', 'A/USDT', '1m', params)
+    params['overbought'] = 0
+    assert stored == {'overbought': 75}
+
+def test_prune_drops_idle_series():
+    store = ParameterStore()
+    store.set('rsi', 'prune', 'OLD/USDT', '1m', {'overbought': 80})
+    store.set('rsi', 'prune', 'NEW/USDT', '1m', {'overbought': 80})
+    store.last_used[('prune', 'OLD/USDT', '1m')] = time.time() - 7200
+    store.prune(max_idle=3600)
+    assert ('prune', 'OLD/USDT', '1m') not in store.series
+    assert ('prune', 'NEW/USDT', '1m') in store.series
+
+class FakeMarketData:
+    def __init__(self, frames):
+        self.frames = frames
+
+    async def get_klines(self, symbol, timeframe, limit, exchange_name):
+        await asyncio.sleep(0)  # Переключение задач между символами
+        return self.frames[symbol]
+
+class FixedVolatility:
+    def __init__(self, by_close):
+        self.by_close = by_close
+
+    def analyze(self, klines):
+        return self.by_close[float(KlineFrame.ensure(klines).close[-1])]
+
+async def run_concurrent_adaptation():
+    ts = np.arange(50, dtype=np.int64) * 60000
+    frames = {symbol: KlineFrame.from_columns(ts, *[np.full(50, price)] * 4, np.ones(50)) for symbol, price in (('CALM/USDT', 10.0), ('WILD/USDT', 20.0))}
+    strategy = RSIStrategy({}, FakeMarketData(frames), FixedVolatility({10.0: 0.0, 20.0: 2.0}))
+    calm, wild = await asyncio.gather(strategy.adapt_parameters('CALM/USDT', '1m', 50, 'adapt'), strategy.adapt_parameters('WILD/USDT', '1m', 50, 'adapt'))
+    # Одновременная адаптация двух символов не перетирает пороги друг друга
+    assert calm == {'overbought': 70, 'oversold': 30}
+    assert wild == {'overbought': 80, 'oversold': 20}
+    assert strategy.base_overbought == 70
+
+def test_concurrent_adaptation_keeps_symbols_apart():
+    asyncio.run(run_concurrent_adaptation())
@@ -0,0 +1,40 @@
+import time
+import numpy as np
+from data_sources.price_board import PriceBoard
+
+def now_ms():
+    return int(time.time() * 1000)
+
+def test_fresh_quote_gives_executable_price():
+    board = PriceBoard()
+    board.update_trade('test', 'FRESH/USDT', 100.0)
+    board.update_quote('test', 'FRESH/USDT', 99.5, 100.5)
+    assert board.price('test', 'FRESH/USDT', 'buy') == 100.5
+    assert board.price('test', 'FRESH/USDT', 'sell') == 99.5
+    assert board.price('test', 'FRESH/USDT') == 100.0
+
+def test_stale_quote_falls_back_to_fresh_trade():
+    # Регрессия: свежая сделка не должна делать свежей старую котировку
+    board = PriceBoard()
+    board.update_quote('test', 'STALE/USDT', 90.0, 91.0, now_ms() - 120 * 1000)
+    board.update_trade('test', 'STALE/USDT', 100.0)
+    assert board.price('test', 'STALE/USDT', 'buy', max_age=30) == 100.0
+    assert board.price('test', 'STALE/USDT', 'sell', max_age=30) == 100.0
+
+def test_stale_prices_are_unknown():
+    board = PriceBoard()
+    old = now_ms() - 120 * 1000
+    board.update_trade('test', 'OLD/USDT', 100.0, timestamp=old)
+    board.update_quote('test', 'OLD/USDT', 99.0, 101.0, old)
+    assert board.price('test', 'OLD/USDT', 'buy', max_age=30) is None
+    assert board.price('test', 'OLD/USDT', max_age=30) is None
+    assert board.price('test', 'UNKNOWN/USDT') is None
+
+def test_tickers_without_quote_keep_live_quote():
+    board = PriceBoard()
+    board.update_quote('test', 'LIVE/USDT', 99.0, 101.0)
+    board.update_tickers('test', {'LIVE/USDT': {'last': 100.0, 'bid': None, 'ask': None}, 'NEW/USDT': {'last': 5.0, 'bid': 4.9, 'ask': 5.1}})
+    assert board.quote('test', 'LIVE/USDT') == (99.0, 101.0)
+    assert board.price('test', 'LIVE/USDT') == 100.0
+    assert board.quote('test', 'NEW/USDT') == (4.9, 5.1)
+    assert np.allclose(board.prices('test', ['LIVE/USDT', 'NEW/USDT']), [100.0, 5.0])
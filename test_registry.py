@@ -0,0 +1,51 @@
+import asyncio
+import os
+import numpy as np
+from data_sources.kline_frame import KlineFrame
+from strategies import registry
+
+def with_setting(value, names=None):
+    saved = os.environ.get('ENABLED_STRATEGIES')
+    os.environ['ENABLED_STRATEGIES'] = value
+    try:
+        return [spec.name for spec in registry.enabled_strategies(names)]
+    finally:
+        if saved is None:
+            del os.environ['ENABLED_STRATEGIES']
+        else:
+            os.environ['ENABLED_STRATEGIES'] = saved
+
+def test_enabled_strategies_follow_the_setting():
+    assert with_setting('rsi, grid,,unknown') == ['rsi', 'grid']
+    assert with_setting('') == list(registry.STRATEGIES)
+    # Явный список имён важнее настройки
+    assert with_setting('rsi', names=['macd']) == ['macd']
+
+def test_lookback_covers_specs_on_the_timeframe():
+    specs = registry.enabled_strategies(['rsi', 'grid', 'trend'])
+    assert registry.lookback(specs, '1m') == max(registry.STRATEGIES[name].lookback for name in ('rsi', 'grid', 'trend'))
+    hourly = registry.StrategySpec('hourly', 'strategies.grid_strategy', 'GridStrategy', 500, timeframe='1h')
+    assert registry.lookback(specs + [hourly], '1m') == registry.lookback(specs, '1m')
+    assert registry.lookback(specs + [hourly], '1h') == 500
+    assert registry.lookback([], '1m') == 0
+
+class ExtremeVolatility:
+    def analyze(self, klines):
+        return 50.0
+
+class FakeMarketData:
+    async def get_klines(self, symbol, timeframe, limit, exchange_name):
+        ts = np.arange(limit, dtype=np.int64) * 60000
+        return KlineFrame.from_columns(ts, *[np.linspace(1, 2, limit)] * 4, np.ones(limit))
+
+async def adapted_periods(name):
+    spec = registry.STRATEGIES[name]
+    strategy = spec.build({}, FakeMarketData(), ExtremeVolatility())
+    return spec.lookback, await strategy.adapt_parameters('A/USDT', '1m', spec.lookback, 'registry')
+
+def test_adaptive_periods_fit_the_declared_lookback():
+    # Даже при экстремальной волатильности адаптивный период не выходит за объявленный lookback
+    lookback, params = asyncio.run(adapted_periods('trend'))
+    assert 50 < params['lookback_period'] <= lookback
+    lookback, params = asyncio.run(adapted_periods('macd'))
+    assert 26 < params['slow_period'] <= lookback
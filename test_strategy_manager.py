@@ -0,0 +1,76 @@
+import asyncio
+import numpy as np
+from data_sources.kline_frame import KlineFrame, stack_frames
+from strategies.strategy_manager import StrategyManager
+from volatility_analyzer import VolatilityAnalyzer
+
+BATCH_STRATEGIES = ['rsi', 'macd', 'bollinger', 'breakout', 'mean_reversion', 'trend', 'grid', 'scalping']
+SIGNALS = {'buy': 1, 'sell': -1, 'hold': 0}
+LENGTH = 300
+DAY = 86400000  # Дневные свечи: годовая волатильность остаётся порядка десятых, пороги стратегий достижимы
+
+class FakeMarketData:
+    def __init__(self, frames):
+        self.frames = frames
+
+    async def get_klines(self, symbol, timeframe, limit, exchange_name):
+        return self.frames[symbol].tail(limit)
+
+def make_frames(count, seed=0):
+    rng = np.random.default_rng(seed)
+    # Разные тренды и волатильность, чтобы стратегии давали и покупки, и продажи
+    drift = rng.normal(0, 0.002, (count, 1))
+    scale = rng.uniform(0.001, 0.01, (count, 1))
+    close = 100 * np.exp(np.cumsum(drift + rng.normal(0, 1, (count, LENGTH)) * scale, axis=1))
+    # Резкий ход на последней свече пробивает полосы и уровни сетки
+    close[:, -1] *= 1 + rng.choice([-1, 0, 1], count) * rng.uniform(0.02, 0.1, count)
+    ts = np.arange(LENGTH, dtype=np.int64) * DAY
+    return {f"S{i}/USDT": KlineFrame.from_columns(ts, close[i], close[i] * (1 + scale[i]), close[i] * (1 - scale[i]), close[i], rng.uniform(1, 10, LENGTH))
+            for i in range(count)}
+
+async def per_symbol_signals(manager, frames, exchange_name):
+    rows = []
+    for strategy in manager.strategies:
+        row = []
+        for symbol, klines in frames.items():
+            result = await strategy.generate_signal(symbol, klines, '1d', LENGTH, exchange_name)
+            row.append(SIGNALS[result['signal']] if result else 0)
+        rows.append(row)
+    return np.array(rows, dtype=np.int8)
+
+def test_batch_signals_match_per_symbol_signals():
+    frames = make_frames(40)
+    market_data = FakeMarketData(frames)
+    manager = StrategyManager({'volatility': 0.3}, market_data, VolatilityAnalyzer({'volatility': 0.3}, market_data), None, enabled=BATCH_STRATEGIES)
+    _, high, low, close, volume = stack_frames(list(frames.values()), LENGTH)
+    names, batch = manager.generate_signals_batch(close, high, low, volume, '1d')
+    expected = asyncio.run(per_symbol_signals(manager, frames, 'batch-parity'))
+    assert names == [strategy.name for strategy in manager.strategies]
+    for name, batch_row, expected_row in zip(names, batch, expected):
+        assert batch_row.tolist() == expected_row.tolist(), name
+    # Каждая стратегия дала хотя бы один сигнал, иначе совпадение было бы тривиальным
+    assert all((row != 0).any() for row in batch)
+
+class SlowStrategy:
+    name = "slow"
+
+    async def generate_signal(self, symbol, klines, timeframe, limit, exchange_name):
+        await asyncio.sleep(5)
+        return {"symbol": symbol, "strategy": self.name, "signal": "buy"}
+
+async def run_slow_strategy_is_dropped():
+    frames = make_frames(1)
+    market_data = FakeMarketData(frames)
+    manager = StrategyManager({'volatility': 0.3}, market_data, VolatilityAnalyzer({'volatility': 0.3}, market_data), None, signal_deadline=0.2, enabled=['grid'])
+    manager.strategies.append(SlowStrategy())
+    manager.specs.append(manager.specs[0])
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    signals = await manager.generate_signals('S0/USDT', frames['S0/USDT'], None, '1d', LENGTH, 'deadline')
+    # Медленная стратегия отбрасывается по дедлайну, остальные сигналы символа не ждут её
+    assert loop.time() - start < 1
+    assert [signal['strategy'] for signal in signals] == ['grid']
+    assert manager.stats['timeouts'] == 1
+
+def test_slow_strategy_is_dropped():
+    asyncio.run(run_slow_strategy_is_dropped())
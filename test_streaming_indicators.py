@@ -0,0 +1,60 @@
+import numpy as np
+from data_sources.kline_frame import KlineFrame
+from strategies import indicators
+from strategies.streaming_indicators import IndicatorStore
+
+MINUTE = 60000
+
+def make_klines(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    high, low = close * (1 + rng.uniform(0, 0.01, n)), close * (1 - rng.uniform(0, 0.01, n))
+    return KlineFrame.from_columns(np.arange(n, dtype=np.int64) * MINUTE, close, high, low, close, np.ones(n))
+
+def test_streaming_matches_batch():
+    klines = make_klines()
+    store = IndicatorStore()
+    def value(kind, *params):
+        return store.indicator('test', 'MATCH/USDT', '1m', klines, kind, *params).value
+    assert np.isclose(value('rsi', 14), indicators.rsi(klines.close, 14)[-1])
+    assert np.isclose(value('macd', 12, 26, 9)[1], indicators.macd(klines.close)[1][-1])
+    mean, std = value('rolling_stats', 20)
+    assert np.isclose(mean, indicators.sma(klines.close, 20)[-1])
+    assert np.isclose(std, indicators.rolling_std(klines.close, 20)[-1])
+    assert np.isclose(value('rolling_max', 20, 'high'), indicators.rolling_max(klines.high, 20)[-1])
+    assert np.isclose(value('atr', 14), indicators.atr(klines.high, klines.low, klines.close)[-1])
+    assert np.isclose(value('adx', 14), indicators.adx(klines.high, klines.low, klines.close)[-1])
+
+def test_open_candle_updates_replace_each_other():
+    klines = make_klines()
+    store = IndicatorStore()
+    rsi = store.indicator('test', 'OPEN/USDT', '1m', klines[:-1], 'rsi', 14)
+    last = klines.row(len(klines) - 1)
+    rsi.update([last[0], 0, 0, 0, last[4] * 1.05, 0])
+    rsi.update(last)
+    assert np.isclose(rsi.value, indicators.rsi(klines.close, 14)[-1])
+
+def test_stream_gap_resets_and_sync_reseeds():
+    klines = make_klines()
+    store = IndicatorStore()
+    ema = store.indicator('test', 'GAP/USDT', '1m', klines[:-5], 'ema', 10)
+    store.on_kline('test', 'GAP/USDT', '1m', klines.row(len(klines) - 5))
+    assert ema.timestamp == klines.ts[-5]
+    # Пропущенные свечи (переподключение) не подмешиваются в состояние
+    store.on_kline('test', 'GAP/USDT', '1m', klines.row(len(klines) - 1))
+    assert ema.timestamp is None
+    store.sync(ema, klines)
+    assert np.isclose(ema.value, indicators.ema(klines.close, 10)[-1])
+
+def test_prune_drops_superseded_adaptive_periods():
+    klines = make_klines()
+    store = IndicatorStore()
+    key = ('test', 'PRUNE/USDT', '1m')
+    store.indicator(*key, klines, 'rolling_stats', 50)
+    store.indicator(*key, klines, 'rolling_stats', 60)
+    store.last_used[(key, ('rolling_stats', (50,)))] -= 7200
+    assert store.prune(3600) == 1
+    assert list(store.series[key]) == [('rolling_stats', (60,))]
+    store.last_used[(key, ('rolling_stats', (60,)))] -= 7200
+    store.prune(3600)
+    assert key not in store.series
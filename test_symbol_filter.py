@@ -0,0 +1,22 @@
+import asyncio
+from symbol_filter import SymbolFilter
+
+TICKERS = {
+    'LIQUID/USDT': {'quoteVolume': 1e6, 'bid': 99.9, 'ask': 100.1},
+    'DEAD/USDT': {'quoteVolume': 0.0, 'baseVolume': 0.0, 'last': 1.0, 'bid': 0.99, 'ask': 1.01},
+    'THIN/USDT': {'quoteVolume': 100.0, 'bid': 0.99, 'ask': 1.01},
+    'BASE_ONLY/USDT': {'quoteVolume': None, 'baseVolume': 1000.0, 'last': 100.0, 'bid': 99.9, 'ask': 100.1},
+    'UNKNOWN/USDT': {'quoteVolume': None, 'baseVolume': None, 'bid': None, 'ask': None},
+    'WIDE/USDT': {'quoteVolume': 1e6, 'bid': 90.0, 'ask': 110.0},
+    'NO_BID/USDT': {'quoteVolume': 1e6, 'bid': 0.0, 'ask': 1.0},
+}
+
+class FakeMarketData:
+    async def get_tickers(self, exchange_name):
+        return TICKERS
+
+def test_prefilter_drops_zero_and_low_volume_keeps_unknown():
+    symbol_filter = SymbolFilter(FakeMarketData(), {'min_quote_volume': 50000, 'max_spread': 0.01})
+    survivors = asyncio.run(symbol_filter.prefilter_by_tickers(list(TICKERS) + ['MISSING/USDT'], 'test'))
+    # Нулевой объём и нулевой bid — известные значения и отсеиваются; неизвестные решает фильтр по свечам
+    assert survivors == ['LIQUID/USDT', 'BASE_ONLY/USDT', 'UNKNOWN/USDT', 'MISSING/USDT']
@@ -0,0 +1,19 @@
+import asyncio
+import math
+from analysis.volatility_analyzer import VolatilityAnalyzer
+
+class FakeMarketData:
+    def __init__(self, klines):
+        self.klines = klines
+
+    async def get_klines(self, symbol, timeframe, limit, exchange_name):
+        return self.klines
+
+def test_single_candle_returns_default_volatility():
+    analyzer = VolatilityAnalyzer({'volatility': 0.3}, FakeMarketData([[0, 1.0, 1.0, 1.0, 1.0, 5.0]]))
+    assert asyncio.run(analyzer.analyze_volatility('A/USDT')) == 0.3
+
+def test_volatility_of_close_returns():
+    klines = [[i * 3600000, 1.0, 1.0, 1.0, close, 5.0] for i, close in enumerate([100.0, 110.0, 99.0])]
+    volatility = asyncio.run(VolatilityAnalyzer({'volatility': 0.3}, FakeMarketData(klines)).analyze_volatility('A/USDT'))
+    assert math.isclose(volatility, 0.1)
@@ -0,0 +1,41 @@
+import asyncio
+from data_sources.mock_websocket_server import MockExchangeServer
+from data_sources.market_data import AsyncMarketData
+from data_sources.websocket_manager import WebSocketManager, BinanceStreamProtocol
+
+async def run_websocket_manager():
+    server = MockExchangeServer(port=8766, interval=0.05)
+    await server.start()
+    market_data = AsyncMarketData()
+    manager = WebSocketManager(market_data, protocols={'binance': BinanceStreamProtocol(url=server.url)})
+    trades = []
+    manager.trade_handlers.append(lambda exchange, symbol, price, amount, ts: trades.append(symbol))
+
+    symbols = [f"SYM{i}/USDT" for i in range(250)]
+    await manager.subscribe_klines('binance', symbols, '1m')
+    await manager.subscribe_trades('binance', symbols)
+    await asyncio.sleep(0.5)
+
+    # Одно соединение на биржу, все каналы подписаны
+    assert len(manager.connections['binance']) == 1
+    assert server.subscriptions_received == 500
+    assert set(trades) == set(symbols)
+    assert ('binance', 'SYM0/USDT', '1m') in market_data.streamed
+    assert len(market_data.buffers[('binance', 'SYM0/USDT', '1m')]) == 1
+
+    # Переподключение с повторной подпиской
+    await server.drop_connections()
+    await asyncio.sleep(1.5)
+    assert manager.stats['reconnects'] == 1
+    assert server.subscriptions_received == 1000
+
+    await manager.close()
+    await server.stop()
+    await market_data.close()
+    print("WebSocket manager stats:", manager.stats)
+
+def test_websocket_manager():
+    asyncio.run(run_websocket_manager())
+
+if __name__ == "__main__":
+    test_websocket_manager()
@@ -1,10 +1,44 @@
 from utils.logging_setup import setup_logging
+from data_sources.order_book import OrderBookManager
+from data_sources.price_board import PriceBoard
 
 logger = setup_logging('risk_calculator')
 
 class RiskCalculator:
-    def __init__(self, volatility_analyzer):
+    def __init__(self, volatility_analyzer, order_books=None, max_slippage_bps=50, price_board=None, max_price_deviation=0.02):
         self.volatility_analyzer = volatility_analyzer
+        self.order_books = order_books or OrderBookManager()
+        self.max_slippage_bps = max_slippage_bps
+        self.price_board = price_board or PriceBoard()
+        self.max_price_deviation = max_price_deviation
+
+    def estimate_slippage(self, signal):
+        """Slippage of the signal's size against the local order book in bps, or None without an in-sync book."""
+        book = self.order_books.get(signal.get('exchange_name'), signal['symbol'])
+        if book is None or signal.get('signal') not in ('buy', 'sell'):
+            return None
+        slippage = book.slippage_bps(signal['signal'], signal['trade_size'])
+        return float('inf') if slippage is None else slippage  # Стакан тоньше размера сделки
+
+    def check_liquidity(self, signal):
+        """Reject trades whose expected slippage exceeds max_slippage_bps."""
+        slippage = self.estimate_slippage(signal)
+        if slippage is not None and slippage > self.max_slippage_bps:
+            logger.warning(f"Expected slippage for {signal['symbol']} is {slippage:.1f} bps, above {self.max_slippage_bps} bps")
+            return False
+        return True
+
+    def check_price(self, signal):
+        """Reject trades whose entry price is too far from the live price on the board."""
+        entry_price = signal.get('entry_price')
+        price = self.price_board.price(signal.get('exchange_name'), signal['symbol'], signal.get('signal'))
+        if price is None or not entry_price:
+            return True  # Нет свежей цены — проверка пропускается, как и без стакана
+        deviation = abs(entry_price - price) / price
+        if deviation > self.max_price_deviation:
+            logger.warning(f"Entry price {entry_price} for {signal['symbol']} is {deviation:.2%} away from live price {price}")
+            return False
+        return True
 
     def calculate_risk(self, signal, klines):
         """Calculate risk for a trade."""
@@ -12,6 +46,10 @@ class RiskCalculator:
             volatility = self.volatility_analyzer.analyze(klines)
             # Пример: увеличиваем риск в зависимости от волатильности
             risk = signal['trade_size'] * volatility * 100
+            slippage = self.estimate_slippage(signal)
+            if slippage is not None:
+                # Проскальзывание по стакану добавляется к риску как ожидаемая потеря на входе
+                risk += signal['trade_size'] * min(slippage, 1e4) / 100
             logger.info(f"Calculated risk for {signal['symbol']}: {risk}")
             return risk
         except Exception as e:
@@ -1,28 +1,32 @@
-import os
-import ccxt.async_support as ccxt
 from utils.logging_setup import setup_logging
+from utils.api_rate_limiter import ExchangeRateLimiter
+from exchange_pool import ExchangePool
 
 logger = setup_logging('trade_executor')
 
 class TradeExecutor:
     def __init__(self, exchange_name="mexc"):
         self.exchange_name = exchange_name
-        self.exchange = ccxt.mexc({
-            'enableRateLimit': True,
-            'apiKey': os.getenv('MEXC_API_KEY'),
-            'secret': os.getenv('MEXC_API_SECRET'),
-        })
+        self.exchange_pool = ExchangePool()  # Долгоживущий клиент с прогретыми соединениями и рынками
+        self.rate_limiter = ExchangeRateLimiter()
         logger.info(f"TradeExecutor initialized for {exchange_name}")
 
+    async def get_exchange(self):
+        """Return the shared exchange client for this executor."""
+        return await self.exchange_pool.get_exchange(self.exchange_name)
+
     async def execute(self, signal):
         """Execute a trade asynchronously."""
+        exchange = None
         try:
             symbol = signal['symbol']
             side = signal['signal']
             amount = signal['trade_size']
             price = signal['entry_price']
+            exchange = await self.get_exchange()
 
-            order = await self.exchange.create_limit_order(
+            order = await self.rate_limiter.call(
+                self.exchange_name, 'create_order', exchange.create_limit_order,
                 symbol=symbol,
                 side=side,
                 amount=amount,
@@ -31,7 +35,8 @@ class TradeExecutor:
 
             if 'stop_loss' in signal:
                 stop_loss_price = signal['stop_loss']
-                stop_order = await self.exchange.create_order(
+                stop_order = await self.rate_limiter.call(
+                    self.exchange_name, 'create_order', exchange.create_order,
                     symbol=symbol,
                     type='stop_loss_limit',
                     side='sell' if side == 'buy' else 'buy',
@@ -44,15 +49,11 @@ class TradeExecutor:
             logger.info(f"Executed trade for {symbol}: {order}")
             return {"order_id": order['id'], "status": order['status']}
         except Exception as e:
-            logger.error(f"Failed to execute trade for {symbol}: {str(e)}")
+            if exchange is not None:
+                self.exchange_pool.report_failure(exchange, e)
+            logger.error(f"Failed to execute trade for {signal.get('symbol')}: {str(e)}")
             return {"order_id": None, "status": "failed"}
-        finally:
-            await self.exchange.close()
 
     async def close(self):
-        """Close the exchange connection."""
-        try:
-            await self.exchange.close()
-            logger.info(f"Closed TradeExecutor connection for {self.exchange_name}")
-        except Exception as e:
-            logger.error(f"Failed to close TradeExecutor connection: {str(e)}")
+        """Release the executor; the shared client is closed by ExchangePool.close()."""
+        logger.info(f"Closed TradeExecutor for {self.exchange_name}")
@@ -1,25 +1,213 @@
 import time
 import asyncio
+import threading
 from .logging_setup import setup_logging
 
 logger = setup_logging('api_rate_limiter')
 
+# Лимиты бирж: вместимость корзины (вес) и скорость пополнения (вес в секунду)
+EXCHANGE_LIMITS = {
+    'binance': {'capacity': 6000, 'refill_per_second': 100},  # 6000 weight / min
+    'mexc': {'capacity': 500, 'refill_per_second': 50},  # 500 / 10 s
+    'bybit': {'capacity': 600, 'refill_per_second': 120},  # 600 / 5 s
+    'kucoin': {'capacity': 2000, 'refill_per_second': 66},  # 2000 / 30 s
+    'okx': {'capacity': 20, 'refill_per_second': 10},
+    'kraken': {'capacity': 15, 'refill_per_second': 0.33},
+    'default': {'capacity': 20, 'refill_per_second': 10},
+}
+
+# Вес запроса по эндпоинтам (методам ccxt)
+ENDPOINT_WEIGHTS = {
+    'binance': {'fetch_ohlcv': 2, 'fetch_tickers': 80, 'fetch_ticker': 2, 'fetch_order_book': 5, 'fetch_balance': 20, 'load_markets': 20, 'create_order': 1},
+    'mexc': {'fetch_ohlcv': 1, 'fetch_tickers': 40, 'fetch_ticker': 1, 'fetch_order_book': 1, 'fetch_balance': 10, 'load_markets': 10, 'create_order': 1},
+    'bybit': {'fetch_tickers': 5},
+    'kucoin': {'fetch_ohlcv': 3, 'fetch_tickers': 15, 'fetch_order_book': 2, 'fetch_balance': 5, 'create_order': 2},
+}
+
+# Вес, зависящий от limit запроса: (наибольший limit, вес) по возрастанию; без limit действует ENDPOINT_WEIGHTS
+LIMIT_WEIGHTS = {
+    'binance': {'fetch_order_book': [(100, 5), (500, 25), (1000, 50), (5000, 250)]},
+}
+
+# Отдельные лимиты эндпоинтов поверх общего лимита биржи
+ENDPOINT_LIMITS = {
+    'binance': {'create_order': {'capacity': 50, 'refill_per_second': 5}},  # 50 orders / 10 s
+    'mexc': {'create_order': {'capacity': 50, 'refill_per_second': 5}},
+}
+
+class TokenBucket:
+    """Weighted token bucket with FIFO waiters, usable from coroutines and threads."""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        # asyncio.Lock привязан к циклу событий, поэтому у каждого цикла своя очередь ожидающих
+        self.async_locks = {}
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def _try_take(self, weight: float) -> float:
+        """Take ``weight`` tokens if available; otherwise return the seconds to wait."""
+        with self.lock:
+            self._refill()
+            if self.tokens >= weight:
+                self.tokens -= weight
+                return 0.0
+            return (weight - self.tokens) / self.refill_per_second
+
+    def _async_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        lock = self.async_locks.get(loop)
+        if lock is None:
+            with self.lock:
+                for closed in [l for l in self.async_locks if l.is_closed()]:
+                    del self.async_locks[closed]
+                lock = self.async_locks[loop] = asyncio.Lock()
+        return lock
+
+    async def acquire(self, weight: float = 1) -> float:
+        """Wait until ``weight`` tokens are available; waiters of one event loop are served in arrival order."""
+        weight = min(weight, self.capacity)
+        waited = 0.0
+        async with self._async_lock():
+            delay = self._try_take(weight)
+            while delay > 0:
+                await asyncio.sleep(delay)
+                waited += delay
+                delay = self._try_take(weight)
+        return waited
+
+    def acquire_blocking(self, weight: float = 1) -> float:
+        """Blocking variant of acquire() for synchronous ccxt clients."""
+        weight = min(weight, self.capacity)
+        waited = 0.0
+        delay = self._try_take(weight)
+        while delay > 0:
+            time.sleep(delay)
+            waited += delay
+            delay = self._try_take(weight)
+        return waited
+
+    def drain(self, seconds: float):
+        """Push the bucket into debt so no request goes out for ``seconds``."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0) - seconds * self.refill_per_second
+
+class ExchangeRateLimiter:
+    """One token bucket per exchange plus optional per-endpoint buckets, weighted by endpoint."""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ExchangeRateLimiter, cls).__new__(cls)
+            cls._instance.buckets = {}
+            cls._instance.endpoint_buckets = {}
+            cls._instance.stats = {}
+            cls._instance.ban_backoff = 30  # Секунды паузы после ответа 429/418
+        return cls._instance
+
+    def bucket(self, exchange_name: str) -> TokenBucket:
+        bucket = self.buckets.get(exchange_name)
+        if bucket is None:
+            limits = EXCHANGE_LIMITS.get(exchange_name, EXCHANGE_LIMITS['default'])
+            bucket = TokenBucket(limits['capacity'], limits['refill_per_second'])
+            self.buckets[exchange_name] = bucket
+        return bucket
+
+    def endpoint_bucket(self, exchange_name: str, endpoint: str):
+        key = (exchange_name, endpoint)
+        if key not in self.endpoint_buckets:
+            limits = ENDPOINT_LIMITS.get(exchange_name, {}).get(endpoint)
+            self.endpoint_buckets[key] = TokenBucket(limits['capacity'], limits['refill_per_second']) if limits else None
+        return self.endpoint_buckets[key]
+
+    def weight(self, exchange_name: str, endpoint: str, limit: int = None) -> float:
+        tiers = LIMIT_WEIGHTS.get(exchange_name, {}).get(endpoint)
+        if tiers and limit is not None:
+            return next((weight for max_limit, weight in tiers if limit <= max_limit), tiers[-1][1])
+        return ENDPOINT_WEIGHTS.get(exchange_name, {}).get(endpoint, 1)
+
+    def _record(self, exchange_name: str, weight: float, waited: float):
+        stats = self.stats.setdefault(exchange_name, {'requests': 0, 'weight': 0, 'waited': 0.0, 'bans': 0})
+        stats['requests'] += 1
+        stats['weight'] += weight
+        stats['waited'] += waited
+
+    async def acquire(self, exchange_name: str, endpoint: str, limit: int = None):
+        """Wait for capacity on the endpoint bucket (if any) and then the exchange bucket."""
+        weight = self.weight(exchange_name, endpoint, limit)
+        waited = 0.0
+        endpoint_bucket = self.endpoint_bucket(exchange_name, endpoint)
+        if endpoint_bucket is not None:
+            waited += await endpoint_bucket.acquire(1)
+        waited += await self.bucket(exchange_name).acquire(weight)
+        if waited:
+            logger.debug(f"Rate limiting {exchange_name}.{endpoint}: waited {waited:.2f} seconds")
+        self._record(exchange_name, weight, waited)
+
+    def acquire_blocking(self, exchange_name: str, endpoint: str, limit: int = None):
+        """Synchronous acquire() for code that uses blocking ccxt clients."""
+        weight = self.weight(exchange_name, endpoint, limit)
+        waited = 0.0
+        endpoint_bucket = self.endpoint_bucket(exchange_name, endpoint)
+        if endpoint_bucket is not None:
+            waited += endpoint_bucket.acquire_blocking(1)
+        waited += self.bucket(exchange_name).acquire_blocking(weight)
+        self._record(exchange_name, weight, waited)
+
+    def penalize(self, exchange_name: str, seconds: float = None):
+        """Stop sending to an exchange for a while after it answered with a rate-limit error."""
+        seconds = self.ban_backoff if seconds is None else seconds
+        self.bucket(exchange_name).drain(seconds)
+        self.stats.setdefault(exchange_name, {'requests': 0, 'weight': 0, 'waited': 0.0, 'bans': 0})['bans'] += 1
+        logger.warning(f"Rate limit hit on {exchange_name}, pausing requests for {seconds} seconds")
+
+    def is_rate_limit_error(self, error: Exception) -> bool:
+        return type(error).__name__ in ('RateLimitExceeded', 'DDoSProtection')
+
+    async def call(self, exchange_name: str, endpoint: str, func, *args, **kwargs):
+        """Run an async exchange call under the limiter, backing off if the exchange still throttles us.
+
+        Pass ``limit`` as a keyword: endpoints such as Binance order books weigh more for deeper requests.
+        """
+        await self.acquire(exchange_name, endpoint, kwargs.get('limit'))
+        try:
+            return await func(*args, **kwargs)
+        except Exception as e:
+            if self.is_rate_limit_error(e):
+                self.penalize(exchange_name)
+            raise
+
+    def call_blocking(self, exchange_name: str, endpoint: str, func, *args, **kwargs):
+        """Run a blocking exchange call under the limiter."""
+        self.acquire_blocking(exchange_name, endpoint, kwargs.get('limit'))
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if self.is_rate_limit_error(e):
+                self.penalize(exchange_name)
+            raise
+
 class APIRateLimiter:
     def __init__(self, market_state: dict, requests_per_second: int = 5):
         self.volatility = market_state['volatility']
         self.requests_per_second = requests_per_second
-        self.last_request_time = 0
+        self.bucket = TokenBucket(1, requests_per_second)
 
     async def limit(self) -> None:
         """Enforce API rate limiting."""
         try:
-            current_time = time.time()
-            time_since_last_request = current_time - self.last_request_time
-            if time_since_last_request < (1 / self.requests_per_second):
-                sleep_time = (1 / self.requests_per_second) - time_since_last_request
-                logger.debug(f"Rate limiting: sleeping for {sleep_time:.2f} seconds")
-                await asyncio.sleep(sleep_time)
-            self.last_request_time = time.time()
+            waited = await self.bucket.acquire(1)
+            if waited:
+                logger.debug(f"Rate limiting: slept for {waited:.2f} seconds")
         except Exception as e:
             logger.error(f"Failed to enforce rate limit: {str(e)}")
             raise
@@ -28,10 +216,14 @@ if __name__ == "__main__":
     # Test run
     market_state = {'volatility': 0.3}
     limiter = APIRateLimiter(market_state)
-    
+    exchange_limiter = ExchangeRateLimiter()
+
     async def main():
         for _ in range(10):
             await limiter.limit()
             print("Request made")
+        start = time.monotonic()
+        await asyncio.gather(*[exchange_limiter.acquire('mexc', 'fetch_tickers') for _ in range(20)])
+        print(f"20 weighted MEXC ticker requests took {time.monotonic() - start:.2f}s, stats: {exchange_limiter.stats}")
 
     asyncio.run(main())
@@ -1,69 +1,308 @@
-from trading_bot.logging_setup import setup_logging
-from trading_bot.utils.cache_manager import CacheManager
-from .binance_api import BinanceAPI
-from .bitstamp_api import BitstampAPI
-from .bybit_api import BybitAPI
-from .coinbase_api import CoinbaseAPI
-from .huobi_api import HuobiAPI
-from .kraken_api import KrakenAPI
-from .kucoin_api import KucoinAPI
-from .exchange_detector import ExchangeDetector
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import time
+from collections import deque
+import numpy as np
+from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
+from exchange_factory import ExchangeFactory
 
 logger = setup_logging('market_data_collector')
 
+class KlineAdapter:
+    """Public REST candle endpoint of one exchange, parsed straight into a KlineFrame.
+
+    Subclasses describe the request and which payload columns hold
+    ts/open/high/low/close/volume; parsing is a single conversion of the
+    selected columns to a float64 table, sorted and transposed into the frame.
+    """
+
+    name = None
+    url = None
+    intervals = {}
+    columns = (0, 1, 2, 3, 4, 5)  # Позиции ts, open, high, low, close, volume в строке ответа
+    ts_scale = 1  # Множитель до миллисекунд
+    max_limit = 1000
+
+    def market_id(self, symbol):
+        return symbol.split(':')[0].replace('/', '')
+
+    def request(self, symbol, timeframe, limit):
+        """Return (url, params) for the candle request."""
+        raise NotImplementedError
+
+    def rows(self, payload):
+        return payload
+
+    def parse(self, payload):
+        rows = self.rows(payload)
+        if not rows:
+            return KlineFrame.empty()
+        table = np.array([[row[i] for i in self.columns] for row in rows], dtype=np.float64)
+        table = table[np.argsort(table[:, 0], kind='stable')]
+        return KlineFrame((table[:, 0] * self.ts_scale).astype(np.int64), np.ascontiguousarray(table[:, 1:].T))
+
+class BinanceKlineAdapter(KlineAdapter):
+    name = 'binance'
+    url = 'https://api.binance.com/api/v3/klines'
+    intervals = {tf: tf for tf in ('1m', '3m', '5m', '15m', '30m', '1h', '2h', '4h', '6h', '12h', '1d', '1w')}
+
+    def request(self, symbol, timeframe, limit):
+        return self.url, {'symbol': self.market_id(symbol), 'interval': self.intervals[timeframe], 'limit': min(limit, self.max_limit)}
+
+class MEXCKlineAdapter(BinanceKlineAdapter):
+    name = 'mexc'
+    url = 'https://api.mexc.com/api/v3/klines'
+    intervals = {'1m': '1m', '5m': '5m', '15m': '15m', '30m': '30m', '1h': '60m', '4h': '4h', '1d': '1d', '1w': '1W'}
+    max_limit = 1000
+
+class BybitKlineAdapter(KlineAdapter):
+    name = 'bybit'
+    url = 'https://api.bybit.com/v5/market/kline'
+    intervals = {'1m': '1', '3m': '3', '5m': '5', '15m': '15', '30m': '30', '1h': '60', '2h': '120', '4h': '240', '6h': '360', '12h': '720', '1d': 'D', '1w': 'W'}
+
+    def request(self, symbol, timeframe, limit):
+        return self.url, {'category': 'spot', 'symbol': self.market_id(symbol), 'interval': self.intervals[timeframe], 'limit': min(limit, self.max_limit)}
+
+    def rows(self, payload):
+        return payload['result']['list']
+
+class KucoinKlineAdapter(KlineAdapter):
+    name = 'kucoin'
+    url = 'https://api.kucoin.com/api/v1/market/candles'
+    intervals = {'1m': '1min', '3m': '3min', '5m': '5min', '15m': '15min', '30m': '30min', '1h': '1hour', '2h': '2hour', '4h': '4hour', '6h': '6hour', '12h': '12hour', '1d': '1day', '1w': '1week'}
+    columns = (0, 1, 3, 4, 2, 5)  # time, open, close, high, low, volume
+    ts_scale = 1000
+    max_limit = 1500
+
+    def market_id(self, symbol):
+        return symbol.split(':')[0].replace('/', '-')
+
+    def request(self, symbol, timeframe, limit):
+        return self.url, {'symbol': self.market_id(symbol), 'type': self.intervals[timeframe]}
+
+    def rows(self, payload):
+        return payload['data']
+
+class KrakenKlineAdapter(KlineAdapter):
+    name = 'kraken'
+    url = 'https://api.kraken.com/0/public/OHLC'
+    intervals = {'1m': 1, '5m': 5, '15m': 15, '30m': 30, '1h': 60, '4h': 240, '1d': 1440, '1w': 10080}
+    columns = (0, 1, 2, 3, 4, 6)  # time, open, high, low, close, vwap, volume
+    ts_scale = 1000
+    max_limit = 720
+
+    def market_id(self, symbol):
+        return symbol.split(':')[0].replace('/', '').replace('BTC', 'XBT')
+
+    def request(self, symbol, timeframe, limit):
+        return self.url, {'pair': self.market_id(symbol), 'interval': self.intervals[timeframe]}
+
+    def rows(self, payload):
+        result = payload['result']
+        return next(value for key, value in result.items() if key != 'last')
+
+class CoinbaseKlineAdapter(KlineAdapter):
+    name = 'coinbase'
+    url = 'https://api.exchange.coinbase.com/products/{}/candles'
+    intervals = {'1m': 60, '5m': 300, '15m': 900, '1h': 3600, '6h': 21600, '1d': 86400}
+    columns = (0, 3, 2, 1, 4, 5)  # time, low, high, open, close, volume
+    ts_scale = 1000
+    max_limit = 300
+
+    def market_id(self, symbol):
+        return symbol.split(':')[0].replace('/', '-')
+
+    def request(self, symbol, timeframe, limit):
+        return self.url.format(self.market_id(symbol)), {'granularity': self.intervals[timeframe]}
+
+class BitstampKlineAdapter(KlineAdapter):
+    name = 'bitstamp'
+    url = 'https://www.bitstamp.net/api/v2/ohlc/{}/'
+    intervals = {'1m': 60, '3m': 180, '5m': 300, '15m': 900, '30m': 1800, '1h': 3600, '2h': 7200, '4h': 14400, '6h': 21600, '12h': 43200, '1d': 86400}
+    fields = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+    ts_scale = 1000
+
+    def market_id(self, symbol):
+        return symbol.split(':')[0].replace('/', '').lower()
+
+    def request(self, symbol, timeframe, limit):
+        return self.url.format(self.market_id(symbol)), {'step': self.intervals[timeframe], 'limit': min(limit, self.max_limit)}
+
+    def rows(self, payload):
+        return [[candle[field] for field in self.fields] for candle in payload['data']['ohlc']]
+
+class HTXKlineAdapter(KlineAdapter):
+    name = 'htx'
+    url = 'https://api.huobi.pro/market/history/kline'
+    intervals = {'1m': '1min', '5m': '5min', '15m': '15min', '30m': '30min', '1h': '60min', '4h': '4hour', '1d': '1day', '1w': '1week'}
+    fields = ('id', 'open', 'high', 'low', 'close', 'amount')
+    ts_scale = 1000
+    max_limit = 2000
+
+    def market_id(self, symbol):
+        return symbol.split(':')[0].replace('/', '').lower()
+
+    def request(self, symbol, timeframe, limit):
+        return self.url, {'symbol': self.market_id(symbol), 'period': self.intervals[timeframe], 'size': min(limit, self.max_limit)}
+
+    def rows(self, payload):
+        return [[candle[field] for field in self.fields] for candle in payload['data']]
+
+KLINE_ADAPTERS = {adapter.name: adapter for adapter in (
+    BinanceKlineAdapter, MEXCKlineAdapter, BybitKlineAdapter, KucoinKlineAdapter,
+    KrakenKlineAdapter, CoinbaseKlineAdapter, BitstampKlineAdapter, HTXKlineAdapter,
+)}
+
+class LatencyTracker:
+    """Rolling latency and error statistics of one data source."""
+
+    def __init__(self, window=200):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)  # 1 - ошибка, 0 - успех
+
+    def record(self, latency, ok):
+        if ok:
+            self.latencies.append(latency)
+        self.outcomes.append(0 if ok else 1)
+
+    def record_lower_bound(self, latency):
+        """Record how long an unfinished request had taken; it neither succeeded nor failed."""
+        self.latencies.append(latency)
+
+    def percentile(self, q):
+        return float(np.percentile(self.latencies, q)) if self.latencies else None
+
+    @property
+    def p50(self):
+        return self.percentile(50)
+
+    @property
+    def p99(self):
+        return self.percentile(99)
+
+    @property
+    def error_rate(self):
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def score(self):
+        """Lower is better: tail latency inflated by the error rate; unmeasured sources rank first so they get sampled."""
+        if not self.latencies:
+            return 0.0 if not self.outcomes else float('inf')
+        return self.p99 * (1 + 10 * self.error_rate)
+
 class MarketDataCollector:
-    def __init__(self, market_state: dict):
-        self.cache = CacheManager(market_state)
-        self.detector = ExchangeDetector(market_state)
-        self.exchanges = {
-            "binance": BinanceAPI("your_api_key", "your_api_secret", market_state),
-            "bitstamp": BitstampAPI(market_state),
-            "bybit": BybitAPI("your_api_key", "your_api_secret", market_state),
-            "coinbase": CoinbaseAPI("your_api_key", "your_api_secret", market_state),
-            "huobi": HuobiAPI("your_api_key", "your_api_secret", market_state),
-            "kraken": KrakenAPI("your_api_key", "your_api_secret", market_state),
-            "kucoin": KucoinAPI("your_api_key", "your_api_secret", market_state)
-        }
-
-    def collect_klines(self, symbol: str, interval: str) -> list:
-        """Collect kline data from the best exchange."""
+    def __init__(self, market_state: dict = None, exchanges=None, hedge_min=0.05, hedge_max=2.0, timeout=10):
+        """Route candle requests to the fastest healthy exchange with failover and hedging."""
+        self.market_state = market_state or {}
+        self.adapters = {name: KLINE_ADAPTERS[name]() for name in (exchanges or KLINE_ADAPTERS)}
+        self.trackers = {name: LatencyTracker() for name in self.adapters}
+        self.unsupported = set()  # (exchange, symbol, timeframe), которые биржа отвергла
+        self.hedge_min = hedge_min
+        self.hedge_max = hedge_max
+        self.timeout = timeout
+        self.session = None
+        self.stats = {'requests': 0, 'hedged': 0, 'hedge_wins': 0, 'failovers': 0, 'failed': 0}
+
+    def rank(self, symbol, timeframe):
+        """Exchanges able to serve the request, best first."""
+        candidates = [name for name, adapter in self.adapters.items()
+                      if timeframe in adapter.intervals and (name, symbol, timeframe) not in self.unsupported]
+        return sorted(candidates, key=lambda name: self.trackers[name].score())
+
+    def hedge_delay(self, exchange_name):
+        """Start a backup request once the primary is slower than its usual p99."""
+        p99 = self.trackers[exchange_name].p99
+        return self.hedge_max if p99 is None else min(max(p99, self.hedge_min), self.hedge_max)
+
+    async def fetch(self, exchange_name, symbol, timeframe, limit):
+        """Fetch and parse candles from one exchange, recording latency and errors."""
+        if self.session is None:
+            self.session = ExchangeFactory.create_session()
+        adapter = self.adapters[exchange_name]
+        url, params = adapter.request(symbol, timeframe, limit)
+        start = time.monotonic()
         try:
-            cache_key = f"klines_{symbol}_{interval}"
-            cached_data = self.cache.get(cache_key)
-            if cached_data:
-                return cached_data
-
-            exchange_name = self.detector.detect_best_exchange(symbol)
-            exchange = self.exchanges[exchange_name]
-
-            if exchange_name == "binance":
-                response = exchange.get_klines(symbol, interval)
-            elif exchange_name == "bitstamp":
-                response = exchange.get_ohlc(symbol.replace("/", ""), step=3600)
-            elif exchange_name == "bybit":
-                response = exchange.get_kline(symbol, interval)
-            elif exchange_name == "coinbase":
-                response = exchange.get_candles(symbol.replace("/", "-"))
-            elif exchange_name == "huobi":
-                response = exchange.get_kline(symbol.lower(), interval)
-            elif exchange_name == "kraken":
-                response = exchange.get_ohlc(symbol.replace("/", ""))
-            elif exchange_name == "kucoin":
-                response = exchange.get_kline(symbol, interval)
-            else:
-                raise ValueError(f"Unsupported exchange: {exchange_name}")
-
-            klines = response.json()
-            self.cache.set(cache_key, klines)
-            logger.info(f"Collected klines for {symbol} from {exchange_name}")
-            return klines
-        except Exception as e:
-            logger.error(f"Failed to collect klines for {symbol}: {str(e)}")
+            async with self.session.get(url, params=params, timeout=self.timeout) as response:
+                if response.status in (400, 404):
+                    self.unsupported.add((exchange_name, symbol, timeframe))
+                response.raise_for_status()
+                payload = await response.json(content_type=None)
+            klines = adapter.parse(payload).tail(limit)
+            if not klines:
+                raise ValueError("empty candle payload")
+        except asyncio.CancelledError:
+            # Проигравший хедж: время ожидания - нижняя оценка его задержки, без неё медленный источник остался бы первым.
+            # Ответа не было, поэтому счётчики успехов и ошибок не меняются
+            self.trackers[exchange_name].record_lower_bound(time.monotonic() - start)
+            raise
+        except Exception:
+            self.trackers[exchange_name].record(time.monotonic() - start, False)
             raise
+        self.trackers[exchange_name].record(time.monotonic() - start, True)
+        return klines
+
+    async def collect_klines(self, symbol: str, interval: str, limit: int = 500) -> KlineFrame:
+        """Collect kline data from the best exchange."""
+        self.stats['requests'] += 1
+        candidates = self.rank(symbol, interval)
+        if not candidates:
+            raise ValueError(f"No exchange serves {symbol} {interval}")
+        queue = list(candidates)
+        running = {}
+        last_error = None
+        try:
+            while queue or running:
+                if not running:
+                    exchange_name = queue.pop(0)
+                    if last_error is not None:
+                        self.stats['failovers'] += 1
+                    running[asyncio.create_task(self.fetch(exchange_name, symbol, interval, limit))] = exchange_name
+                primary = next(iter(running.values()))
+                done, _ = await asyncio.wait(running, timeout=self.hedge_delay(primary) if queue and len(running) == 1 else None,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Основной источник медленнее обычного: параллельно спрашиваем следующий
+                    exchange_name = queue.pop(0)
+                    self.stats['hedged'] += 1
+                    running[asyncio.create_task(self.fetch(exchange_name, symbol, interval, limit))] = exchange_name
+                    continue
+                for task in done:
+                    exchange_name = running.pop(task)
+                    if task.exception() is None:
+                        if exchange_name != primary:
+                            self.stats['hedge_wins'] += 1
+                        logger.info(f"Collected {len(task.result())} klines for {symbol} from {exchange_name}")
+                        return task.result()
+                    last_error = task.exception()
+                    logger.warning(f"Failed to collect klines for {symbol} from {exchange_name}: {str(last_error)}")
+            self.stats['failed'] += 1
+            raise RuntimeError(f"All exchanges failed for {symbol} {interval}: {str(last_error)}")
+        finally:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+    def latency_report(self):
+        return {name: {'p50': tracker.p50, 'p99': tracker.p99, 'error_rate': tracker.error_rate, 'samples': len(tracker.outcomes)}
+                for name, tracker in self.trackers.items()}
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
 
 if __name__ == "__main__":
     # Test run
-    market_state = {'volatility': 0.3}
-    collector = MarketDataCollector(market_state)
-    klines = collector.collect_klines("BTCUSDT", "1h")
-    print(f"Klines: {klines}")
+    async def main():
+        collector = MarketDataCollector({'volatility': 0.3})
+        for _ in range(3):
+            klines = await collector.collect_klines("BTC/USDT", "1h")
+            print(f"Klines: {klines}")
+        print(f"Latency: {collector.latency_report()}, stats: {collector.stats}")
+        await collector.close()
+
+    asyncio.run(main())
@@ -2,8 +2,10 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import asyncio
 import numpy as np
 from utils.logging_setup import setup_logging
+from data_sources.kline_frame import KlineFrame
 from arch import arch_model
 
 logger = setup_logging('volatility_analyzer')
@@ -14,6 +16,29 @@ class VolatilityAnalyzer:
         self.market_data = market_data
         self.volatility = market_state.get('volatility', 0.3)
 
+    def analyze(self, klines) -> float:
+        """Annualized volatility of close-to-close log returns, fast enough to call for every strategy."""
+        try:
+            klines = KlineFrame.ensure(klines)
+            prices = klines.close
+            if len(prices) < 3 or prices.min() <= 0:
+                return self.volatility
+            returns = np.diff(np.log(prices))
+            bar_ms = float(np.median(np.diff(klines.ts)))
+            if bar_ms <= 0:
+                return self.volatility
+            return float(returns.std() * np.sqrt(365 * 24 * 60 * 60 * 1000 / bar_ms))
+        except Exception as e:
+            logger.error(f"Failed to analyze volatility from klines: {str(e)}")
+            return self.volatility
+
+    def analyze_batch(self, close, bar_ms) -> np.ndarray:
+        """Annualized volatility for every row of a (symbols x time) close matrix."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            returns = np.diff(np.log(close), axis=-1)
+            volatility = np.nanstd(returns, axis=-1) * np.sqrt(365 * 24 * 60 * 60 * 1000 / bar_ms)
+        return np.where(np.isfinite(volatility), volatility, self.volatility)
+
     async def analyze_volatility(self, symbol: str, timeframe: str, limit: int, exchange_name: str) -> float:
         """Analyze the volatility of a symbol using GARCH(1,1) model."""
         try:
@@ -30,8 +55,8 @@ class VolatilityAnalyzer:
                 logger.warning(f"No klines data for {symbol} on {exchange_name}, returning default volatility")
                 return self.volatility
 
-            prices = [kline['close'] for kline in klines]
-            if not prices or min(prices) == 0:
+            prices = KlineFrame.ensure(klines).close
+            if not len(prices) or prices.min() == 0:
                 logger.warning(f"Invalid price data for {symbol}, returning default volatility")
                 return self.volatility
 
@@ -42,8 +67,9 @@ class VolatilityAnalyzer:
                 return self.volatility
 
             # Применяем GARCH(1,1) модель
+            # Подгонка GARCH нагружает CPU, поэтому выполняется в пуле потоков, не блокируя цикл событий
             model = arch_model(returns, vol='Garch', p=1, q=1, mean='Zero', rescale=False)
-            res = model.fit(disp='off')
+            res = await asyncio.get_running_loop().run_in_executor(None, lambda: model.fit(disp='off'))
             conditional_volatility = res.conditional_volatility[-1]  # Последняя оценка волатильности
             annualized_volatility = conditional_volatility * np.sqrt(365 * 24 * 60)  # Аннуализируем
 